@@ -0,0 +1,117 @@
+"""
+Benchmark the SQLite engine profile from create_app against SQLite defaults.
+
+Runs the same mixed workload twice on a fresh database file. Reader threads
+fetch a user's recent chat messages, and writer threads insert messages and
+commit, as concurrent requests in several workers would. The profiles are:
+  baseline  SQLAlchemy/pysqlite defaults (rollback journal, default pool)
+  tuned     engine_options() + apply_sqlite_pragmas (WAL, busy timeout, pool)
+
+Usage: python bench_db.py [--seconds 5] [--readers 8] [--writers 2] [--rows 20000]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+from website import engine_options, apply_sqlite_pragmas
+
+
+SCHEMA = [
+    "CREATE TABLE chat_messages (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, role VARCHAR(20), "
+    "content TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+    "CREATE INDEX ix_chat_messages_user_id_created_at ON chat_messages (user_id, created_at)",
+]
+READ = text("SELECT * FROM chat_messages WHERE user_id = :user_id ORDER BY created_at DESC LIMIT 10")
+WRITE = text("INSERT INTO chat_messages (user_id, role, content) VALUES (:user_id, 'user', :content)")
+USERS = 500
+
+
+def make_engine(profile, url):
+    if profile == 'baseline':
+        return create_engine(url)
+    engine = create_engine(url, **engine_options(url))
+    event.listen(engine, 'connect', apply_sqlite_pragmas)
+    return engine
+
+
+def seed(engine, rows):
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(WRITE, [{'user_id': i % USERS, 'content': 'x' * 200} for i in range(rows)])
+
+
+def worker(engine, kind, deadline, results):
+    latencies, errors = [], 0
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                if kind == 'read':
+                    conn.execute(READ, {'user_id': rng.randrange(USERS)}).fetchall()
+                else:
+                    conn.execute(WRITE, {'user_id': rng.randrange(USERS), 'content': 'y' * 200})
+        except OperationalError:  # "database is locked" once the busy timeout runs out
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+    results.append((kind, latencies, errors))
+
+
+def run(profile, args):
+    with tempfile.TemporaryDirectory(prefix=f'bench_db_{profile}_') as directory:
+        return _run(profile, f"sqlite:///{os.path.join(directory, 'bench.db')}", args)
+
+
+def _run(profile, url, args):
+    engine = make_engine(profile, url)
+    seed(engine, args.rows)
+
+    results = []
+    deadline = time.perf_counter() + args.seconds
+    threads = [threading.Thread(target=worker, args=(engine, 'read', deadline, results)) for _ in range(args.readers)]
+    threads += [threading.Thread(target=worker, args=(engine, 'write', deadline, results)) for _ in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    summary = {}
+    for kind in ('read', 'write'):
+        latencies = [l for k, ls, _ in results if k == kind for l in ls]
+        summary[kind] = {
+            'ops_per_s': len(latencies) / args.seconds,
+            'p99_ms': statistics.quantiles(latencies, n=100)[-1] * 1000 if len(latencies) >= 100 else float('nan'),
+            'errors': sum(e for k, _, e in results if k == kind),
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers, {args.writers} writers, {args.seconds:.0f}s per profile, {args.rows} seed rows")
+    print(f"{'profile':<10} {'reads/s':>9} {'read p99':>10} {'writes/s':>9} {'write p99':>10} {'errors':>7}")
+    for profile in ('baseline', 'tuned'):
+        s = run(profile, args)
+        print(f"{profile:<10} {s['read']['ops_per_s']:>9.0f} {s['read']['p99_ms']:>8.1f}ms "
+              f"{s['write']['ops_per_s']:>9.0f} {s['write']['p99_ms']:>8.1f}ms "
+              f"{s['read']['errors'] + s['write']['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
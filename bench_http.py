@@ -0,0 +1,105 @@
+"""
+Benchmark the shared HTTP clients from http_clients.py against a client per call.
+
+Starts openrouter_stub.py in-process with no reply delay and sends the same
+non-streaming completion requests four ways:
+  async fresh    a new httpx.AsyncClient per request (the old manim.py pattern)
+  async shared   get_async_client()
+  sync fresh     requests.post() (the old chat/YouTube pattern)
+  sync shared    get_session()
+Prints requests/s, mean and p95 latency, and how many TCP connections the stub
+accepted. Over loopback without TLS only the TCP setup is saved, so gains
+against real HTTPS hosts are larger than what this shows.
+
+Usage: python bench_http.py [--requests 300] [--concurrency 10]
+"""
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+import httpx
+import requests
+
+import openrouter_stub
+from http_clients import aclose_all, close_all, get_async_client, get_session
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "ping"}]}
+
+
+class CountingHandler(openrouter_stub.StubHandler):
+    first_token_delay = 0.0
+    token_delay = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        with CountingHandler.lock:
+            CountingHandler.connections += 1
+        super().setup()
+
+
+async def run_async(url, shared, args):
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            if shared:
+                response = await get_async_client(url).post(url, json=PAYLOAD)
+            else:
+                async with httpx.AsyncClient() as client:
+                    response = await client.post(url, json=PAYLOAD)
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+    latencies = await asyncio.gather(*(one() for _ in range(args.requests)))
+    await aclose_all()
+    return latencies
+
+
+def run_sync(url, shared, args):
+    def one(_):
+        started = time.perf_counter()
+        post = get_session().post if shared else requests.post
+        post(url, json=PAYLOAD, timeout=10).raise_for_status()
+        return time.perf_counter() - started
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        latencies = list(pool.map(one, range(args.requests)))
+    close_all()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=10)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CountingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/api/v1/chat/completions"
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, against {url}")
+    print(f"{'client':<14} {'req/s':>8} {'mean':>9} {'p95':>9} {'connections':>12}")
+    for name, run in (
+        ('async fresh', lambda: asyncio.run(run_async(url, False, args))),
+        ('async shared', lambda: asyncio.run(run_async(url, True, args))),
+        ('sync fresh', lambda: run_sync(url, False, args)),
+        ('sync shared', lambda: run_sync(url, True, args)),
+    ):
+        CountingHandler.connections = 0
+        started = time.perf_counter()
+        latencies = run()
+        elapsed = time.perf_counter() - started
+        print(f"{name:<14} {len(latencies) / elapsed:>8.0f} {statistics.mean(latencies) * 1000:>7.1f}ms "
+              f"{statistics.quantiles(latencies, n=20)[-1] * 1000:>7.1f}ms {CountingHandler.connections:>12}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
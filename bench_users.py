@@ -0,0 +1,84 @@
+"""
+Benchmark listing users with and without the deferred User column groups.
+
+Seeds a temporary SQLite database with users whose profile columns are filled
+(a 2 KB bio, job title, company, ...), then loads all of them repeatedly:
+  deferred    User.query.all(), as the list views do (profile, credentials,
+              activity and privacy groups stay unloaded)
+  undeferred  the same query with every deferred column loaded (undefer('*')),
+              i.e. the behavior before the deferral
+Prints the median load time and the peak Python memory allocated while
+loading (tracemalloc).
+
+Usage: python bench_users.py [--users 10000] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from flask import Flask
+from sqlalchemy.orm import undefer
+
+from website import db, init_database
+from website.models import User
+
+
+def seed(count):
+    db.session.execute(db.insert(User), [
+        {'email': f'user{i}@example.com', 'first_name': 'User', 'last_name': str(i), 'password': 'x' * 102,
+         'username': f'user{i}', 'bio': 'b' * 2000, 'job_title': 'Engineer', 'company': 'Skillora',
+         'location': 'Somewhere', 'website': f'https://example.com/{i}', 'timezone': 'UTC'}
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def load(options):
+    db.session.expunge_all()
+    started = time.perf_counter()
+    users = User.query.options(*options).all()
+    elapsed = time.perf_counter() - started
+    return users, elapsed
+
+
+def measure(options, repeat):
+    timings = []
+    for _ in range(repeat):
+        _, elapsed = load(options)
+        timings.append(elapsed)
+    db.session.expunge_all()
+    tracemalloc.start()
+    users, _ = load(options)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del users
+    return statistics.median(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bench_users_') as directory:
+        app = Flask('website')
+        init_database(app, f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        with app.app_context():
+            db.create_all()
+            seed(args.users)
+
+            print(f"{args.users} users, median of {args.repeat} loads")
+            print(f"{'profile':<11} {'load':>9} {'peak memory':>12}")
+            for name, options in (('deferred', ()), ('undeferred', (undefer('*'),))):
+                elapsed, peak = measure(options, args.repeat)
+                print(f"{name:<11} {elapsed * 1000:>7.0f}ms {peak / (1024 * 1024):>9.1f} MiB")
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+Pool of isolated browser contexts for concurrent browser agents.
+
+Instead of every agent sharing one browser context, each agent borrows its
+own context from a fixed-size pool. Contexts are created up front (pre-warmed),
+health-checked and reset (tabs closed) after every task, and recycled (closed
+and replaced) after BROWSER_POOL_MAX_TASKS tasks or when memory grows past a
+threshold. Memory is the RSS of the browser processes when psutil is
+installed. Otherwise the context's JS heap size (Chromium's performance.memory)
+is used.
+"""
+
+import asyncio
+import contextlib
+import os
+import time
+
+try:
+    import psutil # Optional: enables RSS-based recycling
+except ImportError:
+    psutil = None
+
+
+BROWSER_POOL_MAX_SIZE = int(os.getenv("BROWSER_POOL_MAX_SIZE", 10)) # Browser agents are heavy, cap the contexts
+BROWSER_POOL_MAX_TASKS = int(os.getenv("BROWSER_POOL_MAX_TASKS", 5)) # Tasks per context before it is recycled
+BROWSER_POOL_MAX_RSS_MB = float(os.getenv("BROWSER_POOL_MAX_RSS_MB", 2048)) # Total browser RSS (needs psutil)
+BROWSER_POOL_MAX_HEAP_MB = float(os.getenv("BROWSER_POOL_MAX_HEAP_MB", 512)) # Per-context JS heap (fallback)
+BROWSER_POOL_HEALTH_TIMEOUT = float(os.getenv("BROWSER_POOL_HEALTH_TIMEOUT", 10)) # Seconds
+
+JS_HEAP_SCRIPT = "() => (performance.memory ? performance.memory.usedJSHeapSize : 0)"
+
+
+class PooledContext:
+    """A browser context plus the bookkeeping the pool needs to decide when to recycle it."""
+
+    def __init__(self, number: int, context):
+        self.number = number
+        self.context = context
+        self.tasks = 0
+        self.created_at = time.monotonic()
+
+
+class BrowserContextPool:
+    """Fixed-size pool of browser contexts created from one shared browser."""
+
+    def __init__(self, browser, size: int, max_tasks: int = BROWSER_POOL_MAX_TASKS,
+                 max_rss_mb: float = BROWSER_POOL_MAX_RSS_MB, max_heap_mb: float = BROWSER_POOL_MAX_HEAP_MB):
+        self.browser = browser
+        self.size = max(1, size)
+        self.max_tasks = max_tasks
+        self.max_rss_mb = max_rss_mb
+        self.max_heap_mb = max_heap_mb
+        self.in_use = 0
+        self.recycled = 0
+        self.health_failures = 0
+        self.peak_memory_mb = 0.0
+        self._created = 0
+        self._idle = asyncio.Queue()
+
+    async def _new_context(self) -> PooledContext:
+        context = await self.browser.new_context()
+        # Open the context's first page now so the first task does not pay the startup cost
+        await context.get_current_page()
+        self._created += 1
+        return PooledContext(self._created, context)
+
+    async def start(self):
+        """Pre-warm all contexts concurrently."""
+        print(f"[Browser Pool] Pre-warming {self.size} browser contexts...")
+        contexts = await asyncio.gather(*(self._new_context() for _ in range(self.size)), return_exceptions=True)
+        failed = [pooled for pooled in contexts if isinstance(pooled, Exception)]
+        if len(failed) == len(contexts):
+            raise RuntimeError(f"Browser pool could not create any browser context: {failed[0]}")
+        for pooled in contexts:
+            if isinstance(pooled, Exception):
+                print(f"[Browser Pool] Failed to pre-warm a context, will retry on first lease: {pooled}")
+                pooled = None
+            self._idle.put_nowait(pooled)
+        print(f"[Browser Pool] {len(contexts) - len(failed)} contexts ready.")
+
+    async def _browser_rss_mb(self) -> float | None:
+        """RSS of all processes started by this script (Playwright driver and browser), or None without psutil."""
+        if psutil is None:
+            return None
+        total = 0
+        for child in psutil.Process().children(recursive=True):
+            with contextlib.suppress(psutil.Error):
+                total += child.memory_info().rss
+        return total / (1024 * 1024)
+
+    async def _heap_mb(self, pooled: PooledContext) -> float:
+        page = await pooled.context.get_current_page()
+        return (await page.evaluate(JS_HEAP_SCRIPT)) / (1024 * 1024)
+
+    async def _check(self, pooled: PooledContext) -> str | None:
+        """Return a reason to recycle the context, or None if it can be reused."""
+        if pooled.tasks >= self.max_tasks:
+            return f"served {pooled.tasks} tasks"
+        try:
+            # Health check: the context must still have a responsive page
+            heap_mb = await asyncio.wait_for(self._heap_mb(pooled), BROWSER_POOL_HEALTH_TIMEOUT)
+        except Exception as e:
+            self.health_failures += 1
+            return f"failed health check ({type(e).__name__})"
+        rss_mb = await self._browser_rss_mb()
+        memory_mb = rss_mb if rss_mb is not None else heap_mb
+        self.peak_memory_mb = max(self.peak_memory_mb, memory_mb)
+        if rss_mb is not None and rss_mb > self.max_rss_mb:
+            return f"browser RSS {rss_mb:.0f} MB over {self.max_rss_mb:.0f} MB"
+        if heap_mb > self.max_heap_mb:
+            return f"JS heap {heap_mb:.0f} MB over {self.max_heap_mb:.0f} MB"
+        return None
+
+    async def _reset(self, pooled: PooledContext) -> str | None:
+        """Close the task's tabs and drop cached page state so the next agent starts clean. Returns a reason to recycle if that fails."""
+        try:
+            await asyncio.wait_for(pooled.context.reset_context(), BROWSER_POOL_HEALTH_TIMEOUT)
+        except Exception as e:
+            return f"failed to reset ({type(e).__name__})"
+        return None
+
+    async def _recycle(self, pooled: PooledContext, reason: str) -> PooledContext | None:
+        print(f"[Browser Pool] Recycling context #{pooled.number}: {reason}")
+        self.recycled += 1
+        with contextlib.suppress(Exception):
+            await pooled.context.close()
+        try:
+            return await self._new_context()
+        except Exception as e:
+            print(f"[Browser Pool] Could not replace context #{pooled.number}, retrying on next lease: {e}")
+            return None
+
+    @contextlib.asynccontextmanager
+    async def lease(self):
+        """`async with pool.lease() as context:` borrows a browser context for one task."""
+        pooled = await self._idle.get()
+        if pooled is None:
+            # Slot whose replacement failed earlier: create the context now
+            try:
+                pooled = await self._new_context()
+            except Exception:
+                self._idle.put_nowait(None)
+                raise
+        self.in_use += 1
+        try:
+            yield pooled.context
+        finally:
+            self.in_use -= 1
+            pooled.tasks += 1
+            reason = await self._check(pooled) or await self._reset(pooled)
+            if reason:
+                pooled = await self._recycle(pooled, reason)
+            self._idle.put_nowait(pooled) # None keeps the slot so a later lease can retry creating it
+
+    def metrics(self) -> dict:
+        return {
+            "size": self.size,
+            "in_use": self.in_use,
+            "idle": self._idle.qsize(),
+            "created": self._created,
+            "recycled": self.recycled,
+            "health_failures": self.health_failures,
+            "peak_memory_mb": round(self.peak_memory_mb, 1),
+            "memory_source": "rss" if psutil is not None else "js_heap",
+        }
+
+    async def close(self):
+        while not self._idle.empty():
+            pooled = self._idle.get_nowait()
+            if pooled is not None:
+                with contextlib.suppress(Exception):
+                    await pooled.context.close()
+
+
+def format_pool_metrics(metrics: dict) -> str:
+    return (f"{metrics['size']} contexts ({metrics['in_use']} in use, {metrics['idle']} idle), "
+            f"{metrics['recycled']} recycled, {metrics['health_failures']} failed health checks, "
+            f"peak memory {metrics['peak_memory_mb']} MB ({metrics['memory_source']})")
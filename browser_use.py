@@ -34,6 +34,15 @@ except ImportError:
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 import google.generativeai as genai # For overview and transcript generation
+from llm_cache import get_cache, format_stats # Persistent LLM response cache
+from key_scheduler import KeyScheduler, format_key_stats, pooled_agenerate # Shared, rate-aware API key pool
+from transcript_store import CAPTIONS_MODEL, get_transcript_store, format_store_stats # Transcripts reused across runs
+from captions import fetch_caption_transcript # Caption-track fast path for transcripts
+from http_clients import aclose_all # Shared keep-alive HTTP clients (used by the caption fetches)
+from relevance_prescreen import log_label, prescreen_relevance, prescreen_stats # Local lexical scorer for clear-cut relevance
+from run_state import RunState # Per-topic checkpoints for --resume
+import chapter_pipeline # Per-chapter streaming search -> transcript -> relevance
+from browser_pool import BROWSER_POOL_MAX_SIZE, BrowserContextPool, format_pool_metrics # Isolated, recycled browser contexts for agents
 
 
 # --- Configuration ---
@@ -49,10 +58,19 @@ if not api_keys:
     raise ValueError("No Google API Keys found. Set GOOGLE_API_KEY_1, etc. in your .env file or provide them directly.")
 
 
-# Limit concurrency based on available keys or a desired max
-MAX_CONCURRENT_AGENTS = 10
-NUM_CONCURRENT_AGENTS = min(len(api_keys), MAX_CONCURRENT_AGENTS)
-print(f"[Config] Using {NUM_CONCURRENT_AGENTS} API keys for concurrent agents (Max requested: {MAX_CONCURRENT_AGENTS}).")
+# All stages borrow keys from one adaptive pool (per-key rate limit + AIMD concurrency, see key_scheduler.py)
+key_scheduler = KeyScheduler(api_keys)
+print(f"[Config] Loaded {len(api_keys)} API keys into the shared key pool (up to {key_scheduler.capacity} concurrent calls).")
+
+
+# Pass --resume to continue the last run for the same topic from its checkpoint file
+RESUME = "--resume" in sys.argv
+
+
+# Per-stage concurrency for the chapter pipeline (search -> transcript -> relevance)
+# Search runs one browser agent per pooled context, so its concurrency is the browser pool size (see main)
+TRANSCRIPT_CONCURRENCY = key_scheduler.capacity
+RELEVANCE_CONCURRENCY = key_scheduler.capacity
 
 
 # Model names (Adjust if needed)
@@ -148,26 +166,24 @@ def parse_chapters_simple(overview_text: str) -> list[str]:
 
 
 async def analyze_transcript_relevance(
-    model: genai.GenerativeModel,
     transcript: str,
     chapter_title: str,
-    course_topic: str,
-    semaphore: asyncio.Semaphore
+    course_topic: str
 ) -> str:
     """
     Analyzes if the transcript content is relevant to the chapter title and course topic.
     Returns "Highly Relevant", "Moderately Relevant", "Not Relevant", or an error message.
+    The model call borrows a key from the shared pool (retried on another key if rate limited).
     """
-    async with semaphore:
-        print(f"    [Relevance] Analyzing transcript for chapter: '{chapter_title}'")
-        max_transcript_len = 8000 # Limit transcript length for analysis prompt
-        if len(transcript) > max_transcript_len:
-            transcript_snippet = transcript[:max_transcript_len] + "... (truncated)"
-        else:
-            transcript_snippet = transcript
+    print(f"    [Relevance] Analyzing transcript for chapter: '{chapter_title}'")
+    max_transcript_len = 8000 # Limit transcript length for analysis prompt
+    if len(transcript) > max_transcript_len:
+        transcript_snippet = transcript[:max_transcript_len] + "... (truncated)"
+    else:
+        transcript_snippet = transcript
 
 
-        prompt = f"""
+    prompt = f"""
 Analyze the following YouTube video transcript snippet to determine its relevance to the course chapter "{chapter_title}" within the broader topic of "{course_topic}".
 
 
@@ -189,114 +205,174 @@ Output ONLY one of the following classifications:
 - Moderately Relevant
 - Not Relevant
 """
-        try:
-            # Use less restrictive safety settings for analysis as well
-            safety_settings = [ {"category": c, "threshold": "BLOCK_NONE"} for c in [
-                    "HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_HATE_SPEECH",
-                    "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT"
-            ]]
-            response = await model.generate_content_async(prompt, safety_settings=safety_settings)
+    valid_responses = ["Highly Relevant", "Moderately Relevant", "Not Relevant"]
+    # The verdict is deterministic for a given transcript/chapter, so reuse earlier answers
+    cached_analysis = get_cache().get(RELEVANCE_MODEL_NAME, prompt)
+    if cached_analysis in valid_responses:
+        print(f"    [Relevance] Cached analysis for '{chapter_title}': {cached_analysis}")
+        return cached_analysis
+    # Clear matches / misses are labeled locally on the full transcript; only the ambiguous band reaches the LLM
+    local_label, scores = prescreen_relevance(transcript, chapter_title, course_topic)
+    if local_label:
+        print(f"    [Relevance] Pre-screen labeled '{chapter_title}': {local_label} "
+              f"(title coverage {scores['title_coverage']:.0%}, score {scores['score']:.2f})")
+        return local_label
+    try:
+        # Use less restrictive safety settings for analysis as well
+        safety_settings = [ {"category": c, "threshold": "BLOCK_NONE"} for c in [
+                "HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_HATE_SPEECH",
+                "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT"
+        ]]
+        response = await key_scheduler.run(
+            lambda lease: lease.model(RELEVANCE_MODEL_NAME).generate_content_async(prompt, safety_settings=safety_settings)
+        )
 
 
-            if response.parts:
-                analysis = "".join(part.text for part in response.parts if hasattr(part, 'text')).strip()
-                # Validate response format
-                valid_responses = ["Highly Relevant", "Moderately Relevant", "Not Relevant"]
-                if analysis in valid_responses:
-                    print(f"    [Relevance] Analysis complete for '{chapter_title}': {analysis}")
-                    return analysis
-                else:
-                    print(f"    [Relevance] Analysis for '{chapter_title}' returned unexpected format: {analysis}")
-                    return "[Analysis Failed: Invalid Format]"
-            elif response.prompt_feedback and response.prompt_feedback.block_reason:
-                 reason = response.prompt_feedback.block_reason.name
-                 print(f"    [Relevance] Analysis failed for '{chapter_title}': Blocked by model ({reason})")
-                 return f"[Analysis Failed: Blocked ({reason})]"
+        if response.parts:
+            analysis = "".join(part.text for part in response.parts if hasattr(part, 'text')).strip()
+            # Validate response format
+            if analysis in valid_responses:
+                print(f"    [Relevance] Analysis complete for '{chapter_title}': {analysis}")
+                get_cache().set(RELEVANCE_MODEL_NAME, prompt, analysis)
+                log_label(transcript, chapter_title, course_topic, analysis)
+                return analysis
             else:
-                 print(f"    [Relevance] Analysis failed for '{chapter_title}': Unknown reason")
-                 return "[Analysis Failed: Unknown]"
-        except Exception as e:
-            print(f"    [Relevance] Analysis failed for '{chapter_title}': {e}")
-            return f"[Analysis Failed: Error ({e})]"
+                print(f"    [Relevance] Analysis for '{chapter_title}' returned unexpected format: {analysis}")
+                return "[Analysis Failed: Invalid Format]"
+        elif response.prompt_feedback and response.prompt_feedback.block_reason:
+             reason = response.prompt_feedback.block_reason.name
+             print(f"    [Relevance] Analysis failed for '{chapter_title}': Blocked by model ({reason})")
+             return f"[Analysis Failed: Blocked ({reason})]"
+        else:
+             print(f"    [Relevance] Analysis failed for '{chapter_title}': Unknown reason")
+             return "[Analysis Failed: Unknown]"
+    except Exception as e:
+        print(f"    [Relevance] Analysis failed for '{chapter_title}': {e}")
+        return f"[Analysis Failed: Error ({e})]"
 
 
 
 
-async def get_transcript(model: genai.GenerativeModel, video_url: str, semaphore: asyncio.Semaphore) -> str:
+async def get_transcript(video_url: str) -> str:
     """
-    Requests a transcript for a given YouTube video URL using the provided Gemini model.
+    Gets a transcript for a given YouTube video URL, trying the cheapest source first:
+    1. the on-disk transcript store (from any earlier run or topic),
+    2. the video's public caption track,
+    3. a Gemini model on a key borrowed from the shared pool (only when the video has no captions).
     Returns the transcript text or an error message string.
     """
-    async with semaphore:
-        print(f"    [Transcript] Requesting transcript for: {video_url}")
-        # Use the Tool directly if available and preferred
-        video_file = genai.upload_file(path=video_url) # This likely won't work directly with URLs, intended for local files
-        # The prompt method is generally more reliable for URLs with standard models
-        prompt = f"Please provide a detailed text transcript of the video content at this URL: {video_url}. Focus only on the spoken words."
+    stored = get_transcript_store().get(video_url)
+    if stored:
+        print(f"    [Transcript] Using stored transcript for: {video_url} (Source: {stored['model']}, Length: {len(stored['text'])})")
+        return stored["text"]
+    captions_text = await fetch_caption_transcript(video_url)
+    if captions_text:
+        print(f"    [Transcript] Read caption track for: {video_url} (Length: {len(captions_text)})")
+        get_transcript_store().put(video_url, captions_text, CAPTIONS_MODEL)
+        return captions_text
+    print(f"    [Transcript] No captions, requesting LLM transcript for: {video_url}")
+    # The prompt method is generally more reliable for URLs with standard models
+    prompt = f"Please provide a detailed text transcript of the video content at this URL: {video_url}. Focus only on the spoken words."
 
 
-        try:
-            # Configure safety settings to be less restrictive for transcription
-            safety_settings = [ {"category": c, "threshold": "BLOCK_NONE"} for c in [
-                    "HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_HATE_SPEECH",
-                    "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT"
-            ]]
-            response = await model.generate_content_async(prompt, safety_settings=safety_settings)
+    try:
+        # Configure safety settings to be less restrictive for transcription
+        safety_settings = [ {"category": c, "threshold": "BLOCK_NONE"} for c in [
+                "HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_HATE_SPEECH",
+                "HARM_CATEGORY_SEXUALLY_EXPLICIT", "HARM_CATEGORY_DANGEROUS_CONTENT"
+        ]]
+        response = await key_scheduler.run(
+            lambda lease: lease.model(TRANSCRIPT_MODEL_NAME).generate_content_async(prompt, safety_settings=safety_settings)
+        )
 
 
-            if response.parts:
-                transcript = "".join(part.text for part in response.parts if hasattr(part, 'text'))
-                print(f"    [Transcript] Received transcript for: {video_url} (Length: {len(transcript)})")
-                return transcript.strip() if transcript else "[Transcript empty or model refused]"
-            elif response.prompt_feedback and response.prompt_feedback.block_reason:
-                 reason = response.prompt_feedback.block_reason.name
-                 print(f"    [Transcript] Failed for {video_url}: Blocked by model ({reason})")
-                 return f"[Transcript failed: Blocked by model ({reason})]"
-            else:
-                 # Check candidate for finish reason if no parts/feedback
-                 finish_reason = response.candidates[0].finish_reason.name if response.candidates else "UNKNOWN"
-                 print(f"    [Transcript] Failed for {video_url}: Reason: {finish_reason} (No parts/block feedback)")
-                 return f"[Transcript failed: {finish_reason}]"
+        if response.parts:
+            transcript = "".join(part.text for part in response.parts if hasattr(part, 'text'))
+            print(f"    [Transcript] Received transcript for: {video_url} (Length: {len(transcript)})")
+            if transcript.strip():
+                get_transcript_store().put(video_url, transcript.strip(), TRANSCRIPT_MODEL_NAME)
+            return transcript.strip() if transcript else "[Transcript empty or model refused]"
+        elif response.prompt_feedback and response.prompt_feedback.block_reason:
+             reason = response.prompt_feedback.block_reason.name
+             print(f"    [Transcript] Failed for {video_url}: Blocked by model ({reason})")
+             return f"[Transcript failed: Blocked by model ({reason})]"
+        else:
+             # Check candidate for finish reason if no parts/feedback
+             finish_reason = response.candidates[0].finish_reason.name if response.candidates else "UNKNOWN"
+             print(f"    [Transcript] Failed for {video_url}: Reason: {finish_reason} (No parts/block feedback)")
+             return f"[Transcript failed: {finish_reason}]"
 
 
-        except Exception as e:
-            error_str = str(e)
-            # Handle specific errors more gracefully
-            if "API key not valid" in error_str:
-                print(f"    [Transcript] Failed for {video_url}: Invalid API Key")
-                return "[Transcript failed: Invalid API Key]"
-            elif "429" in error_str or "ResourceExhausted" in error_str:
-                print(f"    [Transcript] Failed for {video_url}: Rate Limit/Quota Exceeded")
-                return "[Transcript failed: Rate Limit/Quota Exceeded]"
-            elif "Vertex AI API has not been used" in error_str:
-                 print(f"    [Transcript] Failed for {video_url}: Vertex AI API not enabled or initialized")
-                 return "[Transcript failed: Vertex AI API not enabled]"
-            elif "permission" in error_str.lower() or "access denied" in error_str.lower():
-                 print(f"    [Transcript] Failed for {video_url}: Permission Denied (Check API key permissions/billing)")
-                 return "[Transcript failed: Permission Denied]"
-            elif "File format is not supported" in error_str or "does not contain media" in error_str:
-                print(f"    [Transcript] Failed for {video_url}: Model cannot process this URL/format directly.")
-                return "[Transcript failed: Cannot process URL]"
-            else:
-                print(f"    [Transcript] Failed for {video_url}: {e}")
-                # Optionally log the full traceback for unexpected errors
-                # logger.error(f"Unexpected transcript error for {video_url}", exc_info=True)
-                return f"[Transcript failed: Unexpected Error ({type(e).__name__})]"
+    except Exception as e:
+        error_str = str(e)
+        # Handle specific errors more gracefully
+        if "API key not valid" in error_str:
+            print(f"    [Transcript] Failed for {video_url}: Invalid API Key")
+            return "[Transcript failed: Invalid API Key]"
+        elif "429" in error_str or "ResourceExhausted" in error_str:
+            print(f"    [Transcript] Failed for {video_url}: Rate Limit/Quota Exceeded")
+            return "[Transcript failed: Rate Limit/Quota Exceeded]"
+        elif "Vertex AI API has not been used" in error_str:
+             print(f"    [Transcript] Failed for {video_url}: Vertex AI API not enabled or initialized")
+             return "[Transcript failed: Vertex AI API not enabled]"
+        elif "permission" in error_str.lower() or "access denied" in error_str.lower():
+             print(f"    [Transcript] Failed for {video_url}: Permission Denied (Check API key permissions/billing)")
+             return "[Transcript failed: Permission Denied]"
+        elif "File format is not supported" in error_str or "does not contain media" in error_str:
+            print(f"    [Transcript] Failed for {video_url}: Model cannot process this URL/format directly.")
+            return "[Transcript failed: Cannot process URL]"
+        else:
+            print(f"    [Transcript] Failed for {video_url}: {e}")
+            # Optionally log the full traceback for unexpected errors
+            # logger.error(f"Unexpected transcript error for {video_url}", exc_info=True)
+            return f"[Transcript failed: Unexpected Error ({type(e).__name__})]"
 
 
 
 
-async def run_single_agent(browser: Browser, llm_instance: ChatGoogleGenerativeAI, task_prompt: str, semaphore: asyncio.Semaphore, chapter_title: str):
-    """Acquires semaphore, creates and runs a single agent task using the shared browser, returns result or exception."""
-    async with semaphore:
-        print(f"  [Agent Runner] Starting task for chapter: '{chapter_title}'...")
-        agent = None # Initialize agent to None
-        try:
+def make_agent_llm(api_key: str) -> ChatGoogleGenerativeAI:
+    """Agent LLM bound to one key of the pool (created once per key)."""
+    return ChatGoogleGenerativeAI(
+        model=AGENT_MODEL_NAME,
+        google_api_key=api_key,
+        temperature=0.4, # Slightly lower temp might help focus the agent
+        convert_system_message_to_human=True,
+        # Add request options if needed, e.g., timeout
+        # request_options={"timeout": 300}
+    )
+
+
+class PooledAgentLLM(ChatGoogleGenerativeAI):
+    """
+    Agent LLM that borrows a key from the pool for each call, not for the whole agent run.
+
+    Agents spend most of their time in the browser, so holding a key for the
+    run starved the transcript and relevance stages. Each completion is sent
+    through key_scheduler.run() on the per-key model, so a 429 retries that one
+    call on another key instead of restarting the agent. Bound tools and
+    structured output reach _agenerate as keyword arguments and are passed on.
+    """
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await pooled_agenerate(key_scheduler, "agent_llm", make_agent_llm, messages, stop=stop, **kwargs)
+
+
+# Shared by all agents. The key only satisfies the constructor; every call borrows one from the pool.
+agent_llm = PooledAgentLLM(model=AGENT_MODEL_NAME, google_api_key=api_keys[0], temperature=0.4,
+                           convert_system_message_to_human=True)
+
+
+async def run_single_agent(browser: Browser, browser_pool: BrowserContextPool, task_prompt: str, chapter_title: str):
+    """Borrows a browser context, creates and runs a single agent task, returns result or exception."""
+    try:
+        async with browser_pool.lease() as browser_context:
+            print(f"  [Agent Runner] Starting task for chapter: '{chapter_title}'...")
             # Create the agent instance INSIDE the task context, passing the shared browser
             print(f"    [Agent Runner] Instantiating Agent for '{chapter_title}'...")
             agent = Agent(
                 browser=browser, # Pass the shared browser instance
-                llm=llm_instance,
+                browser_context=browser_context, # Isolated context from the pool
+                llm=agent_llm, # Borrows a key per LLM call
                 task=task_prompt,
             )
             print(f"    [Agent Runner] Agent instantiated. Running task...")
@@ -305,24 +381,40 @@ async def run_single_agent(browser: Browser, llm_instance: ChatGoogleGenerativeA
             result = await agent.run()
             print(f"  [Agent Runner] Finished task for chapter: '{chapter_title}'")
             return result
-        except Exception as e:
-             print(f"  [Agent Runner] !!! Exception during agent run for chapter '{chapter_title}': {type(e).__name__} - {e}")
-             # Log the traceback for agent execution errors
-             # logger.error(f"Exception in agent run for '{chapter_title}'", exc_info=True)
-             # Return the exception itself to be handled later
-             return e
-        finally:
-            # Optional: Clean up agent-specific resources if needed, though browser is shared
-            if agent:
-                # Add any specific cleanup if the Agent class requires it
-                pass
-            print(f"  [Agent Runner] Semaphore released for chapter: '{chapter_title}'")
+    except Exception as e:
+         print(f"  [Agent Runner] !!! Exception during agent run for chapter '{chapter_title}': {type(e).__name__} - {e}")
+         # Log the traceback for agent execution errors
+         # logger.error(f"Exception in agent run for '{chapter_title}'", exc_info=True)
+         # Return the exception itself to be handled later
+         return e
+
+
+
+
+async def run_chapter_pipeline(browser: Browser, browser_pool: BrowserContextPool, task_prompts: dict[str, str], topic: str, run_state: RunState):
+    """Run every chapter through the streaming search -> transcript -> relevance pipeline (see chapter_pipeline.py)."""
+    print(f"[Pipeline] {key_scheduler.healthy_keys} healthy keys in the pool.")
+    return await chapter_pipeline.run_chapter_pipeline(
+        list(task_prompts),
+        search=lambda chapter_title: run_single_agent(browser, browser_pool, task_prompts[chapter_title], chapter_title),
+        transcribe=get_transcript,
+        analyze=lambda transcript_text, chapter_title: analyze_transcript_relevance(transcript_text, chapter_title, topic),
+        run_state=run_state,
+        search_concurrency=browser_pool.size,
+        transcript_concurrency=TRANSCRIPT_CONCURRENCY,
+        relevance_concurrency=RELEVANCE_CONCURRENCY,
+    )
 
 
 
 
 async def main():
     topic = input("Enter course topic: ")
+    run_state = RunState(topic, resume=RESUME)
+    if RESUME:
+        print(f"[Resume] Loaded {run_state.completed} completed stage results from {run_state.path}")
+    elif run_state.backup:
+        print(f"[Resume] Previous checkpoint moved to {run_state.backup} (rename it to {run_state.path} and pass --resume to continue it)")
 
 
     # --- Step 1: Initialize Shared Browser ---
@@ -343,35 +435,10 @@ async def main():
 
 
     # --- Step 2: Initialize LLMs ---
-    print(f"[Setup] Initializing LLM for overview ({OVERVIEW_MODEL_NAME})...")
-    model_gen = None
-    model_transcript = None
-    model_relevance = None
-    agent_llms = []
+    # Models are created per key on first use by the key pool (lease.model / lease.resource)
+    print(f"[Setup] Initializing LLMs ({OVERVIEW_MODEL_NAME}, {AGENT_MODEL_NAME}) on {len(api_keys)} pooled keys...")
     try:
-        # LLM for generating the overview (using the first API key)
-        genai.configure(api_key=api_keys[0])
-        model_gen = genai.GenerativeModel(OVERVIEW_MODEL_NAME)
-        print(f"[Setup] Initializing LLM for transcripts ({TRANSCRIPT_MODEL_NAME})...")
-        # Reconfigure if needed, or use the same config if key/model match
-        # genai.configure(api_key=api_keys[0]) # Assuming same key is okay
-        model_transcript = genai.GenerativeModel(TRANSCRIPT_MODEL_NAME)
-        print(f"[Setup] Initializing LLM for relevance analysis ({RELEVANCE_MODEL_NAME})...")
-        model_relevance = genai.GenerativeModel(RELEVANCE_MODEL_NAME)
-
-
-        print(f"[Setup] Initializing {NUM_CONCURRENT_AGENTS} LLM instances for agents ({AGENT_MODEL_NAME})...")
-        for i in range(NUM_CONCURRENT_AGENTS):
-            key_index = i % len(api_keys) # Cycle through available keys safely
-            llm = ChatGoogleGenerativeAI(
-                model=AGENT_MODEL_NAME,
-                google_api_key=api_keys[key_index],
-                temperature=0.4, # Slightly lower temp might help focus the agent
-                convert_system_message_to_human=True,
-                # Add request options if needed, e.g., timeout
-                # request_options={"timeout": 300}
-            )
-            agent_llms.append(llm)
+        genai.configure(api_key=api_keys[0]) # Default key for genai calls made outside the pool
         print(f"[Setup] LLMs initialized.")
     except Exception as e:
         print(f"\n[Setup] Error initializing Google Generative AI models: {e}")
@@ -392,11 +459,22 @@ async def main():
             "Focus on distinct learning units suitable for video lessons."
             "Do not add introductory or concluding sentences, just the list."
         )
-        response = await model_gen.generate_content_async(prompt) # Use async version
-        if response.parts:
-             course_overview = "".join(part.text for part in response.parts if hasattr(part, 'text')).strip()
+        # Reuse the overview generated for the same topic on an earlier run
+        # (a resumed run must reuse its own overview so the chapter list matches the checkpoint)
+        course_overview = run_state.get("overview") or get_cache().get(OVERVIEW_MODEL_NAME, prompt) or ""
+        if course_overview:
+            print("[Generator] Using cached course overview.")
         else:
-            raise Exception("Overview generation returned no content.")
+            response = await key_scheduler.run(
+                lambda lease: lease.model(OVERVIEW_MODEL_NAME).generate_content_async(prompt) # Use async version
+            )
+            if response.parts:
+                 course_overview = "".join(part.text for part in response.parts if hasattr(part, 'text')).strip()
+                 get_cache().set(OVERVIEW_MODEL_NAME, prompt, course_overview)
+            else:
+                raise Exception("Overview generation returned no content.")
+        if not run_state.get("overview"):
+            run_state.record("overview", course_overview)
         print("\n--- Generated Course Overview ---")
         print(course_overview)
         print("---------------------------------\n")
@@ -416,9 +494,8 @@ async def main():
     print(f"\n[Agent Setup] Found {len(chapters)} chapters. Preparing agents...")
 
 
-    # --- Step 5: Prepare and Run Agent Tasks Concurrently ---
-    semaphore = asyncio.Semaphore(NUM_CONCURRENT_AGENTS)
-    tasks = []
+    # --- Step 5: Prepare Agent Tasks ---
+    task_prompts = {}
 
 
     preferred_channels_list = get_preferred_channels(topic)
@@ -427,9 +504,6 @@ async def main():
 
 
     for i, chapter_title in enumerate(chapters):
-        llm_instance = agent_llms[i % NUM_CONCURRENT_AGENTS] # Cycle through LLMs/API keys
-
-
         # Define the specific task for the agent - MODIFIED FOR VERIFIED PREFERENCE
         task_prompt = (
             "INSTRUCTIONS:\n"
@@ -479,154 +553,23 @@ async def main():
 
         )
         print(f"  [Agent Setup] Creating agent for chapter {i+1}/{len(chapters)}: '{chapter_title}'")
+        task_prompts[chapter_title] = task_prompt
 
 
-        try:
-            # Create an asyncio task, passing the shared browser and other parameters
-            tasks.append(asyncio.create_task(run_single_agent(browser, llm_instance, task_prompt, semaphore, chapter_title)))
-        except Exception as e:
-             print(f"  [Agent Setup] Error creating agent task for chapter '{chapter_title}': {e}")
-             # Add a placeholder for failed task creation
-             async def failed_task_placeholder(error): return error
-             tasks.append(asyncio.create_task(failed_task_placeholder(RuntimeError(f"Agent task creation failed: {e}"))))
-
-
-
-
-    print(f"\n[Agent Runner] Starting {len(tasks)} agent tasks with concurrency limit {NUM_CONCURRENT_AGENTS}...")
-    # Run all tasks concurrently and wait for them to complete
-    results = await asyncio.gather(*tasks) # Exceptions within tasks are returned in the results list
-    print(f"\n[Agent Runner] All agent tasks finished.")
-
-
-    # --- Step 6: Process Results, Get Transcripts, Analyze Relevance ---
-    successful_tasks = 0
-    failed_tasks = 0
-    all_agent_results_status = {}
-    parsed_links_by_chapter = {}
-
-
-    # --- Step 6a: Collect Agent Results & Parse/Validate Links ---
-    print("\n[Processor] Collecting and processing agent results...")
-    for i, result_or_exc in enumerate(results):
-        chapter_title = chapters[i]
-        extracted_link = None
-        status_message = "[Processing Error]" # Default status
-
-
-        if isinstance(result_or_exc, Exception):
-            failed_tasks += 1
-            status_message = result_or_exc # Store the exception object
-            print(f"  - Chapter '{chapter_title}': Failed (Agent Execution Error: {result_or_exc})")
-        elif hasattr(result_or_exc, 'final_result'): # Check if it looks like the expected history object
-            successful_tasks += 1
-            try:
-                final_output_text = result_or_exc.final_result() # Expecting the URL string
-                if final_output_text and isinstance(final_output_text, str):
-                    potential_link = final_output_text.strip()
-                    status_message = potential_link # Store raw output
-
-
-                    # Validate the link format
-                    if (potential_link.startswith("https://www.youtube.com/watch?v=") or \
-                        potential_link.startswith("https://youtu.be/")) and \
-                       "/shorts/" not in potential_link and \
-                       len(potential_link) > 20: # Basic sanity check length
-                        extracted_link = potential_link
-                        print(f"  - Chapter '{chapter_title}': Success (Link Found: {extracted_link})")
-                    else:
-                        print(f"  - Chapter '{chapter_title}': Completed (Output not a valid YouTube link: '{potential_link}')")
-                        status_message = f"[Invalid Output: {potential_link}]" # Update status
-                else:
-                     print(f"  - Chapter '{chapter_title}': Completed (Agent returned empty or non-string result)")
-                     status_message = "[Agent Result Empty/Invalid]"
-            except Exception as e:
-                 print(f"  - Chapter '{chapter_title}': Completed (Error processing agent result: {e})")
-                 status_message = f"[Error processing result: {e}]"
-        else:
-            # Unexpected result type from gather
-            failed_tasks += 1
-            status_message = f"[Unexpected Result Type: {type(result_or_exc).__name__}]"
-            print(f"  - Chapter '{chapter_title}': Failed ({status_message})")
-
-
-        all_agent_results_status[chapter_title] = status_message
-        parsed_links_by_chapter[chapter_title] = [extracted_link] if extracted_link else []
-
-
-
-
-    # --- Step 6b: Generate Transcripts Concurrently ---
-    print("\n[Transcript] Preparing transcript generation...")
-    all_links_to_transcript = list(set(link for links in parsed_links_by_chapter.values() for link in links if link))
-    transcripts_by_link = {}
-    transcript_tasks = []
-    # Limit concurrency for transcript generation as well
-    transcript_semaphore = asyncio.Semaphore(NUM_CONCURRENT_AGENTS)
-
-
-    if all_links_to_transcript:
-        print(f"[Transcript] Found {len(all_links_to_transcript)} unique valid links to transcribe.")
-        for link in all_links_to_transcript:
-            transcript_tasks.append(
-                asyncio.create_task(get_transcript(model_transcript, link, transcript_semaphore))
-            )
-
-
-        print(f"[Transcript] Starting {len(transcript_tasks)} transcript tasks...")
-        transcript_results = await asyncio.gather(*transcript_tasks)
-        print("[Transcript] All transcript tasks finished.")
-        transcripts_by_link = dict(zip(all_links_to_transcript, transcript_results))
-    else:
-        print("[Transcript] No valid links found by agents to transcribe.")
-
-
-
-
-    # --- Step 6c: Analyze Transcript Relevance Concurrently ---
-    print("\n[Relevance] Preparing transcript relevance analysis...")
-    relevance_tasks = []
-    relevance_results_by_link = {}
-    # Reuse semaphore or create a new one if needed
-    relevance_semaphore = asyncio.Semaphore(NUM_CONCURRENT_AGENTS)
-    link_to_chapter_map = {link: ch for ch, links in parsed_links_by_chapter.items() for link in links if link}
-
-
-    if transcripts_by_link:
-        print(f"[Relevance] Creating analysis tasks for available transcripts...")
-        tasks_created = 0
-        for link, transcript_text in transcripts_by_link.items():
-            chapter_for_link = link_to_chapter_map.get(link)
-            # Check if transcript is valid and chapter mapping exists
-            if chapter_for_link and transcript_text and not transcript_text.startswith("[Transcript failed") and not transcript_text.startswith("[Transcript empty"):
-                 relevance_tasks.append(
-                     asyncio.create_task(analyze_transcript_relevance(
-                         model_relevance, # Use the dedicated relevance model
-                         transcript_text,
-                         chapter_for_link,
-                         topic,
-                         relevance_semaphore
-                     ))
-                 )
-                 tasks_created += 1
-            else:
-                 # Store placeholder for links with failed transcripts or mapping issues
-                 relevance_results_by_link[link] = "[Analysis Skipped: Invalid Transcript]"
-
-
-        if relevance_tasks:
-            print(f"[Relevance] Starting {len(relevance_tasks)} analysis tasks...")
-            analysis_results_list = await asyncio.gather(*relevance_tasks)
-            print("[Relevance] All analysis tasks finished.")
-
-
-            # Map results back to the links that were actually analyzed
-            analyzed_links = [link for link, transcript in transcripts_by_link.items() if link_to_chapter_map.get(link) and transcript and not transcript.startswith("[Transcript failed") and not transcript.startswith("[Transcript empty")]
-            relevance_results_by_link.update(dict(zip(analyzed_links, analysis_results_list)))
-        else:
-            print("[Relevance] No valid transcripts were available to analyze.")
-    else:
-        print("[Relevance] No transcripts were generated, skipping analysis.")
+    # --- Step 6: Search, Transcribe and Analyze Each Chapter as a Stream ---
+    # One isolated browser context per concurrent agent
+    # Each agent also needs a key, so there's no point in more contexts than the key pool can serve at once
+    browser_pool = BrowserContextPool(browser, size=min(key_scheduler.capacity, BROWSER_POOL_MAX_SIZE, len(chapters)))
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        print(f"\n[Setup] Error creating browser contexts: {e}")
+        if browser: await browser.close()
+        return
+    agent_outcomes, all_agent_results_status, parsed_links_by_chapter, transcripts_by_link, relevance_results_by_link = \
+        await run_chapter_pipeline(browser, browser_pool, task_prompts, topic, run_state)
+    successful_tasks = sum(1 for outcome in agent_outcomes.values() if outcome == "completed")
+    failed_tasks = len(agent_outcomes) - successful_tasks
 
 
 
@@ -693,10 +636,20 @@ async def main():
     print("-" * 20)
     print(f"Videos Assessed as 'Highly Relevant': {highly_relevant_count}")
     print(f"Videos Assessed as 'Moderately Relevant': {moderately_relevant_count}")
+    print("-" * 20)
+    print(f"LLM Cache: {format_stats(get_cache().stats())}")
+    print(f"API Keys: {format_key_stats(key_scheduler.stats())}")
+    print(f"Transcript Store: {format_store_stats(get_transcript_store().stats())}")
+    print(f"Relevance Pre-screen: {prescreen_stats.format()}")
+    print(f"Browser Pool: {format_pool_metrics(browser_pool.metrics())}")
     print("=" * 40 + "\n")
 
 
     # --- Step 7: Clean up Shared Browser ---
+    run_state.close()
+    await browser_pool.close()
+    try: await aclose_all() # Close pooled HTTP connections before the event loop shuts down
+    except Exception as close_err: print(f"[Cleanup] Error closing HTTP clients: {close_err}")
     if browser:
         print("\n[Cleanup] Closing shared browser...")
         await asyncio.sleep(0.5) # Increased sleep slightly
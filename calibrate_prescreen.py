@@ -0,0 +1,38 @@
+"""
+Calibrate the relevance pre-screen bands on labeled transcripts.
+
+Reads a JSONL file of {"transcript", "chapter_title", "course_topic", "label"}
+records, e.g. the LLM verdicts collected by running browser_use.py with
+PRESCREEN_LABEL_LOG=labels.jsonl, and prints the PRESCREEN_* settings for the
+loosest bands in which every locally labeled transcript agrees with its label,
+then how the current settings do on the same transcripts.
+
+Usage: python calibrate_prescreen.py [tests/data/prescreen_labeled.jsonl]
+"""
+import argparse
+from collections import Counter
+
+from relevance_prescreen import band_label, calibrate, load_labeled, score_transcript
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('path', nargs='?', default='tests/data/prescreen_labeled.jsonl')
+    args = parser.parse_args()
+
+    samples = load_labeled(args.path)
+    result = calibrate(samples)
+    print(f"{len(samples)} labeled transcripts, {result['samples']} long enough to pre-screen")
+    for name in ('PRESCREEN_HIGH_COVERAGE', 'PRESCREEN_HIGH_SCORE', 'PRESCREEN_LOW_COVERAGE', 'PRESCREEN_LOW_SCORE'):
+        print(f"{name}={result[name]:.2f}")
+    print(f"high band labels {result['high_labeled']}, low band labels {result['low_labeled']}")
+
+    outcomes = Counter()
+    for sample in samples:
+        label = band_label(score_transcript(sample['transcript'], sample['chapter_title'], sample['course_topic']))
+        outcomes['escalated' if label is None else 'agree' if label == sample['label'] else 'disagree'] += 1
+    print(f"current settings: {outcomes['agree']} agree, {outcomes['disagree']} disagree, {outcomes['escalated']} escalated")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Transcript fast path: read a video's public caption track instead of asking an LLM.
+
+The watch page embeds ytInitialPlayerResponse, which lists the available
+caption tracks (uploaded and auto-generated). The best track is downloaded
+from its timedtext URL and flattened to plain text. Both timedtext XML
+(srv1 <text> and srv3 <p> formats) and json3 are understood. Only English
+captions are used: an English track (uploaded or auto-generated) if there is
+one, otherwise a translatable track fetched with YouTube's auto-translation
+to English (tlang=en). Returns None when neither exists, so callers can fall
+back to the LLM.
+"""
+
+import html
+import json
+import re
+import xml.etree.ElementTree as ET
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+import httpx
+
+from http_clients import get_async_client
+from transcript_store import canonical_video_id
+
+
+YOUTUBE_URL = "https://www.youtube.com"
+PREFERRED_CAPTION_LANGUAGES = ("en", "en-US", "en-GB")
+TRANSLATION_LANGUAGE = "en" # tlang for tracks in other languages
+CAPTION_HEADERS = {
+    "Accept-Language": "en-US,en;q=0.9",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Cookie": "CONSENT=YES+1", # Skip the EU consent interstitial
+}
+PLAYER_RESPONSE_MARKER = "ytInitialPlayerResponse"
+
+
+def extract_caption_tracks(watch_html: str) -> list[dict]:
+    """Return the captionTracks list from a watch page's ytInitialPlayerResponse (empty if none)."""
+    start = watch_html.find(PLAYER_RESPONSE_MARKER)
+    if start == -1:
+        return []
+    brace = watch_html.find("{", start)
+    if brace == -1:
+        return []
+    try:
+        player_response, _ = json.JSONDecoder().raw_decode(watch_html, brace)
+    except ValueError:
+        return []
+    renderer = (player_response.get("captions") or {}).get("playerCaptionsTracklistRenderer") or {}
+    return renderer.get("captionTracks") or []
+
+
+def _with_query(url: str, **params) -> str:
+    parts = urlparse(url)
+    query = dict(parse_qsl(parts.query))
+    query.update(params)
+    return urlunparse(parts._replace(query=urlencode(query)))
+
+
+def choose_caption_track(tracks: list[dict], languages=PREFERRED_CAPTION_LANGUAGES) -> dict | None:
+    """
+    Pick the caption track to read, or None if there is no usable one.
+
+    Tracks in the preferred languages win, uploaded before auto-generated
+    (kind == 'asr'). Failing that, a translatable track is returned with
+    tlang=TRANSLATION_LANGUAGE added to its baseUrl, so YouTube translates it.
+    Tracks in other languages are never returned as they are.
+    """
+    def language_rank(track):
+        code = track.get("languageCode", "")
+        return next((i for i, lang in enumerate(languages) if code == lang or code.startswith(lang + "-")), None)
+
+    preferred = [track for track in tracks if language_rank(track) is not None]
+    if preferred:
+        return min(preferred, key=lambda track: (language_rank(track), track.get("kind") == "asr"))
+    translatable = [track for track in tracks if track.get("isTranslatable") and track.get("baseUrl")]
+    if not translatable:
+        return None
+    track = min(translatable, key=lambda track: track.get("kind") == "asr")
+    return {**track, "baseUrl": _with_query(track["baseUrl"], tlang=TRANSLATION_LANGUAGE)}
+
+
+def _clean(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def parse_timedtext_xml(xml_text: str) -> str:
+    """Flatten timedtext XML (<transcript><text> or <timedtext><body><p>) into plain text."""
+    root = ET.fromstring(xml_text)
+    # srv1 text is entity-encoded inside the XML (&amp;#39;); the parser decodes the outer level
+    lines = [_clean(html.unescape("".join(node.itertext()))) for node in root.iter() if node.tag in ("text", "p")]
+    return "\n".join(line for line in lines if line)
+
+
+def parse_json3(json_text: str) -> str:
+    """Flatten a json3 caption document (events -> segs -> utf8) into plain text."""
+    data = json.loads(json_text)
+    lines = []
+    for event in data.get("events") or []:
+        line = _clean("".join(seg.get("utf8", "") for seg in event.get("segs") or []))
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def parse_caption_document(body: str) -> str:
+    """Parse a caption download in whichever supported format it arrived."""
+    body = body.lstrip()
+    if body.startswith("{"):
+        return parse_json3(body)
+    return parse_timedtext_xml(body)
+
+
+async def fetch_caption_transcript(video_url: str) -> str | None:
+    """
+    Return the caption text of a YouTube video, or None if it has no captions
+    (or the page could not be read). Never raises for network or parse errors.
+    """
+    video_id = canonical_video_id(video_url)
+    if video_id is None:
+        return None
+    client = get_async_client(YOUTUBE_URL)
+    try:
+        page = await client.get(f"{YOUTUBE_URL}/watch", params={"v": video_id}, headers=CAPTION_HEADERS)
+        page.raise_for_status()
+        track = choose_caption_track(extract_caption_tracks(page.text))
+        if track is None or not track.get("baseUrl"):
+            return None
+        captions = await client.get(track["baseUrl"], headers=CAPTION_HEADERS)
+        captions.raise_for_status()
+        text = parse_caption_document(captions.text)
+    except (httpx.HTTPError, ET.ParseError, ValueError) as e:
+        print(f"    [Captions] Could not read captions for {video_id}: {e}")
+        return None
+    return text or None
@@ -0,0 +1,191 @@
+"""
+Per-chapter streaming pipeline for course sourcing (browser_use.py).
+
+Every chapter flows through search -> transcript -> relevance on its own.
+Stages are connected by bounded queues and each has its own worker count, so
+a chapter moves on as soon as its agent finishes instead of waiting for the
+slowest agent of the whole course. The stages themselves (browser agent,
+transcript sources, relevance LLM) are passed in as coroutine functions, so
+the pipeline can be run with stubs.
+"""
+
+import asyncio
+
+from transcript_store import canonical_video_id
+
+
+STAGE_QUEUE_SIZE = 20 # Bound on items waiting between stages
+
+
+def process_agent_result(chapter_title: str, result_or_exc) -> tuple[str, object, str | None]:
+    """
+    Classifies an agent result and validates the returned link.
+    Returns (outcome, status_message, extracted_link) where outcome is "completed" or "failed".
+    """
+    extracted_link = None
+    status_message = "[Processing Error]" # Default status
+    outcome = "failed" if isinstance(result_or_exc, Exception) or not hasattr(result_or_exc, 'final_result') else "completed"
+
+
+    if isinstance(result_or_exc, Exception):
+        status_message = result_or_exc # Store the exception object
+        print(f"  - Chapter '{chapter_title}': Failed (Agent Execution Error: {result_or_exc})")
+    elif hasattr(result_or_exc, 'final_result'): # Check if it looks like the expected history object
+        try:
+            final_output_text = result_or_exc.final_result() # Expecting the URL string
+            if final_output_text and isinstance(final_output_text, str):
+                potential_link = final_output_text.strip()
+                status_message = potential_link # Store raw output
+
+
+                # Validate the link format
+                if (potential_link.startswith("https://www.youtube.com/watch?v=") or \
+                    potential_link.startswith("https://youtu.be/")) and \
+                   "/shorts/" not in potential_link and \
+                   len(potential_link) > 20: # Basic sanity check length
+                    extracted_link = potential_link
+                    print(f"  - Chapter '{chapter_title}': Success (Link Found: {extracted_link})")
+                else:
+                    print(f"  - Chapter '{chapter_title}': Completed (Output not a valid YouTube link: '{potential_link}')")
+                    status_message = f"[Invalid Output: {potential_link}]" # Update status
+            else:
+                 print(f"  - Chapter '{chapter_title}': Completed (Agent returned empty or non-string result)")
+                 status_message = "[Agent Result Empty/Invalid]"
+        except Exception as e:
+             print(f"  - Chapter '{chapter_title}': Completed (Error processing agent result: {e})")
+             status_message = f"[Error processing result: {e}]"
+    else:
+        # Unexpected result type from gather
+        status_message = f"[Unexpected Result Type: {type(result_or_exc).__name__}]"
+        print(f"  - Chapter '{chapter_title}': Failed ({status_message})")
+
+
+    return outcome, status_message, extracted_link
+
+
+def is_valid_transcript(transcript_text: str) -> bool:
+    return bool(transcript_text) and not transcript_text.startswith("[Transcript failed") and not transcript_text.startswith("[Transcript empty")
+
+
+async def run_chapter_pipeline(chapters: list[str], search, transcribe, analyze, run_state,
+                               search_concurrency: int, transcript_concurrency: int, relevance_concurrency: int,
+                               queue_size: int = STAGE_QUEUE_SIZE):
+    """
+    Stream every chapter through search -> transcript -> relevance independently.
+
+    search(chapter_title) returns the agent result (or the exception it raised),
+    transcribe(link) the transcript text or a "[Transcript failed ...]" message, and
+    analyze(transcript, chapter_title) the relevance verdict. Transcripts and relevance
+    verdicts are computed once per link even if several chapters find the same video.
+    Every successful stage result is checkpointed to run_state; stages already
+    recorded there (when resuming) are not run again. An exception in one chapter's
+    stage is recorded as that chapter's failure and never stops the other workers, so
+    the bounded queues can't fill up with nobody left to drain them.
+    Returns (agent_outcomes, agent_results_status, parsed_links_by_chapter, transcripts_by_link, relevance_results_by_link).
+    """
+    agent_outcomes = {}
+    agent_results_status = {}
+    parsed_links_by_chapter = {}
+    transcripts_by_link = {}
+    relevance_results_by_link = {}
+    transcript_jobs = {} # video ID -> task, so duplicate links (in any URL form) share one transcript
+    relevance_jobs = {} # link -> task, so duplicate links share one analysis
+
+    chapter_queue = asyncio.Queue()
+    transcript_queue = asyncio.Queue(maxsize=queue_size)
+    relevance_queue = asyncio.Queue(maxsize=queue_size)
+    for chapter_title in chapters:
+        chapter_queue.put_nowait(chapter_title)
+
+    async def search_worker():
+        while not chapter_queue.empty():
+            chapter_title = chapter_queue.get_nowait()
+            recorded = run_state.get("search", chapter_title)
+            if recorded:
+                outcome, status_message, link = "completed", recorded["link"], recorded["link"]
+                print(f"  - Chapter '{chapter_title}': Resumed (Link Found: {link})")
+            else:
+                try:
+                    result_or_exc = await search(chapter_title)
+                except Exception as e:
+                    result_or_exc = e
+                outcome, status_message, link = process_agent_result(chapter_title, result_or_exc)
+                if link:
+                    run_state.record("search", {"link": link}, chapter_title)
+            agent_outcomes[chapter_title] = outcome
+            agent_results_status[chapter_title] = status_message
+            parsed_links_by_chapter[chapter_title] = [link] if link else []
+            if link:
+                await transcript_queue.put((chapter_title, link))
+
+    async def safe_transcribe(link):
+        try:
+            return await transcribe(link)
+        except Exception as e:
+            print(f"    [Transcript] Failed for {link}: {e}")
+            return f"[Transcript failed: Unexpected Error ({type(e).__name__})]"
+
+    async def safe_analyze(transcript_text, chapter_title):
+        try:
+            return await analyze(transcript_text, chapter_title)
+        except Exception as e:
+            print(f"    [Relevance] Analysis failed for '{chapter_title}': {e}")
+            return f"[Analysis Failed: {type(e).__name__}]"
+
+    async def transcript_worker():
+        while (item := await transcript_queue.get()) is not None:
+            chapter_title, link = item
+            recorded = run_state.get("transcript", chapter_title)
+            if recorded and recorded["link"] == link:
+                transcripts_by_link[link] = recorded["text"]
+            else:
+                video_id = canonical_video_id(link) or link
+                if video_id not in transcript_jobs:
+                    transcript_jobs[video_id] = asyncio.ensure_future(safe_transcribe(link))
+                transcripts_by_link[link] = await transcript_jobs[video_id]
+                if is_valid_transcript(transcripts_by_link[link]):
+                    run_state.record("transcript", {"link": link, "text": transcripts_by_link[link]}, chapter_title)
+            await relevance_queue.put((chapter_title, link))
+
+    async def relevance_worker():
+        while (item := await relevance_queue.get()) is not None:
+            chapter_title, link = item
+            transcript_text = transcripts_by_link[link]
+            if not is_valid_transcript(transcript_text):
+                # Store placeholder for links with failed transcripts
+                relevance_results_by_link[link] = "[Analysis Skipped: Invalid Transcript]"
+                continue
+            recorded = run_state.get("relevance", chapter_title)
+            if recorded and recorded["link"] == link:
+                relevance_results_by_link[link] = recorded["verdict"]
+                continue
+            if link not in relevance_jobs:
+                relevance_jobs[link] = asyncio.ensure_future(safe_analyze(transcript_text, chapter_title))
+            relevance_results_by_link[link] = await relevance_jobs[link]
+            if not relevance_results_by_link[link].startswith("["): # Failures look like "[Analysis Failed: ...]"
+                run_state.record("relevance", {"link": link, "verdict": relevance_results_by_link[link]}, chapter_title)
+
+    print(f"\n[Pipeline] Streaming {len(chapters)} chapters: {search_concurrency} search / {transcript_concurrency} transcript / "
+          f"{relevance_concurrency} relevance workers...")
+    transcript_workers = [asyncio.create_task(transcript_worker()) for _ in range(max(1, transcript_concurrency))]
+    relevance_workers = [asyncio.create_task(relevance_worker()) for _ in range(max(1, relevance_concurrency))]
+    # Shut the stages down in order: once a stage is drained, send one sentinel per downstream worker
+    await asyncio.gather(*(search_worker() for _ in range(max(1, min(search_concurrency, len(chapters))))))
+    print("[Pipeline] All agent tasks finished.")
+    for _ in transcript_workers:
+        await transcript_queue.put(None)
+    await asyncio.gather(*transcript_workers)
+    print("[Pipeline] All transcript tasks finished.")
+    for _ in relevance_workers:
+        await relevance_queue.put(None)
+    await asyncio.gather(*relevance_workers)
+    print("[Pipeline] All analysis tasks finished.")
+
+    # Workers fill the dicts in completion order; hand them back in chapter order, as the sequential run did
+    agent_outcomes = {c: agent_outcomes[c] for c in chapters}
+    agent_results_status = {c: agent_results_status[c] for c in chapters}
+    parsed_links_by_chapter = {c: parsed_links_by_chapter[c] for c in chapters}
+    links = list(dict.fromkeys(link for c in chapters for link in parsed_links_by_chapter[c]))
+    transcripts_by_link = {link: transcripts_by_link[link] for link in links}
+    relevance_results_by_link = {link: relevance_results_by_link[link] for link in links}
+    return agent_outcomes, agent_results_status, parsed_links_by_chapter, transcripts_by_link, relevance_results_by_link
@@ -1,5 +1,5 @@
 import sqlite3
-from website import app, db
+from website import create_app, db
 from website.models import LearningPath, Course, User, CSInterest, CSInterestSurvey
 from flask import Flask
 
@@ -43,6 +43,8 @@ def check_table_structure(db_path, table_name):
 if __name__ == "__main__":
     check_table_structure('instance/database.db', 'user')
 
+app = create_app()
+
 # Run this inside the Flask app context
 with app.app_context():
     # Check if tables exist
@@ -0,0 +1,98 @@
+"""
+Shared, pooled HTTP clients for all outbound LLM and API traffic.
+
+Creating a client per call pays a fresh TCP + TLS handshake every time. This
+registry hands out one keep-alive client per host instead, with bounded
+connection pools, per-host timeouts and optional HTTP/2 (when the `h2`
+package is installed). Close everything on shutdown with close_all() /
+aclose_all().
+"""
+
+import atexit
+import importlib.util
+import os
+import threading
+from urllib.parse import urlparse
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 20))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 10))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30)) # Seconds an idle connection is kept
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1" and importlib.util.find_spec("h2") is not None
+
+DEFAULT_TIMEOUT = 30.0
+# Per-host timeouts in seconds: (connect, read). LLM completions can take a while to produce.
+HOST_TIMEOUTS = {
+    "openrouter.ai": (10.0, 120.0),
+    "www.googleapis.com": (5.0, 15.0),
+    "www.youtube.com": (5.0, 15.0),
+}
+
+
+def timeout_for(url: str) -> tuple[float, float]:
+    """Return the (connect, read) timeout configured for the URL's host."""
+    host = (urlparse(url).hostname or "").lower()
+    return HOST_TIMEOUTS.get(host, (DEFAULT_TIMEOUT, DEFAULT_TIMEOUT))
+
+
+_lock = threading.Lock()
+_async_clients: dict[str, httpx.AsyncClient] = {}
+_session: requests.Session | None = None
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    """Return the shared async client for the host of `url`, creating it on first use."""
+    parsed = urlparse(url)
+    origin = f"{parsed.scheme}://{parsed.netloc}"
+    with _lock:
+        client = _async_clients.get(origin)
+        if client is None or client.is_closed:
+            connect, read = timeout_for(url)
+            client = httpx.AsyncClient(
+                http2=HTTP2_ENABLED,
+                limits=httpx.Limits(
+                    max_connections=HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(read, connect=connect),
+            )
+            _async_clients[origin] = client
+        return client
+
+
+def get_session() -> requests.Session:
+    """Return the shared keep-alive requests session for synchronous code (the Flask app)."""
+    global _session
+    with _lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_MAX_KEEPALIVE, pool_maxsize=HTTP_MAX_CONNECTIONS)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+async def aclose_all():
+    """Close every async client. Call before the event loop shuts down."""
+    with _lock:
+        clients = list(_async_clients.values())
+        _async_clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def close_all():
+    """Close the synchronous session."""
+    global _session
+    with _lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+atexit.register(close_all)
@@ -0,0 +1,310 @@
+"""
+Adaptive scheduler for a pool of Google API keys.
+
+Every stage of the pipeline (overview, search agents, transcripts, relevance)
+borrows a key from the same pool instead of pinning work to one key. Each key
+has its own token bucket (requests per minute) and an AIMD concurrency limit:
+the limit grows slowly while calls succeed and is halved, with an exponential
+cooldown, when the key hits a 429 / ResourceExhausted. Keys rejected as invalid
+are quarantined for the rest of the run. Throughput therefore scales with the
+number of healthy keys instead of stalling on the busiest one.
+"""
+
+import asyncio
+import os
+import time
+
+
+KEY_REQUESTS_PER_MINUTE = float(os.getenv("KEY_REQUESTS_PER_MINUTE", 15)) # Free-tier Gemini Flash quota
+KEY_BURST = float(os.getenv("KEY_BURST", 3)) # Token bucket capacity
+KEY_INITIAL_CONCURRENCY = float(os.getenv("KEY_INITIAL_CONCURRENCY", 1))
+KEY_MAX_CONCURRENCY = float(os.getenv("KEY_MAX_CONCURRENCY", 4))
+KEY_BACKOFF_BASE = float(os.getenv("KEY_BACKOFF_BASE", 2)) # Seconds of cooldown after the first 429
+KEY_BACKOFF_MAX = float(os.getenv("KEY_BACKOFF_MAX", 60))
+KEY_MAX_ATTEMPTS = int(os.getenv("KEY_MAX_ATTEMPTS", 3)) # Keys tried per call before giving up
+
+
+class NoHealthyKeysError(RuntimeError):
+    """Raised when every key in the pool has been quarantined."""
+
+
+def classify_error(error) -> str | None:
+    """Return 'rate_limit', 'invalid_key' or None for an API exception (or error string)."""
+    text = str(error)
+    name = type(error).__name__
+    if "429" in text or "ResourceExhausted" in text or "quota" in text.lower() or name in ("ResourceExhausted", "TooManyRequests"):
+        return "rate_limit"
+    if "API key not valid" in text or "API_KEY_INVALID" in text or "API key expired" in text:
+        return "invalid_key"
+    return None
+
+
+class GeminiModel:
+    """
+    A Gemini model bound to one key, with the generate_content_async() subset the pipeline uses.
+
+    google.generativeai only has a process-wide key (genai.configure()), so
+    this builds its own public google.ai.generativelanguage client per key and
+    wraps the responses in the SDK's response type (.parts, .prompt_feedback,
+    .candidates work as before).
+    """
+
+    def __init__(self, model_name: str, api_key: str):
+        import google.ai.generativelanguage as glm
+
+        self._glm = glm
+        self.model_name = model_name if model_name.startswith("models/") else f"models/{model_name}"
+        self._client = glm.GenerativeServiceAsyncClient(client_options={"api_key": api_key})
+
+    async def generate_content_async(self, prompt: str, safety_settings: list[dict] | None = None):
+        from google.generativeai import types
+
+        glm = self._glm
+        request = glm.GenerateContentRequest(
+            model=self.model_name,
+            contents=[glm.Content(role="user", parts=[glm.Part(text=prompt)])],
+            safety_settings=[
+                glm.SafetySetting(category=glm.HarmCategory[setting["category"]],
+                                  threshold=glm.SafetySetting.HarmBlockThreshold[setting["threshold"]])
+                for setting in safety_settings or []
+            ],
+        )
+        response = await self._client.generate_content(request=request)
+        return types.AsyncGenerateContentResponse.from_response(response)
+
+
+def gemini_model(model_name: str, api_key: str) -> GeminiModel:
+    """A Gemini model bound to its own key rather than the global genai.configure() key."""
+    return GeminiModel(model_name, api_key)
+
+
+async def pooled_agenerate(scheduler: "KeyScheduler", name: str, factory, messages, stop=None, **kwargs):
+    """
+    Run one langchain chat generation on a key borrowed for just this call.
+    factory(key) builds the per-key chat model (cached on the scheduler as `name`). Its
+    _agenerate() gets the messages and any bound tools / structured-output kwargs.
+    """
+    return await scheduler.run(lambda lease: lease.resource(name, factory)._agenerate(messages, stop=stop, **kwargs))
+
+
+class KeyState:
+    """Bucket, concurrency limit and counters for a single key."""
+
+    def __init__(self, index: int, key: str, rate: float, burst: float, limit: float):
+        self.index = index
+        self.key = key
+        self.rate = rate / 60.0 # Tokens per second
+        self.burst = burst
+        self.tokens = burst
+        self.limit = limit
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.consecutive_throttles = 0
+        self.quarantined = False
+        self.requests = 0
+        self.successes = 0
+        self.throttles = 0
+        self.failures = 0
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, now: float) -> float | None:
+        """Seconds until this key can take a request, 0 if it can now, None if it waits on a release."""
+        if now < self.cooldown_until:
+            return self.cooldown_until - now
+        if self.in_flight >= int(self.limit):
+            return None
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return 0.0
+
+
+class KeyLease:
+    """A borrowed key. Use as an async context manager; errors raised inside are reported automatically."""
+
+    def __init__(self, scheduler: "KeyScheduler", state: KeyState):
+        self._scheduler = scheduler
+        self._state = state
+        self._outcome = None
+        self._released = False
+
+    @property
+    def key(self) -> str:
+        return self._state.key
+
+    @property
+    def index(self) -> int:
+        return self._state.index
+
+    def resource(self, name: str, factory):
+        """Return a per-key object (model, LLM client), creating it with factory(key) on first use."""
+        return self._scheduler._resource(self._state, name, factory)
+
+    def model(self, model_name: str):
+        """The Gemini model `model_name` bound to this lease's key."""
+        return self.resource(f"gemini:{model_name}", lambda key: gemini_model(model_name, key))
+
+    def report(self, error):
+        """Record the outcome of a failed call made with this key."""
+        self._outcome = classify_error(error) or "error"
+
+    async def release(self):
+        if not self._released:
+            self._released = True
+            await self._scheduler._release(self._state, self._outcome or "success")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc is not None and self._outcome is None:
+            self.report(exc)
+        await self.release()
+        return False
+
+
+class KeyScheduler:
+    """Hands out API keys under per-key rate and AIMD concurrency limits."""
+
+    def __init__(self, keys: list[str], requests_per_minute: float = KEY_REQUESTS_PER_MINUTE,
+                 burst: float = KEY_BURST, initial_concurrency: float = KEY_INITIAL_CONCURRENCY,
+                 max_concurrency: float = KEY_MAX_CONCURRENCY):
+        if not keys:
+            raise ValueError("KeyScheduler needs at least one API key.")
+        self.max_concurrency = max_concurrency
+        self._states = [KeyState(i, key, requests_per_minute, burst, initial_concurrency) for i, key in enumerate(keys)]
+        self._resources = {}
+        self._cond = asyncio.Condition()
+
+    @property
+    def healthy_keys(self) -> int:
+        return sum(1 for state in self._states if not state.quarantined)
+
+    @property
+    def capacity(self) -> int:
+        """Upper bound on concurrent calls across all healthy keys."""
+        return int(self.healthy_keys * self.max_concurrency)
+
+    def _resource(self, state: KeyState, name: str, factory):
+        cache_key = (state.index, name)
+        if cache_key not in self._resources:
+            self._resources[cache_key] = factory(state.key)
+        return self._resources[cache_key]
+
+    def _pick(self, now: float):
+        """Return (state, None) for the best available key, or (None, seconds to wait)."""
+        best, wait = None, None
+        for state in self._states:
+            if state.quarantined:
+                continue
+            state.refill(now)
+            state_wait = state.wait_time(now)
+            if state_wait == 0.0:
+                # Prefer the key with the most spare concurrency, then the fullest bucket
+                rank = (state.in_flight / state.limit, -state.tokens)
+                if best is None or rank < best[0]:
+                    best = (rank, state)
+            elif state_wait is not None:
+                wait = state_wait if wait is None else min(wait, state_wait)
+        return (best[1], None) if best else (None, wait)
+
+    async def acquire(self) -> KeyLease:
+        """Wait until a key is available and borrow it."""
+        async with self._cond:
+            while True:
+                if not self.healthy_keys:
+                    raise NoHealthyKeysError("All API keys are quarantined (invalid or revoked).")
+                state, wait = self._pick(time.monotonic())
+                if state is not None:
+                    state.tokens -= 1
+                    state.in_flight += 1
+                    state.requests += 1
+                    return KeyLease(self, state)
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    def lease(self):
+        """`async with scheduler.lease() as lease:` borrows a key for the block."""
+        return _LeaseContext(self)
+
+    async def _release(self, state: KeyState, outcome: str):
+        async with self._cond:
+            state.in_flight -= 1
+            if outcome == "success":
+                state.successes += 1
+                state.consecutive_throttles = 0
+                # Additive increase: roughly +1 slot per `limit` successful calls
+                state.limit = min(self.max_concurrency, state.limit + 1 / state.limit)
+            elif outcome == "rate_limit":
+                state.throttles += 1
+                state.consecutive_throttles += 1
+                # Multiplicative decrease plus an exponential cooldown for this key only
+                state.limit = max(1.0, state.limit / 2)
+                state.tokens = 0.0
+                backoff = min(KEY_BACKOFF_MAX, KEY_BACKOFF_BASE * 2 ** (state.consecutive_throttles - 1))
+                state.cooldown_until = time.monotonic() + backoff
+                print(f"  [Keys] Key #{state.index + 1} rate limited, cooling down {backoff:.1f}s (limit {state.limit:.1f})")
+            elif outcome == "invalid_key":
+                state.failures += 1
+                if not state.quarantined:
+                    state.quarantined = True
+                    print(f"  [Keys] Key #{state.index + 1} rejected as invalid, quarantined ({self.healthy_keys} healthy keys left)")
+            else:
+                state.failures += 1
+            self._cond.notify_all()
+
+    async def run(self, call, max_attempts: int = KEY_MAX_ATTEMPTS):
+        """
+        Await call(lease) with a borrowed key. Rate-limited or invalid keys are
+        reported and the call is retried on another key, up to max_attempts.
+        """
+        for attempt in range(1, max_attempts + 1):
+            async with self.lease() as lease:
+                try:
+                    return await call(lease)
+                except Exception as e:
+                    lease.report(e)
+                    if classify_error(e) is None or attempt == max_attempts:
+                        raise
+
+    def stats(self) -> list[dict]:
+        return [
+            {
+                "key": state.index + 1,
+                "requests": state.requests,
+                "successes": state.successes,
+                "throttles": state.throttles,
+                "failures": state.failures,
+                "limit": round(state.limit, 1),
+                "quarantined": state.quarantined,
+            }
+            for state in self._states
+        ]
+
+
+class _LeaseContext:
+    def __init__(self, scheduler: KeyScheduler):
+        self._scheduler = scheduler
+        self._lease = None
+
+    async def __aenter__(self) -> KeyLease:
+        self._lease = await self._scheduler.acquire()
+        return self._lease
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return await self._lease.__aexit__(exc_type, exc, tb)
+
+
+def format_key_stats(stats: list[dict]) -> str:
+    healthy = sum(1 for s in stats if not s["quarantined"])
+    parts = [
+        f"#{s['key']}: {s['successes']}/{s['requests']} ok, {s['throttles']} throttled"
+        + (" (quarantined)" if s["quarantined"] else f", limit {s['limit']}")
+        for s in stats
+    ]
+    return f"{healthy}/{len(stats)} healthy keys; " + "; ".join(parts)
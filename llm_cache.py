@@ -0,0 +1,228 @@
+"""
+Persistent LLM response cache shared by the web chat, browser_use.py and manim.py.
+
+Responses are keyed by (model, normalized prompt, parameters) and stored in a
+local SQLite file. Entries expire after a TTL and the least recently used ones
+are evicted once the cache exceeds its entry or size limits.
+
+Lookups don't write. Hits only record the LRU touch and the counters in
+memory. These are flushed in one transaction every LLM_CACHE_FLUSH_INTERVAL
+seconds or LLM_CACHE_FLUSH_EVERY lookups, on set(), stats() and close(), and
+at exit.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 100 * 1024 * 1024))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 30 * 24 * 3600)) # Seconds
+LLM_CACHE_FLUSH_INTERVAL = float(os.getenv("LLM_CACHE_FLUSH_INTERVAL", 30)) # Seconds between writes of deferred LRU touches
+LLM_CACHE_FLUSH_EVERY = int(os.getenv("LLM_CACHE_FLUSH_EVERY", 100)) # Lookups between writes of deferred LRU touches
+
+
+def normalize_prompt(prompt) -> str:
+    """Collapse whitespace so formatting-only differences map to the same key. Accepts a string or a chat message list."""
+    if isinstance(prompt, str):
+        return re.sub(r"\s+", " ", prompt).strip()
+    return json.dumps(
+        [{"role": m.get("role"), "content": normalize_prompt(m.get("content") or "")} for m in prompt],
+        sort_keys=True,
+    )
+
+
+def make_key(model: str, prompt, params: dict | None = None) -> str:
+    """Stable cache key for a (model, prompt, parameters) triple."""
+    material = json.dumps(
+        {"model": model, "prompt": normalize_prompt(prompt), "params": params or {}},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite-backed response cache with TTLs, LRU eviction and hit/miss counters."""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 max_bytes: int = LLM_CACHE_MAX_BYTES, default_ttl: int = LLM_CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._touched = {} # key -> last access not yet written
+        self._pending_counts = {} # Lifetime counter increments not yet written
+        self._pending_lookups = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_last_access ON llm_cache (last_access)")
+        # Lifetime counters, so statistics survive across runs and processes
+        self._conn.execute("CREATE TABLE IF NOT EXISTS llm_cache_stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+
+    def get(self, model: str, prompt, params: dict | None = None) -> str | None:
+        """Return the cached response, or None on a miss or expired entry."""
+        key = make_key(model, prompt, params)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[1] > now:
+                self.hits += 1
+                self._touched[key] = now
+                self._count("hits")
+                return row[0]
+            if row:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._touched.pop(key, None)
+                self._conn.commit()
+            self.misses += 1
+            self._count("misses")
+            return None
+
+    def set(self, model: str, prompt, response: str, params: dict | None = None, ttl: int | None = None):
+        """Store a response and evict least recently used entries if over the limits."""
+        if not response:
+            return
+        key = make_key(model, prompt, params)
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, size, created_at, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, now, now + (ttl or self.default_ttl), now),
+            )
+            self._touched.pop(key, None)
+            self._write_pending()
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            evicted += 1
+        self.evictions += evicted
+        self._bump("evictions", evicted)
+
+    def _count(self, name: str):
+        # Caller holds the lock
+        self._pending_counts[name] = self._pending_counts.get(name, 0) + 1
+        self._pending_lookups += 1
+        if (self._pending_lookups >= LLM_CACHE_FLUSH_EVERY
+                or time.monotonic() - self._last_flush >= LLM_CACHE_FLUSH_INTERVAL):
+            self._write_pending()
+            self._conn.commit()
+
+    def _write_pending(self):
+        # Caller holds the lock and commits
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE llm_cache SET last_access = MAX(last_access, ?) WHERE key = ?",
+                [(at, key) for key, at in self._touched.items()],
+            )
+        for name, amount in self._pending_counts.items():
+            self._bump(name, amount)
+        self._touched.clear()
+        self._pending_counts.clear()
+        self._pending_lookups = 0
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        """Write the deferred LRU touches and counters."""
+        with self._lock:
+            try:
+                self._write_pending()
+                self._conn.commit()
+            except sqlite3.ProgrammingError: # Already closed
+                pass
+
+    def _bump(self, name: str, amount: int = 1):
+        self._conn.execute(
+            "INSERT INTO llm_cache_stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, amount),
+        )
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters for this process and for the cache file's lifetime."""
+        with self._lock:
+            self._write_pending()
+            self._conn.commit()
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+            lifetime = dict(self._conn.execute("SELECT name, value FROM llm_cache_stats").fetchall())
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": count,
+            "bytes": total,
+            "lifetime_hits": lifetime.get("hits", 0),
+            "lifetime_misses": lifetime.get("misses", 0),
+            "lifetime_evictions": lifetime.get("evictions", 0),
+        }
+
+    def export_stats(self, path: str):
+        """Write the current statistics to a JSON file."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.stats(), f, indent=2)
+
+    def close(self):
+        with self._lock:
+            self._write_pending()
+            self._conn.commit()
+            self._conn.close()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache() -> LLMCache:
+    """Return the process-wide cache instance (configured from LLM_CACHE_* environment variables)."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LLMCache()
+            atexit.register(_default_cache.flush)
+        return _default_cache
+
+
+def format_stats(stats: dict) -> str:
+    return (f"{stats['hits']} hits / {stats['misses']} misses "
+            f"(hit ratio {stats['hit_ratio']:.0%}), {stats['entries']} entries, {stats['evictions']} evicted")
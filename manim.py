@@ -7,10 +7,16 @@ import sys
 import platform
 import random
 import html
-import subprocess # For running Manim
+import httpx # For the error analysis API
 # Removed: from gtts import gTTS (Now handled by manim-voiceover)
 import numpy # Often used by Manim code
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError, Page, Error as PlaywrightError
+from llm_cache import get_cache, format_stats # Persistent LLM response cache
+from http_clients import get_async_client, aclose_all # Shared keep-alive HTTP clients
+from manim_render import RenderPool, RenderJob, RenderResult, MANIM_FINAL_QUALITY_FLAGS, MANIM_FINAL_RENDER_WORKERS # Background render workers
+from video_manifest import VideoManifest, swap_module_video, MANIM_UPDATE_MODULES # Preview -> final quality ladder
+from render_cache import RenderCache, format_render_cache_stats # Reuse identical scene renders
+from manim_preflight import preflight_check, dry_run, preflight_stats, MANIM_PREFLIGHT_DRY_RUN # Reject broken scenes early
 
 
 # --- API Configuration ---
@@ -606,21 +612,30 @@ async def main():
                    ]
                }
 
+               # Identical code + error output gets the same analysis, so skip the API call on a repeat
+               cached_analysis = get_cache().get(model, prompt)
+               if cached_analysis:
+                   print("    [API] Using cached error analysis.")
+                   return cached_analysis
+
                try:
-                   async with httpx.AsyncClient() as client:
-                       response = await client.post(
-                           f"{base_url}/chat/completions",
-                           json=payload,
-                           headers=headers,
-                           timeout=60.0 # Set a reasonable timeout
-                       )
-                       response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-                       response_data = response.json()
-                       # Extract the content from the API response
-                       if response_data and response_data.get("choices"):
-                           return response_data["choices"][0].get("message", {}).get("content", "No specific suggestions provided by API.")
-                       else:
-                           return "API response did not contain expected format."
+                   # Reuse the pooled keep-alive client instead of a new connection per failed render
+                   client = get_async_client(base_url)
+                   response = await client.post(
+                       f"{base_url}/chat/completions",
+                       json=payload,
+                       headers=headers,
+                   )
+                   response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
+                   response_data = response.json()
+                   # Extract the content from the API response
+                   if response_data and response_data.get("choices"):
+                       analysis = response_data["choices"][0].get("message", {}).get("content")
+                       if analysis:
+                           get_cache().set(model, prompt, analysis)
+                       return analysis or "No specific suggestions provided by API."
+                   else:
+                       return "API response did not contain expected format."
 
                except httpx.RequestError as e:
                    return f"API Request Error: {e}"
@@ -856,6 +871,342 @@ async def main():
                 raise RuntimeError("Failed to generate course overview.")
 
 
+            # ================================================
+            # --- Task 3 helpers: Manim code generation + overlapped rendering ---
+            # ================================================
+            # Renders run in a background worker pool, so the next chapter's script and
+            # code generation on the AI Studio page overlaps with rendering of earlier ones.
+            render_cache = RenderCache()
+            def on_render_event(event: dict):
+                # Structured events from the render supervisor; only milestones are printed
+                if event["event"] == "progress":
+                    total = f"~{event['total']}" if event["total"] else "?"
+                    print(f"      [Render] {event['label']}: animation {event['animation']} of {total} ({event['elapsed']:.0f}s)")
+                elif event["event"] in ("traceback", "timeout"):
+                    print(f"      [Render] {event['label']}: {event['event']} detected after {event['elapsed']:.0f}s, stopping render.")
+
+            render_pool = RenderPool(cache=render_cache, on_event=on_render_event)
+            render_pool.start()
+            # Quality ladder: previews validate scenes, a separate small pool re-renders passing scenes at final quality
+            final_pool = RenderPool(MANIM_FINAL_RENDER_WORKERS, cache=render_cache, on_event=on_render_event)
+            if MANIM_FINAL_QUALITY_FLAGS: final_pool.start()
+            final_renders = {} # Final-quality render future -> chapter state
+            video_manifest = VideoManifest(OUTPUT_DIR)
+            pending_renders = {} # Render future -> chapter state
+            retry_queue = [] # Chapters whose render failed and that still have attempts left
+            chapter_outcomes = {} # Chapter title -> True (rendered) / False (gave up)
+
+            def browser_alive():
+                return bool(browser_context and page and not page.is_closed())
+
+            async def generate_manim_code(ch: dict) -> str | None:
+                """One Manim code generation attempt on the AI Studio page. Returns the saved .py path, or None."""
+                nonlocal browser_context, page
+                chapter_title = ch["title"]; expected_scene_name = ch["scene_name"]; chapter_id_for_files = ch["file_id"]
+                script_raw_text = ch["script"]; manim_attempt = ch["attempt"] - 1
+                manim_raw_text = None; manim_code_saved = False; manim_filepath = None
+                temp_manim=0.7; top_p_manim=0.95; top_k_manim=40; max_tokens_manim=4090 # Use max tokens
+
+                # <<< MODIFIED MANIM PROMPT >>>
+                manim_prompt_for_ai_studio = f"""
+                Act as an expert Manim animator, skilled in creating educational animations with synchronized voiceovers using the `manim-voiceover` library.
+
+                **Task:** Generate a complete, runnable Python script using Manim and `manim-voiceover` to visually animate the key concepts from the provided script text. The animation should be synchronized with narration using Google Text-to-Speech (gTTS).
+
+                **Context:**
+                - Course Topic: {COURSE_TOPIC}
+                - Chapter Title: {chapter_title}
+                - Expected Scene Name: {expected_scene_name}
+
+                **Provided Narration Script Text:**
+                ```text
+                {script_raw_text[:3800]}
+                ```
+                (Note: Script may be truncated if very long. Focus on animating the provided portion.)
+
+                **CRITICAL Instructions:**
+                1.  **Framework:** Use Manim (`manim`) and the `manim-voiceover` extension.
+                2.  **Runnable Code:** Generate ONE complete Python script (`.py`). The script MUST run without errors using the command `manim <filename.py> {expected_scene_name}`.
+                3.  **Imports:** Start the script *exactly* with:
+                    ```python
+                    from manim import *
+                    from manim_voiceover import VoiceoverScene
+                    from manim_voiceover.services.gtts import GTTSService
+                    # Optional: import numpy as np (if needed)
+                    ```
+                4.  **Scene Class:** Define the Manim scene class *exactly* as:
+                    `class {expected_scene_name}(VoiceoverScene):`
+                    (It MUST inherit from `VoiceoverScene`).
+                5.  **Voiceover Setup:** Inside the `construct(self)` method, the *very first line* MUST be:
+                    `self.set_speech_service(GTTSService())`
+                    Optionally add `lang='en'` if needed: `self.set_speech_service(GTTSService(lang='en'))`.
+                6.  **Synchronization:**
+                    *   Break the provided script text into logical, sentence-like segments for narration.
+                    *   For EACH narration segment, use the `with self.voiceover(text="...") as vo:` context manager.
+                    *   Place the Manim animations (`self.play(...)`, `self.wait(...)` etc.) that correspond to that narration segment *inside* its `with self.voiceover(...) as vo:` block.
+                    *   Example:
+                      ```python
+                      with self.voiceover(text="First, let's introduce the concept.") as vo:
+                          concept_text = Text("Concept X").scale(1.5)
+                          self.play(Write(concept_text))
+                          # self.wait(vo.get_remaining_duration()) # Optional: Wait if animation finishes before speech
+                      ```
+                7.  **Animation Style:**
+                    *   Create clear, clean visuals (like 3Blue1Brown style).
+                    *   Use smooth transitions (`Write`, `FadeIn`, `Transform`, `Create`, `FadeOut`, `ReplacementTransform`).
+                    *   Visualize the main ideas and any `[VISUAL: ...]` hints from the script.
+                    *   Use standard Manim objects: `Text`, `MathTex`, `Tex`, `Line`, `Arrow`, `Circle`, `Square`, `Rectangle`, `Dot`, `NumberPlane`, `Axes`, `VGroup`. Manage object placement carefully to avoid overlaps unless intended (e.g., using `.shift()`, `.to_edge()`, `.next_to()`). Remove objects when done (`FadeOut`).
+                8.  **Restrictions:**
+                    *   ***ABSOLUTELY NO `SVGMobject` or `ImageMobject`.*** Do not attempt to load external image or SVG files. Use Manim's built-in capabilities only.
+                    *   Do not manually try to load or play audio files; `manim-voiceover` handles this.
+                9.  **Completeness:** Include the standard Manim execution block at the end:
+                    ```python
+                    if __name__ == "__main__":
+                        scene = {expected_scene_name}()
+                        scene.render()
+                    ```
+                10. **Output Format:** Generate ONLY the raw Python code. Do NOT include explanations, comments outside the code, or markdown formatting like ```python ... ```. Start with `from manim import *` and end with the `scene.render()` line within the `if __name__ == "__main__":` block.
+
+                Generate the complete Manim Python code for `{expected_scene_name}` now.
+                """
+
+                try:
+                    # Interact with AI Studio to get the Manim code
+                    manim_raw_text = await interact_with_ai_studio(
+                        page, manim_prompt_for_ai_studio, f"Manim Code: {chapter_id_for_files} (A{manim_attempt+1})",
+                        temp_manim, top_p_manim, top_k_manim, max_tokens_manim
+                    )
+
+                    if manim_raw_text:
+                        extracted_code = None
+                        # Try extracting code block first
+                        match = re.search(r'```python\s*([\s\S]+?)\s*```', manim_raw_text, re.IGNORECASE)
+                        if match:
+                            extracted_code = match.group(1).strip()
+                            print("    Extracted code from ```python block.")
+                        else:
+                            # If no block, assume the whole response might be code (less ideal)
+                            print("    No ```python block found, attempting to use entire response as code.")
+                            # Basic check if it looks like Python
+                            if "from manim import" in manim_raw_text and "class " in manim_raw_text:
+                                extracted_code = manim_raw_text.strip()
+                            else:
+                                print("    [Warning] Response doesn't look like Python code. Saving raw.")
+                                extracted_code = None # Mark as failed
+
+                        # --- START: MODIFIED - Remove duplicate content marker ---
+                        if extracted_code:
+                            ignore_marker = "IGNORE_WHEN_COPYING_START"
+                            marker_index = extracted_code.find(ignore_marker)
+                            if marker_index != -1:
+                                print(f"    Detected '{ignore_marker}' marker. Truncating code.")
+                                extracted_code = extracted_code[:marker_index].strip()
+                        # --- END: MODIFIED - Remove duplicate content marker ---
+
+                        if extracted_code:
+                            # <<< MODIFIED VALIDATION >>> Check for VoiceoverScene
+                            class_pattern = rf'class\s+{re.escape(expected_scene_name)}\s*\(\s*VoiceoverScene\s*\)\s*:'
+                            preflight_problems = preflight_check(extracted_code, expected_scene_name) # Syntax, scene class, imports
+                            if ("from manim import *" in extracted_code or "import manim" in extracted_code) and \
+                               "from manim_voiceover import VoiceoverScene" in extracted_code and \
+                               "from manim_voiceover.services.gtts import GTTSService" in extracted_code and \
+                               re.search(class_pattern, extracted_code) and \
+                               "construct(self)" in extracted_code and \
+                               "self.set_speech_service(GTTSService" in extracted_code and \
+                               'if __name__ == "__main__":' in extracted_code and \
+                               not preflight_problems:
+
+                                # Save the valid code
+                                manim_filename = f"{chapter_id_for_files}_manim.py" # Save as .py
+                                manim_filepath = os.path.join(OUTPUT_DIR, manim_filename) # Assign filepath here
+                                try:
+                                    with open(manim_filepath, 'w', encoding='utf-8') as f: f.write(extracted_code)
+                                    print(f"    [Success] Manim code saved: {manim_filepath}")
+                                    manim_code_saved = True # Mark as ready for rendering attempt
+                                except Exception as save_err:
+                                     print(f"    [Error] Failed to save Manim code file: {save_err}")
+                                     manim_code_saved = False
+                            else:
+                                print(f"    [Warning] Extracted code failed validation checks (Imports, Class Name '{expected_scene_name}(VoiceoverScene)', construct, set_speech_service, main block). Saving raw python.")
+                                for problem in preflight_problems: print(f"      [Preflight] {problem}")
+                                if preflight_problems: preflight_stats.record(False) # Only count the preflight's own rejections
+                                manim_filename_raw = f"{chapter_id_for_files}_manim_RAW_INVALID_A{manim_attempt+1}.py"
+                                raw_path = os.path.join(OUTPUT_DIR, manim_filename_raw)
+                                try:
+                                    with open(raw_path, 'w', encoding='utf-8') as f: f.write(extracted_code)
+                                    print(f"    Raw Python saved: {raw_path}")
+                                except Exception: pass
+                                manim_code_saved = False # Mark as failed for retry
+                        # else: handled above (no code extracted)
+
+                    else:
+                        # interact_with_ai_studio returned None
+                        print("    [Error] Failed to generate Manim code response from AI (Returned None).")
+                        manim_code_saved = False # Mark as failed for retry
+                        # Assume browser is dead
+                        if browser_context: await browser_context.close(); browser_context, page = None, None
+                        print("    [Critical] Closing browser due to failed interaction. Stopping all tasks.")
+
+                except ConnectionError as ce:
+                    print(f"    [Error] Page closed during Manim generation: {ce}")
+                    if browser_context: await browser_context.close(); browser_context, page = None, None
+                except Exception as manim_ex:
+                     print(f"    [Error] Unexpected error during Manim generation/saving: {manim_ex}")
+                     if page and not page.is_closed():
+                         try: await page.screenshot(path=f"error_screenshot_manim_{chapter_id_for_files}_A{manim_attempt+1}.png")
+                         except Exception: pass
+                     manim_code_saved = False # Mark as failed for retry
+
+                return manim_filepath if manim_code_saved else None
+
+            async def start_manim_attempts(ch: dict):
+                """Generate Manim code for a chapter (retrying failed generations) and queue the scene for rendering."""
+                while ch["attempt"] < MAX_MANIM_RETRIES:
+                    # Check browser state before starting Manim interaction attempt
+                    if not browser_alive():
+                        print(f"    [Error] Browser died before Manim attempt {ch['attempt']+1}. Stopping chapter processing.")
+                        return
+                    ch["attempt"] += 1
+                    print(f"    Manim Code Attempt {ch['attempt']}/{MAX_MANIM_RETRIES} for '{ch['title']}'...")
+                    manim_filepath = await generate_manim_code(ch)
+                    if manim_filepath and MANIM_PREFLIGHT_DRY_RUN:
+                        # Execute construct() without rendering, so runtime errors don't take a render slot
+                        print(f"    [Preflight] Dry run of {ch['scene_name']}...")
+                        dry_ok, dry_output = await dry_run(manim_filepath, ch["scene_name"], os.path.join(OUTPUT_DIR, "media"))
+                        preflight_stats.record(dry_ok, dry_run=True)
+                        if not dry_ok:
+                            print(f"    [Preflight] Dry run failed:\n{dry_output[-2000:]}")
+                            manim_filepath = None
+                    elif manim_filepath:
+                        preflight_stats.record(True)
+                    if manim_filepath:
+                        ch["manim_filepath"] = manim_filepath
+                        # --- Task 3b: Queue the render (Using VoiceoverScene) ---
+                        job = RenderJob(manim_filepath, ch["scene_name"], os.path.join(OUTPUT_DIR, "media"), label=ch["file_id"])
+                        print(f"    [Task 3b] Queued Manim render with voiceover ({render_pool.pending} renders waiting ahead of it)")
+                        print(f"      Executing Manim: {' '.join(job.command())}")
+                        print(f"      (Output video/audio will be in: {job.media_dir})")
+                        pending_renders[render_pool.submit(job)] = ch
+                        return
+                    if ch["attempt"] < MAX_MANIM_RETRIES and browser_alive():
+                        print(f"      Manim attempt {ch['attempt']} failed (code generation/validation). Retrying...")
+                        await asyncio.sleep(random.randint(5, 10)) # Wait before next generation attempt
+                chapter_outcomes[ch["title"]] = False
+                print(f"  [Error] Failed to generate and render Manim code for chapter {ch['title']} (ID: {ch['file_id']}) after {MAX_MANIM_RETRIES} attempts.")
+
+            async def handle_render_result(ch: dict, result: RenderResult):
+                """Report a finished render. Failed renders go to the API for analysis and are queued for re-generation."""
+                print(f"\n    --- Manim Output ({ch['file_id']}, attempt {ch['attempt']}) ---")
+                if result.error:
+                    print(f"    [CRITICAL Error] Could not start Manim: {result.error}")
+                    print("    Is Python and Manim installed correctly and in your system's PATH?")
+                    chapter_outcomes[ch["title"]] = False
+                    return
+                # Limit output length to avoid flooding console
+                stdout_limit = 2000
+                stderr_limit = 3000
+                if result.stdout: print(result.stdout[:stdout_limit] + ("..." if len(result.stdout)>stdout_limit else ""))
+                else: print("      (No stdout)")
+                if result.stderr: print("      --- Manim Stderr ---", file=sys.stderr); print(result.stderr[:stderr_limit] + ("..." if len(result.stderr)>stderr_limit else ""), file=sys.stderr); print("      --- End Stderr ---", file=sys.stderr)
+                else: print("      (No stderr)", file=sys.stderr)
+                print("      --------------------")
+
+                if result.ok:
+                    print(f"    [Success] Manim rendering completed successfully for {ch['scene_name']}!")
+                    print(f"  [Success] Successfully generated and rendered Manim video for chapter {ch['title']}.")
+                    chapter_outcomes[ch["title"]] = True
+                    preview_path = result.job.video_path()
+                    video_manifest.record_preview(ch["title"], ch["scene_name"], preview_path)
+                    if MANIM_FINAL_QUALITY_FLAGS:
+                        ch["preview_path"] = preview_path
+                        final_job = RenderJob(ch["manim_filepath"], ch["scene_name"], result.job.media_dir,
+                                              quality_flags=MANIM_FINAL_QUALITY_FLAGS, label=f"{ch['file_id']} (final)")
+                        final_renders[final_pool.submit(final_job)] = ch
+                        print(f"    [Task 3c] Queued final-quality render ({' '.join(MANIM_FINAL_QUALITY_FLAGS)}) in the background.")
+                    return
+
+                print(f"    [Error] Manim rendering failed for {ch['scene_name']} (Return Code: {result.returncode}). See output above.")
+                # Manim failed, but the code was saved. Now send error to API
+                print("    [Info] Sending error details to API for analysis...")
+                try:
+                    # Need the content of the Manim file to send to the API
+                    with open(ch["manim_filepath"], 'r', encoding='utf-8') as f:
+                        manim_code_content = f.read()
+
+                    api_response = await send_error_to_api(
+                        manim_code_content,
+                        result.stdout + "\n" + result.stderr, # Send both stdout and stderr
+                        OPENROUTER_API_KEY,
+                        OPENROUTER_API_BASE_URL,
+                        DEFAULT_MODEL
+                    )
+                    print("    [API Response] Analysis received:")
+                    print(api_response)
+                except FileNotFoundError:
+                    print(f"    [Error] Manim file not found for API analysis: {ch['manim_filepath']}")
+                except Exception as api_ex:
+                    print(f"    [Error] Failed to send error to API or process response: {api_ex}")
+
+                if ch["attempt"] < MAX_MANIM_RETRIES:
+                    retry_queue.append(ch) # Re-generated on the page at the next opportunity
+                else:
+                    print(f"      Manim failed on final attempt ({ch['attempt']}).")
+                    chapter_outcomes[ch["title"]] = False
+                    print(f"  [Error] Failed to generate and render Manim code for chapter {ch['title']} (ID: {ch['file_id']}) after {MAX_MANIM_RETRIES} attempts.")
+
+            async def collect_final_renders(wait_all: bool = False):
+                """Promote finished final-quality renders in the manifest (and the Module rows, if enabled)."""
+                if not final_renders: return
+                done, _ = await asyncio.wait(list(final_renders), timeout=None if wait_all else 0)
+                for future in done:
+                    ch = final_renders.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as render_ex:
+                        print(f"    [Warning] Final-quality render of {ch['file_id']} errored ({render_ex}). Keeping the preview.")
+                        continue
+                    final_path = result.job.video_path()
+                    if not result.ok or not final_path or not os.path.exists(final_path):
+                        print(f"    [Warning] Final-quality render of {ch['file_id']} failed (Return Code: {result.returncode}). Keeping the preview.")
+                        continue
+                    video_manifest.record_final(ch["title"], final_path)
+                    print(f"    [Task 3c] Final-quality video ready for '{ch['title']}': {final_path}")
+                    if MANIM_UPDATE_MODULES:
+                        try:
+                            updated = await asyncio.to_thread(swap_module_video, ch["preview_path"], final_path)
+                            print(f"      Updated {updated} module(s) to the final-quality video.")
+                        except Exception as db_ex:
+                            print(f"      [Warning] Could not update module video paths: {db_ex}")
+
+            async def process_renders(wait_all: bool = False):
+                """
+                Handle renders that have finished and re-generate failed scenes on the page.
+                Returns once nothing is ready, or with wait_all once every render (and retry) is done.
+                """
+                while pending_renders or retry_queue:
+                    done = set()
+                    if pending_renders:
+                        done, _ = await asyncio.wait(list(pending_renders), timeout=None if wait_all else 0, return_when=asyncio.FIRST_COMPLETED)
+                    for future in done:
+                        ch = pending_renders.pop(future)
+                        try:
+                            await handle_render_result(ch, future.result())
+                        except Exception as render_ex:
+                            print(f"    [Error] Unexpected error during Manim render of {ch['file_id']}: {render_ex}")
+                            chapter_outcomes[ch["title"]] = False
+                    if retry_queue and browser_alive():
+                        ch = retry_queue.pop(0)
+                        print(f"      Manim attempt {ch['attempt']} for '{ch['title']}' failed to render. Retrying...")
+                        await asyncio.sleep(random.randint(5, 10)) # Wait before next generation attempt
+                        await start_manim_attempts(ch)
+                    elif retry_queue:
+                        # Browser is gone, failed scenes can no longer be re-generated
+                        for ch in retry_queue: chapter_outcomes[ch["title"]] = False
+                        retry_queue.clear()
+                    elif not done and not wait_all:
+                        break
+
+
             # ================================================
             # --- Task 2 & 3: Generate Chapter Scripts & Manim Code ---
             # ================================================
@@ -1024,277 +1375,14 @@ async def main():
 
                         # <<< --- TASK 2b (Separate gTTS Audio Generation) REMOVED --- >>>
 
-                        # --- Task 3: Generate Manim Code (Using manim-voiceover) ---
+                        # --- Task 3: Generate Manim Code (Using manim-voiceover) and queue its render ---
                         if script_gen_success and script_raw_text:
                             print(f"  [Task 3] Generating Manim Code with Voiceover for '{chapter_title}'...")
-                            manim_code_generated_and_rendered = False # Flag for this chapter's overall success
-                            manim_filepath = None # Define here to be accessible after loop
-
-                            for manim_attempt in range(MAX_MANIM_RETRIES):
-                                print(f"    Manim Code Attempt {manim_attempt + 1}/{MAX_MANIM_RETRIES}...")
-                                manim_raw_text = None; manim_code_saved = False
-                                temp_manim=0.7; top_p_manim=0.95; top_k_manim=40; max_tokens_manim=4090 # Use max tokens
-
-                                # Check browser state before starting Manim interaction attempt
-                                if not browser_context or not page or page.is_closed():
-                                    print(f"    [Error] Browser died before Manim attempt {manim_attempt+1}. Stopping chapter processing.")
-                                    chapters = [] # Signal to stop outer loop
-                                    break # Exit Manim retry loop for this chapter
-
-                                # <<< MODIFIED MANIM PROMPT >>>
-                                manim_prompt_for_ai_studio = f"""
-                                Act as an expert Manim animator, skilled in creating educational animations with synchronized voiceovers using the `manim-voiceover` library.
-
-                                **Task:** Generate a complete, runnable Python script using Manim and `manim-voiceover` to visually animate the key concepts from the provided script text. The animation should be synchronized with narration using Google Text-to-Speech (gTTS).
-
-                                **Context:**
-                                - Course Topic: {COURSE_TOPIC}
-                                - Chapter Title: {chapter_title}
-                                - Expected Scene Name: {expected_scene_name}
-
-                                **Provided Narration Script Text:**
-                                ```text
-                                {script_raw_text[:3800]}
-                                ```
-                                (Note: Script may be truncated if very long. Focus on animating the provided portion.)
-
-                                **CRITICAL Instructions:**
-                                1.  **Framework:** Use Manim (`manim`) and the `manim-voiceover` extension.
-                                2.  **Runnable Code:** Generate ONE complete Python script (`.py`). The script MUST run without errors using the command `manim <filename.py> {expected_scene_name}`.
-                                3.  **Imports:** Start the script *exactly* with:
-                                    ```python
-                                    from manim import *
-                                    from manim_voiceover import VoiceoverScene
-                                    from manim_voiceover.services.gtts import GTTSService
-                                    # Optional: import numpy as np (if needed)
-                                    ```
-                                4.  **Scene Class:** Define the Manim scene class *exactly* as:
-                                    `class {expected_scene_name}(VoiceoverScene):`
-                                    (It MUST inherit from `VoiceoverScene`).
-                                5.  **Voiceover Setup:** Inside the `construct(self)` method, the *very first line* MUST be:
-                                    `self.set_speech_service(GTTSService())`
-                                    Optionally add `lang='en'` if needed: `self.set_speech_service(GTTSService(lang='en'))`.
-                                6.  **Synchronization:**
-                                    *   Break the provided script text into logical, sentence-like segments for narration.
-                                    *   For EACH narration segment, use the `with self.voiceover(text="...") as vo:` context manager.
-                                    *   Place the Manim animations (`self.play(...)`, `self.wait(...)` etc.) that correspond to that narration segment *inside* its `with self.voiceover(...) as vo:` block.
-                                    *   Example:
-                                      ```python
-                                      with self.voiceover(text="First, let's introduce the concept.") as vo:
-                                          concept_text = Text("Concept X").scale(1.5)
-                                          self.play(Write(concept_text))
-                                          # self.wait(vo.get_remaining_duration()) # Optional: Wait if animation finishes before speech
-                                      ```
-                                7.  **Animation Style:**
-                                    *   Create clear, clean visuals (like 3Blue1Brown style).
-                                    *   Use smooth transitions (`Write`, `FadeIn`, `Transform`, `Create`, `FadeOut`, `ReplacementTransform`).
-                                    *   Visualize the main ideas and any `[VISUAL: ...]` hints from the script.
-                                    *   Use standard Manim objects: `Text`, `MathTex`, `Tex`, `Line`, `Arrow`, `Circle`, `Square`, `Rectangle`, `Dot`, `NumberPlane`, `Axes`, `VGroup`. Manage object placement carefully to avoid overlaps unless intended (e.g., using `.shift()`, `.to_edge()`, `.next_to()`). Remove objects when done (`FadeOut`).
-                                8.  **Restrictions:**
-                                    *   ***ABSOLUTELY NO `SVGMobject` or `ImageMobject`.*** Do not attempt to load external image or SVG files. Use Manim's built-in capabilities only.
-                                    *   Do not manually try to load or play audio files; `manim-voiceover` handles this.
-                                9.  **Completeness:** Include the standard Manim execution block at the end:
-                                    ```python
-                                    if __name__ == "__main__":
-                                        scene = {expected_scene_name}()
-                                        scene.render()
-                                    ```
-                                10. **Output Format:** Generate ONLY the raw Python code. Do NOT include explanations, comments outside the code, or markdown formatting like ```python ... ```. Start with `from manim import *` and end with the `scene.render()` line within the `if __name__ == "__main__":` block.
-
-                                Generate the complete Manim Python code for `{expected_scene_name}` now.
-                                """
-
-                                try:
-                                    # Interact with AI Studio to get the Manim code
-                                    manim_raw_text = await interact_with_ai_studio(
-                                        page, manim_prompt_for_ai_studio, f"Manim Code: {chapter_id_for_files} (A{manim_attempt+1})",
-                                        temp_manim, top_p_manim, top_k_manim, max_tokens_manim
-                                    )
-
-                                    if manim_raw_text:
-                                        extracted_code = None
-                                        # Try extracting code block first
-                                        match = re.search(r'```python\s*([\s\S]+?)\s*```', manim_raw_text, re.IGNORECASE)
-                                        if match:
-                                            extracted_code = match.group(1).strip()
-                                            print("    Extracted code from ```python block.")
-                                        else:
-                                            # If no block, assume the whole response might be code (less ideal)
-                                            print("    No ```python block found, attempting to use entire response as code.")
-                                            # Basic check if it looks like Python
-                                            if "from manim import" in manim_raw_text and "class " in manim_raw_text:
-                                                extracted_code = manim_raw_text.strip()
-                                            else:
-                                                print("    [Warning] Response doesn't look like Python code. Saving raw.")
-                                                extracted_code = None # Mark as failed
-
-                                        # --- START: MODIFIED - Remove duplicate content marker ---
-                                        if extracted_code:
-                                            ignore_marker = "IGNORE_WHEN_COPYING_START"
-                                            marker_index = extracted_code.find(ignore_marker)
-                                            if marker_index != -1:
-                                                print(f"    Detected '{ignore_marker}' marker. Truncating code.")
-                                                extracted_code = extracted_code[:marker_index].strip()
-                                        # --- END: MODIFIED - Remove duplicate content marker ---
-
-                                        if extracted_code:
-                                            # <<< MODIFIED VALIDATION >>> Check for VoiceoverScene
-                                            class_pattern = rf'class\s+{re.escape(expected_scene_name)}\s*\(\s*VoiceoverScene\s*\)\s*:'
-                                            if ("from manim import *" in extracted_code or "import manim" in extracted_code) and \
-                                               "from manim_voiceover import VoiceoverScene" in extracted_code and \
-                                               "from manim_voiceover.services.gtts import GTTSService" in extracted_code and \
-                                               re.search(class_pattern, extracted_code) and \
-                                               "construct(self)" in extracted_code and \
-                                               "self.set_speech_service(GTTSService" in extracted_code and \
-                                               'if __name__ == "__main__":' in extracted_code:
-
-                                                # Save the valid code
-                                                manim_filename = f"{chapter_id_for_files}_manim.py" # Save as .py
-                                                manim_filepath = os.path.join(OUTPUT_DIR, manim_filename) # Assign filepath here
-                                                try:
-                                                    with open(manim_filepath, 'w', encoding='utf-8') as f: f.write(extracted_code)
-                                                    print(f"    [Success] Manim code saved: {manim_filepath}")
-                                                    manim_code_saved = True # Mark as ready for rendering attempt
-                                                except Exception as save_err:
-                                                     print(f"    [Error] Failed to save Manim code file: {save_err}")
-                                                     manim_code_saved = False
-                                            else:
-                                                print(f"    [Warning] Extracted code failed validation checks (Imports, Class Name '{expected_scene_name}(VoiceoverScene)', construct, set_speech_service, main block). Saving raw python.")
-                                                manim_filename_raw = f"{chapter_id_for_files}_manim_RAW_INVALID_A{manim_attempt+1}.py"
-                                                raw_path = os.path.join(OUTPUT_DIR, manim_filename_raw)
-                                                try:
-                                                    with open(raw_path, 'w', encoding='utf-8') as f: f.write(extracted_code)
-                                                    print(f"    Raw Python saved: {raw_path}")
-                                                except Exception: pass
-                                                manim_code_saved = False # Mark as failed for retry
-                                        # else: handled above (no code extracted)
-
-                                    else:
-                                        # interact_with_ai_studio returned None
-                                        print("    [Error] Failed to generate Manim code response from AI (Returned None).")
-                                        manim_code_saved = False # Mark as failed for retry
-                                        # Assume browser is dead
-                                        if browser_context: await browser_context.close(); browser_context, page = None, None
-                                        print("    [Critical] Closing browser due to failed interaction. Stopping all tasks.")
-                                        chapters = []
-                                        break # Exit Manim retry loop
-
-                                except ConnectionError as ce:
-                                    print(f"    [Error] Page closed during Manim generation: {ce}")
-                                    if browser_context: await browser_context.close(); browser_context, page = None, None
-                                    chapters = []; break # Stop all tasks
-                                except Exception as manim_ex:
-                                     print(f"    [Error] Unexpected error during Manim generation/saving: {manim_ex}")
-                                     if page and not page.is_closed():
-                                         try: await page.screenshot(path=f"error_screenshot_manim_{chapter_id_for_files}_A{manim_attempt+1}.png")
-                                         except Exception: pass
-                                     manim_code_saved = False # Mark as failed for retry
-
-                                # --- Task 3b: Render Manim Code (Using VoiceoverScene) ---
-                                # Indentation Corrected
-                                if manim_code_saved and manim_filepath:
-                                    print(f"    [Task 3b] Attempting to render Manim animation with voiceover...")
-                                    manim_abs_filepath = os.path.abspath(manim_filepath)
-                                    media_dir = os.path.join(OUTPUT_DIR, "media") # Define media output subdir
-
-                                    # <<< MODIFIED RENDER COMMAND >>> Removed --audio flag
-                                    manim_command = [
-                                        "python", "-m", "manim", # Use python -m manim for consistency
-                                        manim_abs_filepath,
-                                        expected_scene_name,
-                                        "-pql", # Preview quality, low. Use -p for production.
-                                        "--media_dir", media_dir, # Explicitly set media output directory
-                                        # Optional: Add --verbosity DEBUG for more detailed logs if needed
-                                        # "--verbosity", "DEBUG",
-                                        # Optional: Force module use if needed, but usually automatic
-                                        # "--module", manim_filename,
-                                    ]
-                                    print(f"      Executing Manim: {' '.join(manim_command)}")
-                                    print(f"      (Output video/audio will be in: {media_dir})")
-
-                                    try:
-                                        # Ensure media directory exists (Manim usually creates it, but doesn't hurt)
-                                        os.makedirs(media_dir, exist_ok=True)
-
-                                        # Run Manim command
-                                        # Use check=False initially to capture output even on failure
-                                        process = subprocess.run(
-                                            manim_command,
-                                            capture_output=True,
-                                            text=True,
-                                            check=False, # Don't raise exception on non-zero exit code yet
-                                            encoding='utf-8',
-                                            errors='replace' # Handle potential encoding issues in output
-                                        )
-
-                                        # Print Manim's output (stdout and stderr)
-                                        print("      --- Manim Output ---")
-                                        # Limit output length to avoid flooding console
-                                        stdout_limit = 2000
-                                        stderr_limit = 3000
-                                        if process.stdout: print(process.stdout[:stdout_limit] + ("..." if len(process.stdout)>stdout_limit else ""))
-                                        else: print("      (No stdout)")
-                                        if process.stderr: print("      --- Manim Stderr ---", file=sys.stderr); print(process.stderr[:stderr_limit] + ("..." if len(process.stderr)>stderr_limit else ""), file=sys.stderr); print("      --- End Stderr ---", file=sys.stderr)
-                                        else: print("      (No stderr)", file=sys.stderr)
-                                        print("      --------------------")
-
-                                        # Check return code AFTER printing output
-                                        if process.returncode == 0:
-                                            print(f"    [Success] Manim rendering completed successfully for {expected_scene_name}!")
-                                            manim_code_generated_and_rendered = True # Set flag for overall success
-                                            break # Exit Manim retry loop on success
-                                        else:
-                                            print(f"    [Error] Manim rendering failed (Return Code: {process.returncode}). See output above.")
-                                            # Manim failed, but the code was saved. Now send error to API
-                                            print("    [Info] Sending error details to API for analysis...")
-                                            try:
-                                                # Need the content of the Manim file to send to the API
-                                                with open(manim_filepath, 'r', encoding='utf-8') as f:
-                                                    manim_code_content = f.read()
-
-                                                api_response = await send_error_to_api(
-                                                    manim_code_content,
-                                                    process.stdout + "\n" + process.stderr, # Send both stdout and stderr
-                                                    OPENROUTER_API_KEY,
-                                                    OPENROUTER_API_BASE_URL,
-                                                    DEFAULT_MODEL
-                                                )
-                                                print("    [API Response] Analysis received:")
-                                                print(api_response)
-                                                # Optionally, could try to parse the API response and apply fixes here (more advanced)
-                                            except FileNotFoundError:
-                                                print(f"    [Error] Manim file not found for API analysis: {manim_filepath}")
-                                            except Exception as api_ex:
-                                                print(f"    [Error] Failed to send error to API or process response: {api_ex}")
-
-                                            # Manim failed, but the code was saved. Loop will continue to retry generation.
-                                            # Optionally: could try to parse error and feedback to AI in next prompt (advanced)
-
-                                    except FileNotFoundError:
-                                        print("    [CRITICAL Error] `python` or `manim` command not found.")
-                                        print("    Is Python and Manim installed correctly and in your system's PATH?")
-                                        manim_code_saved = False; chapters = []; break # Cannot retry if command not found, stop everything
-                                    except Exception as render_ex:
-                                        print(f"    [Error] Unexpected Python error during Manim subprocess execution: {render_ex}")
-                                        manim_code_saved = False # Treat as failure for retry
-
-                                # --- End of Rendering Attempt Logic ---
-
-                                # Decide whether to retry if this attempt failed (Indentation Corrected)
-                                if not manim_code_generated_and_rendered and manim_attempt < MAX_MANIM_RETRIES - 1:
-                                     print(f"      Manim attempt {manim_attempt+1} failed (either code generation/validation or rendering). Retrying...")
-                                     await asyncio.sleep(random.randint(5, 10)) # Wait before next generation attempt
-                                elif not manim_code_generated_and_rendered:
-                                     print(f"      Manim failed on final attempt ({manim_attempt+1}).")
-
-                            # --- End of Manim Retry Loop ---
-                            if not chapters: break # Exit chapter loop if browser died during Manim attempts
-
-                            # Report Manim success/failure for the chapter (Indentation Corrected)
-                            if not manim_code_generated_and_rendered:
-                                print(f"  [Error] Failed to generate and render Manim code for chapter {chapter_title} (ID: {chapter_id_for_files}) after {MAX_MANIM_RETRIES} attempts.")
-                            else:
-                                print(f"  [Success] Successfully generated and rendered Manim video for chapter {chapter_title}.")
+                            await start_manim_attempts({
+                                "title": chapter_title, "scene_name": expected_scene_name, "file_id": chapter_id_for_files,
+                                "script": script_raw_text, "attempt": 0, "manim_filepath": None,
+                            })
+                            if not browser_alive(): chapters = [] # Exit chapter loop if browser died during Manim attempts
 
                         # --- Script Generation Failed Case (Indentation Corrected) ---
                         elif not script_gen_success:
@@ -1302,6 +1390,10 @@ async def main():
                         else: # Should not happen if script_gen_success is True, but as a fallback
                             print(f"  [Task 3] Skipping Manim for chapter {i+1}: Script text is missing.")
 
+                        # Pick up renders that finished meanwhile; failed ones are re-generated on the page now
+                        if browser_alive(): await process_renders()
+                        await collect_final_renders()
+
                         # --- Chapter End & Delay Logic (Indentation Corrected) ---
                         if not chapters: # Check if stop signal was received
                             print("    [Info] Stop signal received (chapters list cleared). Stopping chapter processing.")
@@ -1318,6 +1410,18 @@ async def main():
                             # If browser died or it's the last chapter, don't delay
                             print("[Info] Browser closed or last chapter reached. Not delaying.")
 
+                    # --- Wait for renders still in flight (and re-generate failures while the page is alive) ---
+                    if pending_renders or retry_queue:
+                        print(f"\n[Task 3b] Waiting for {len(pending_renders)} renders still in progress...")
+                    await process_renders(wait_all=True)
+                    rendered = sum(1 for ok in chapter_outcomes.values() if ok)
+                    print(f"\n[Task 3] Rendered {rendered}/{num_chapters} chapters. Render pool: {render_pool.summary()}")
+                    if final_renders:
+                        print(f"\n[Task 3c] Waiting for {len(final_renders)} final-quality renders...")
+                    await collect_final_renders(wait_all=True)
+                    if MANIM_FINAL_QUALITY_FLAGS:
+                        print(f"[Task 3c] Final-quality pool: {final_pool.summary()}. Manifest: {video_manifest.path}")
+
                 # --- No Chapters Case (Indentation Corrected) ---
                 else: # overview_data.get("chapters", []) was empty
                     print("[Info] No chapters found in the overview data to process.")
@@ -1359,6 +1463,13 @@ async def main():
     finally:
         # --- Cleanup ---
         print("\n[Cleanup] Script finished or encountered critical error.")
+        print(f"[Cleanup] LLM Cache: {format_stats(get_cache().stats())}")
+        print(f"[Cleanup] Manim Preflight: {preflight_stats.format()}")
+        if 'render_cache' in locals(): print(f"[Cleanup] Render Cache: {format_render_cache_stats(render_cache.stats())}")
+        if 'render_pool' in locals(): await render_pool.close() # Stops workers (kills any unfinished render)
+        if 'final_pool' in locals(): await final_pool.close()
+        try: await aclose_all() # Close pooled HTTP connections
+        except Exception as close_err: print(f"[Cleanup Info] Error closing HTTP clients: {close_err}")
         if 'browser_context' in locals() and browser_context is not None:
              connection_active = False
              try:
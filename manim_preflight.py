@@ -0,0 +1,132 @@
+"""
+Static preflight checks for generated Manim code.
+
+Rejects scenes that cannot render before they take a render slot. The checks
+are a compile() of the source (syntax errors), the expected
+`class <Scene>(VoiceoverScene)` with a construct() that sets a speech
+service, and a whitelist of importable top-level modules. These take
+milliseconds. An optional dry run (`manim --dry_run`) executes construct()
+without writing any video. It catches runtime errors such as bad Mobject
+arguments before a full render. The dry run is enabled with
+MANIM_PREFLIGHT_DRY_RUN=1.
+"""
+
+import ast
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+
+MANIM_ALLOWED_IMPORTS = frozenset(os.getenv(
+    "MANIM_ALLOWED_IMPORTS",
+    "manim,manim_voiceover,numpy,math,random,itertools,functools,typing,colour,string,collections,dataclasses,enum",
+).split(","))
+MANIM_PREFLIGHT_DRY_RUN = os.getenv("MANIM_PREFLIGHT_DRY_RUN", "0") == "1"
+MANIM_PREFLIGHT_TIMEOUT = float(os.getenv("MANIM_PREFLIGHT_TIMEOUT", 120)) # Seconds for the dry run
+
+
+def _base_name(node: ast.expr) -> str:
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return getattr(node, "id", "")
+
+
+def _calls_method(func: ast.FunctionDef, method: str) -> bool:
+    return any(isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == method
+               for node in ast.walk(func))
+
+
+def preflight_check(source: str, scene_name: str) -> list[str]:
+    """Return a list of problems with the scene source (empty if it looks renderable)."""
+    try:
+        tree = ast.parse(source)
+        compile(tree, f"<{scene_name}>", "exec") # Catches errors ast.parse allows (e.g. 'return' outside a function)
+    except SyntaxError as e:
+        return [f"Syntax error on line {e.lineno}: {e.msg}"]
+
+    problems = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module or ""] if node.level == 0 else ["." * node.level]
+        else:
+            continue
+        for module in modules:
+            if module.split(".")[0] not in MANIM_ALLOWED_IMPORTS:
+                problems.append(f"Import of '{module}' on line {node.lineno} is not allowed")
+
+    scene = next((node for node in tree.body if isinstance(node, ast.ClassDef) and node.name == scene_name), None)
+    if scene is None:
+        found = [node.name for node in tree.body if isinstance(node, ast.ClassDef)]
+        problems.append(f"Scene class '{scene_name}' not found (classes: {', '.join(found) or 'none'})")
+        return problems
+    if "VoiceoverScene" not in [_base_name(base) for base in scene.bases]:
+        problems.append(f"Class '{scene_name}' does not inherit from VoiceoverScene")
+    construct = next((node for node in scene.body if isinstance(node, ast.FunctionDef) and node.name == "construct"), None)
+    if construct is None:
+        problems.append(f"Class '{scene_name}' has no construct(self) method")
+    elif not _calls_method(construct, "set_speech_service"):
+        problems.append("construct() never calls self.set_speech_service(...)")
+    return problems
+
+
+async def dry_run(source_path: str, scene_name: str, media_dir: str, timeout: float = MANIM_PREFLIGHT_TIMEOUT) -> tuple[bool, str]:
+    """
+    Run construct() through `manim --dry_run` (no video written). Returns (ok, combined output).
+    It runs in a scratch directory under <media_dir>/jobs, so its voiceover cache is not shared with renders.
+    """
+    jobs_dir = os.path.join(media_dir, "jobs")
+    os.makedirs(jobs_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix=f"dry_run-{scene_name}-", dir=jobs_dir)
+    try:
+        return await _dry_run(source_path, scene_name, work_dir, timeout)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+async def _dry_run(source_path: str, scene_name: str, media_dir: str, timeout: float) -> tuple[bool, str]:
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "manim", os.path.abspath(source_path), scene_name,
+        "--dry_run", "--media_dir", media_dir,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    try:
+        output, _ = await asyncio.wait_for(process.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        process.kill()
+        await process.wait()
+        if isinstance(e, asyncio.CancelledError):
+            raise
+        return False, f"Dry run timed out after {timeout:.0f}s"
+    return process.returncode == 0, output.decode("utf-8", errors="replace")
+
+
+class PreflightStats:
+    """Counts of scenes passed vs. rejected before rendering in this process."""
+
+    def __init__(self):
+        self.passed = 0
+        self.rejected_static = 0
+        self.rejected_dry_run = 0
+        self._lock = threading.Lock()
+
+    def record(self, passed: bool, dry_run: bool = False):
+        with self._lock:
+            if passed:
+                self.passed += 1
+            elif dry_run:
+                self.rejected_dry_run += 1
+            else:
+                self.rejected_static += 1
+
+    def format(self) -> str:
+        return (f"{self.passed} scenes passed, {self.rejected_static} rejected by static checks, "
+                f"{self.rejected_dry_run} rejected by dry run (render slots saved)")
+
+
+preflight_stats = PreflightStats()
@@ -0,0 +1,211 @@
+"""
+Asynchronous Manim render worker pool for manim.py.
+
+Renders run as child processes (asyncio.create_subprocess_exec) pulled from a
+queue by a fixed number of workers, so the event loop and the Playwright page
+stay responsive. Script and code generation for the next chapter can then
+overlap with rendering of the previous ones. The pool size defaults to the
+number of CPU cores. With a RenderCache, scenes that already rendered are
+restored from the cache instead of being rendered again. Each render runs
+under a RenderSupervisor (timeouts, resource limits, streamed output and
+progress events).
+
+Every render gets its own scratch media directory under <media_dir>/jobs.
+Manim's partial movie files and manim-voiceover's cache.json are then never
+shared between concurrent renders. Only the finished <Scene>.mp4 (and its
+.srt) are moved into the shared media_dir layout, and the scratch directory
+is deleted afterwards.
+"""
+
+import asyncio
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+from render_cache import RenderCache
+from render_supervisor import RenderSupervisor
+
+
+MANIM_RENDER_WORKERS = int(os.getenv("MANIM_RENDER_WORKERS", 0)) or os.cpu_count() or 1
+MANIM_QUALITY_FLAGS = ["-ql"] # Low quality
+# Quality ladder: scenes that render at preview quality are re-rendered in the background with these flags
+MANIM_FINAL_QUALITY_FLAGS = os.getenv("MANIM_FINAL_QUALITY_FLAGS", "-qh").split() # Empty disables the final render
+MANIM_FINAL_RENDER_WORKERS = int(os.getenv("MANIM_FINAL_RENDER_WORKERS", 1)) # Kept small so previews keep most cores
+# Output folder Manim uses for each quality flag (<media_dir>/videos/<file stem>/<folder>/<Scene>.mp4)
+QUALITY_DIRS = {"-ql": "480p15", "-qm": "720p30", "-qh": "1080p60", "-qp": "1440p60", "-qk": "2160p60"}
+
+
+class RenderJob:
+    """One scene to render."""
+
+    def __init__(self, source_path: str, scene_name: str, media_dir: str, quality_flags=None, label: str = ""):
+        self.source_path = os.path.abspath(source_path)
+        self.scene_name = scene_name
+        self.media_dir = media_dir
+        self.quality_flags = list(quality_flags or MANIM_QUALITY_FLAGS)
+        self.label = label or scene_name
+
+    def command(self, media_dir: str | None = None) -> list[str]:
+        return [
+            sys.executable, "-m", "manim", # Same interpreter as this script, so the same Manim install
+            self.source_path,
+            self.scene_name,
+            *self.quality_flags,
+            "--media_dir", media_dir or self.media_dir, # Explicitly set media output directory
+        ]
+
+    def video_dir(self, media_dir: str | None = None) -> str:
+        # Manim writes <media_dir>/videos/<source file stem>/<quality dir>/<Scene>.mp4
+        stem = os.path.splitext(os.path.basename(self.source_path))[0]
+        return os.path.join(media_dir or self.media_dir, "videos", stem)
+
+    def video_path(self) -> str | None:
+        """Where this job's finished video ends up, or None if the quality flags don't map to a known folder."""
+        folder = next((QUALITY_DIRS[flag] for flag in self.quality_flags if flag in QUALITY_DIRS), None)
+        if folder is None:
+            return None
+        return os.path.join(self.video_dir(), folder, f"{self.scene_name}.mp4")
+
+
+def job_media_dir(job: RenderJob) -> str:
+    """Create a private scratch media directory for one render of `job`."""
+    jobs_dir = os.path.join(job.media_dir, "jobs")
+    os.makedirs(jobs_dir, exist_ok=True)
+    return tempfile.mkdtemp(prefix=re.sub(r"[^\w.-]", "_", job.label) + "-", dir=jobs_dir)
+
+
+def publish_artifacts(job: RenderJob, work_dir: str) -> list[str]:
+    """Move the scene's finished files (<Scene>.mp4, .srt) from a scratch directory into job.media_dir."""
+    source_dir = job.video_dir(work_dir)
+    published = []
+    if not os.path.isdir(source_dir):
+        return published
+    for quality_dir in os.listdir(source_dir):
+        quality_path = os.path.join(source_dir, quality_dir)
+        if not os.path.isdir(quality_path):
+            continue
+        for name in os.listdir(quality_path):
+            path = os.path.join(quality_path, name)
+            if os.path.isfile(path) and os.path.splitext(name)[0] == job.scene_name:
+                target = os.path.join(job.video_dir(), quality_dir, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target) # Same filesystem, so readers never see a partial file
+                published.append(target)
+    return published
+
+
+class RenderResult:
+    """Exit status and captured output of a finished render."""
+
+    def __init__(self, job: RenderJob, returncode: int | None, stdout: str, stderr: str, duration: float,
+                 error: str | None = None, cached: bool = False, kill_reason: str | None = None):
+        self.job = job
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.duration = duration
+        self.error = error # Set when the process could not be started at all
+        self.cached = cached # Artifacts were restored from the render cache
+        self.kill_reason = kill_reason # "timeout" or "traceback" when the supervisor killed the render
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0
+
+
+async def run_render(job: RenderJob, on_event=None) -> RenderResult:
+    """
+    Run one supervised render to completion without blocking the event loop.
+    It renders in a scratch media directory and publishes the finished files on success.
+    """
+    work_dir = job_media_dir(job)
+    started = time.monotonic()
+    supervisor = RenderSupervisor(job.command(work_dir), job.label, source_path=job.source_path, on_event=on_event)
+    try:
+        returncode = await supervisor.run()
+        if returncode == 0:
+            await asyncio.to_thread(publish_artifacts, job, work_dir)
+    except OSError as e:
+        return RenderResult(job, None, "", "", time.monotonic() - started, error=str(e))
+    finally:
+        await asyncio.to_thread(shutil.rmtree, work_dir, True) # ignore_errors
+    return RenderResult(
+        job, returncode, "\n".join(supervisor.stdout), "\n".join(supervisor.stderr),
+        time.monotonic() - started, kill_reason=supervisor.kill_reason,
+    )
+
+
+class RenderPool:
+    """Bounded pool of render workers fed by a queue. submit() returns a future for the RenderResult."""
+
+    def __init__(self, workers: int = MANIM_RENDER_WORKERS, cache: RenderCache | None = None, on_event=None):
+        self.workers = max(1, workers)
+        self.cache = cache
+        self.on_event = on_event # Progress events from the render supervisor
+        self.killed = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self._queue = asyncio.Queue()
+        self._tasks = []
+
+    def start(self):
+        print(f"[Render Pool] Starting {self.workers} render workers.")
+        self._tasks = [asyncio.create_task(self._worker(n + 1)) for n in range(self.workers)]
+
+    async def _worker(self, number: int):
+        while True:
+            job, future = await self._queue.get()
+            try:
+                cached = await asyncio.to_thread(self.cache.restore, job) if self.cache else None
+                if cached:
+                    print(f"  [Render Pool] Worker {number} reused cached render of {job.label} "
+                          f"(saved {cached.get('render_seconds', 0):.1f}s)")
+                    self.completed += 1
+                    if not future.cancelled():
+                        future.set_result(RenderResult(
+                            job, 0, f"[Render Cache] Restored {', '.join(cached['paths'])}", "", 0.0, cached=True))
+                    continue
+                print(f"  [Render Pool] Worker {number} rendering {job.label}...")
+                started = time.time()
+                result = await run_render(job, self.on_event)
+                self.busy_seconds += result.duration
+                if result.ok and self.cache:
+                    await asyncio.to_thread(self.cache.store, job, result.duration, started)
+                if result.ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+                    self.killed += bool(result.kill_reason)
+                print(f"  [Render Pool] Worker {number} finished {job.label} in {result.duration:.1f}s "
+                      f"({'ok' if result.ok else f'failed, code {result.returncode}'}"
+                      f"{f', killed on {result.kill_reason}' if result.kill_reason else ''})")
+                if not future.cancelled():
+                    future.set_result(result)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, job: RenderJob) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((job, future))
+        return future
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def summary(self) -> str:
+        return (f"{self.completed} rendered, {self.failed} failed ({self.killed} killed by the supervisor), "
+                f"{self.busy_seconds:.0f}s of render time across {self.workers} workers")
@@ -28,6 +28,52 @@ def add_column(database_path, table_name, column_name, column_type):
         print(f"Error adding column: {e}")
         return False
 
+def add_index(database_path, index_name, table_name, column_names):
+    """Create an index on a SQLite database table if it doesn't exist"""
+    try:
+        conn = sqlite3.connect(database_path)
+        cursor = conn.cursor()
+
+        # Quote column names, some of them (e.g. "order") are SQL keywords
+        columns_sql = ", ".join(f'"{column}"' for column in column_names)
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS {index_name} ON "{table_name}" ({columns_sql})')
+        print(f"Index '{index_name}' ensured on {table_name}({', '.join(column_names)})")
+
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Error adding index: {e}")
+        return False
+
+# Composite indexes for the hot foreign-key lookups (kept in sync with __table_args__ in models.py)
+INDEXES = [
+    ('ix_user_progress_user_id_module_id', 'user_progress', ['user_id', 'module_id']),
+    ('ix_chat_messages_user_id_created_at', 'chat_messages', ['user_id', 'created_at']),
+    ('ix_quiz_attempt_user_id_quiz_id', 'quiz_attempt', ['user_id', 'quiz_id']),
+    ('ix_schedule_user_id_start_time', 'schedule', ['user_id', 'start_time']),
+    ('ix_module_course_id_order', 'module', ['course_id', 'order']),
+    ('ix_lesson_module_id_order', 'lesson', ['module_id', 'order']),
+    ('ix_course_user_id', 'course', ['user_id']),
+    ('ix_achievement_user_id', 'achievement', ['user_id']),
+    ('ix_learning_path_user_id', 'learning_path', ['user_id']),
+    ('ix_note_user_id', 'note', ['user_id']),
+    ('ix_user_settings_user_id', 'user_settings', ['user_id']),
+]
+
+def backfill_video_urls():
+    """Resolve and store manim_video_url for modules created before the column existed"""
+    from website.models import Module
+
+    modules = Module.query.filter(
+        Module.manim_video_path.isnot(None),
+        Module.manim_video_url.is_(None)
+    ).all()
+    for module in modules:
+        module.manim_video_url = Module.resolve_video_url(module.manim_video_path)
+    db.session.commit()
+    print(f"Backfilled video URLs for {len(modules)} modules")
+
 def main():
     """Run database migrations"""
     # Get app context
@@ -40,9 +86,19 @@ def main():
         if result:
             print("Successfully added is_survey_completed column to user table")
         
-        # 2. Create the CSInterestSurvey table if it doesn't exist
+        # 2. Add manim_video_url column to module table
+        add_column(db_path, 'module', 'manim_video_url', 'VARCHAR(255)')
+
+        # 3. Create the CSInterestSurvey table if it doesn't exist
         db.create_all()
         print("Database tables created/updated")
+
+        # 4. Add composite indexes to tables created before they were declared
+        for index_name, table_name, column_names in INDEXES:
+            add_index(db_path, index_name, table_name, column_names)
+
+        # 5. Store the public URL for existing Manim videos
+        backfill_video_urls()
         
         print("Migration completed successfully!")
 
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+Local OpenRouter stub for testing and benchmarking the chat offline.
+
+Serves /api/v1/chat/completions and answers with canned tokens, either
+streamed as Server-Sent Events ("stream": true) or as a single JSON body.
+
+Usage:
+    python openrouter_stub.py --port 8001 --first-token-delay 0.8 --token-delay 0.05
+    OPENROUTER_URL=http://127.0.0.1:8001/api/v1/chat/completions python main.py
+"""
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = (
+    "Great question! Let's break it down step by step so the key idea is clear, "
+    "then look at a short example you can try yourself."
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    first_token_delay = 0.5
+    token_delay = 0.05
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        if self.path.rstrip('/') != '/api/v1/chat/completions':
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        tokens = [word + ' ' for word in REPLY.split()]
+
+        if not payload.get('stream'):
+            # Non-streaming clients wait for the whole completion
+            time.sleep(self.first_token_delay + self.token_delay * len(tokens))
+            body = json.dumps({
+                "choices": [{"message": {"role": "assistant", "content": ''.join(tokens)}}]
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(b": OPENROUTER PROCESSING\n\n")
+        self.wfile.flush()
+        time.sleep(self.first_token_delay)
+        for token in tokens:
+            chunk = {"choices": [{"delta": {"content": token}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(self.token_delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenRouter stub")
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--first-token-delay', type=float, default=0.5, help="Seconds before the first token")
+    parser.add_argument('--token-delay', type=float, default=0.05, help="Seconds between tokens")
+    args = parser.parse_args()
+
+    StubHandler.first_token_delay = args.first_token_delay
+    StubHandler.token_delay = args.token_delay
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), StubHandler)
+    print(f"OpenRouter stub listening on http://127.0.0.1:{args.port}/api/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStub stopped.")
+
+
+if __name__ == '__main__':
+    main()
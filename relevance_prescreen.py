@@ -0,0 +1,199 @@
+"""
+Local lexical relevance pre-screen for transcripts.
+
+Scores a transcript against a chapter title and course topic with BM25 term
+saturation over fixed-size passages (NumPy), plus the share of chapter-title
+terms that occur anywhere in the transcript. Transcripts that clearly do or
+do not cover the chapter are labeled locally. Only the ambiguous band in
+between is escalated to the LLM.
+
+There is no background corpus per transcript, so terms are weighted by where
+they come from (chapter title vs. course topic) instead of by IDF. The
+default thresholds come from calibrate() on the hand-labeled transcripts in
+tests/data/prescreen_labeled.jsonl: the loosest bands in which every locally
+labeled transcript agrees with the LLM verdict. That set is small, so the
+bands are tight. Set PRESCREEN_LABEL_LOG to collect the LLM verdicts of real
+runs, re-run calibrate_prescreen.py on them and set the PRESCREEN_*
+environment variables it prints.
+"""
+
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+
+PRESCREEN_HIGH_COVERAGE = float(os.getenv("PRESCREEN_HIGH_COVERAGE", 1.0)) # Share of title terms present
+PRESCREEN_HIGH_SCORE = float(os.getenv("PRESCREEN_HIGH_SCORE", 0.54)) # Best-passage BM25, normalized to 0..1
+PRESCREEN_LOW_COVERAGE = float(os.getenv("PRESCREEN_LOW_COVERAGE", 0.0))
+PRESCREEN_LOW_SCORE = float(os.getenv("PRESCREEN_LOW_SCORE", 0.0)) # Not a single title or topic term
+PRESCREEN_MIN_TOKENS = int(os.getenv("PRESCREEN_MIN_TOKENS", 150)) # Shorter transcripts always go to the LLM
+PRESCREEN_LABEL_LOG = os.getenv("PRESCREEN_LABEL_LOG") # JSONL file collecting LLM verdicts for calibrate()
+
+PASSAGE_TOKENS = 200
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 1.0
+TOPIC_WEIGHT = 0.5
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+
+
+def stem(token: str) -> str:
+    """Light plural strip so 'arrays' matches 'array' and 'dictionaries' matches 'dictionary'."""
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase, stemmed word tokens."""
+    return [stem(t) for t in TOKEN_RE.findall(text.lower())]
+
+
+# Words that say nothing about what a chapter covers. Title filler ("Working with", "Understanding",
+# "Getting Started") would otherwise count as a required title term that the video rarely says.
+# Stemmed like the tokens they are compared with.
+STOPWORDS = frozenset(tokenize("""
+a an and are as at be by for from how in into is it its of on or that the this to what when where which
+who why with your you vs versus part chapter module unit section lesson introduction intro basics overview
+working work understanding understand using use learn learning getting started start guide tutorial beginner
+beginners complete explained explanation deep dive fundamentals essentials practical hands simple easy quick
+crash course step steps
+"""))
+
+
+def query_terms(chapter_title: str, course_topic: str) -> dict[str, float]:
+    """Distinct query terms with their weights (title terms outrank topic terms)."""
+    terms = {t: TOPIC_WEIGHT for t in tokenize(course_topic) if t not in STOPWORDS}
+    terms.update({t: TITLE_WEIGHT for t in tokenize(chapter_title) if t not in STOPWORDS})
+    return terms
+
+
+def score_transcript(transcript: str, chapter_title: str, course_topic: str) -> dict:
+    """Return {'tokens', 'title_coverage', 'score'} for a transcript."""
+    terms = query_terms(chapter_title, course_topic)
+    tokens = tokenize(transcript)
+    title_terms = [t for t, w in terms.items() if w == TITLE_WEIGHT]
+    if not tokens or not terms:
+        return {"tokens": len(tokens), "title_coverage": 0.0, "score": 0.0}
+
+    vocab = {term: i for i, term in enumerate(terms)}
+    weights = np.fromiter(terms.values(), dtype=float)
+    term_ids = np.fromiter((vocab.get(t, -1) for t in tokens), dtype=np.int64, count=len(tokens))
+
+    # Term counts per passage: (passages, terms)
+    passage_ids = np.arange(len(tokens)) // PASSAGE_TOKENS
+    n_passages = int(passage_ids[-1]) + 1
+    hits = term_ids >= 0
+    tf = np.zeros((n_passages, len(vocab)))
+    np.add.at(tf, (passage_ids[hits], term_ids[hits]), 1)
+    lengths = np.bincount(passage_ids, minlength=n_passages).astype(float)
+
+    # BM25 term saturation, scaled to 0..1 per term, then weighted and normalized
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / lengths.mean())
+    saturation = tf / (tf + norm[:, None])
+    passage_scores = saturation @ weights / weights.sum()
+
+    present = tf.sum(axis=0) > 0
+    title_coverage = float(np.mean([present[vocab[t]] for t in title_terms])) if title_terms else 0.0
+    return {"tokens": len(tokens), "title_coverage": title_coverage, "score": float(passage_scores.max())}
+
+
+def prescreen_relevance(transcript: str, chapter_title: str, course_topic: str) -> tuple[str | None, dict]:
+    """
+    Return (label, scores). label is "Highly Relevant" or "Not Relevant" for
+    clear cases, or None when the transcript should be escalated to the LLM.
+    """
+    scores = score_transcript(transcript, chapter_title, course_topic)
+    label = band_label(scores)
+    prescreen_stats.record(label)
+    return label, scores
+
+
+def band_label(scores: dict) -> str | None:
+    """The local label for score_transcript() output, or None if it falls in the ambiguous band."""
+    if scores["tokens"] < PRESCREEN_MIN_TOKENS:
+        return None
+    if scores["title_coverage"] >= PRESCREEN_HIGH_COVERAGE and scores["score"] >= PRESCREEN_HIGH_SCORE:
+        return "Highly Relevant"
+    if scores["title_coverage"] <= PRESCREEN_LOW_COVERAGE and scores["score"] <= PRESCREEN_LOW_SCORE:
+        return "Not Relevant"
+    return None
+
+
+def log_label(transcript: str, chapter_title: str, course_topic: str, label: str, path: str | None = PRESCREEN_LABEL_LOG):
+    """Append an LLM verdict to the label log (if one is configured) for later calibration."""
+    if not path:
+        return
+    record = {"chapter_title": chapter_title, "course_topic": course_topic, "label": label, "transcript": transcript}
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def load_labeled(path: str) -> list[dict]:
+    """Read labeled transcripts ({'transcript', 'chapter_title', 'course_topic', 'label'} per line)."""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def calibrate(samples: list[dict]) -> dict:
+    """
+    Pick thresholds from labeled transcripts.
+
+    For each band, among the (coverage, score) points observed, choose the
+    loosest one at which every transcript it would label locally has that
+    label from the LLM; ties go to the stricter coverage. Returns the
+    thresholds plus how many samples each band labels. A band that cannot be
+    placed without a disagreement is closed (nothing is labeled locally).
+    """
+    scored = []
+    for sample in samples:
+        scores = score_transcript(sample["transcript"], sample["chapter_title"], sample["course_topic"])
+        if scores["tokens"] >= PRESCREEN_MIN_TOKENS:
+            scored.append((scores["title_coverage"], scores["score"], sample["label"]))
+    coverages = sorted({c for c, _, _ in scored})
+    values = sorted({v for _, v, _ in scored})
+
+    best_high = (0, -1.0, float("inf"), float("inf")) # (labeled, coverage, coverage threshold, score threshold)
+    best_low = (0, -1.0, -1.0, -1.0)
+    for coverage in coverages:
+        for value in values:
+            high = [label for c, v, label in scored if c >= coverage and v >= value]
+            if high and all(label == "Highly Relevant" for label in high) and (len(high), coverage) > best_high[:2]:
+                best_high = (len(high), coverage, coverage, value)
+            low = [label for c, v, label in scored if c <= coverage and v <= value]
+            if low and all(label == "Not Relevant" for label in low) and (len(low), -coverage) > best_low[:2]:
+                best_low = (len(low), -coverage, coverage, value)
+    return {
+        "PRESCREEN_HIGH_COVERAGE": best_high[2], "PRESCREEN_HIGH_SCORE": best_high[3],
+        "PRESCREEN_LOW_COVERAGE": best_low[2], "PRESCREEN_LOW_SCORE": best_low[3],
+        "high_labeled": best_high[0], "low_labeled": best_low[0], "samples": len(scored),
+    }
+
+
+class PrescreenStats:
+    """Counts of transcripts labeled locally vs. escalated in this process."""
+
+    def __init__(self):
+        self.labeled = 0
+        self.escalated = 0
+        self._lock = threading.Lock()
+
+    def record(self, label: str | None):
+        with self._lock:
+            if label:
+                self.labeled += 1
+            else:
+                self.escalated += 1
+
+    def format(self) -> str:
+        total = self.labeled + self.escalated
+        return f"{self.labeled} of {total} transcripts labeled locally ({self.labeled} LLM calls avoided), {self.escalated} escalated"
+
+
+prescreen_stats = PrescreenStats()
@@ -0,0 +1,188 @@
+"""
+Content-addressed cache of finished Manim renders.
+
+A render is keyed by the SHA-256 of (scene source, scene name, quality flags,
+Manim version). Identical scenes are restored from the cache instead of being
+rendered again. This covers retries that produce the same code and reruns of
+a topic. The cached artifacts are the files Manim writes next to the scene
+video (<Scene>.mp4, plus the .srt subtitles from manim-voiceover). The
+voiceover audio is muxed into the mp4, so the video carries it. The cache is
+trimmed by age and total size, least recently used entries first.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from importlib import metadata
+
+
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", "render_cache")
+RENDER_CACHE_MAX_BYTES = int(os.getenv("RENDER_CACHE_MAX_BYTES", 5 * 1024 * 1024 * 1024))
+RENDER_CACHE_MAX_AGE = int(os.getenv("RENDER_CACHE_MAX_AGE", 30 * 24 * 3600)) # Seconds
+
+META_FILE = "meta.json"
+
+
+def manim_version() -> str:
+    try:
+        return metadata.version("manim")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def render_key(source: bytes, scene_name: str, quality_flags, version: str) -> str:
+    digest = hashlib.sha256()
+    for part in (source, scene_name.encode(), " ".join(quality_flags).encode(), version.encode()):
+        digest.update(len(part).to_bytes(8, "big")) # Length-prefixed so field boundaries can't collide
+        digest.update(part)
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """Directory of cached render artifacts keyed by render_key(), with size/age eviction."""
+
+    def __init__(self, directory: str = RENDER_CACHE_DIR, max_bytes: int = RENDER_CACHE_MAX_BYTES,
+                 max_age: int = RENDER_CACHE_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.version = manim_version()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key_for(self, job) -> str | None:
+        try:
+            with open(job.source_path, "rb") as f:
+                source = f.read()
+        except OSError:
+            return None
+        return render_key(source, job.scene_name, job.quality_flags, self.version)
+
+    def restore(self, job) -> dict | None:
+        """
+        Copy the cached artifacts for a job into its media directory and return the
+        entry metadata ({scene_name, render_seconds, files, ...}), or None on a miss.
+        """
+        key = self.key_for(job)
+        entry_dir = os.path.join(self.directory, key) if key else None
+        # Videos can be large, so copy without holding the lock. Each file is copied to a
+        # temporary name and moved into place, so readers never see a partial video, and
+        # an entry evicted mid-copy just turns into a miss.
+        try:
+            with open(os.path.join(entry_dir, META_FILE), encoding="utf-8") as f:
+                meta = json.load(f)
+            if time.time() - meta.get("created_at", 0) > self.max_age:
+                raise ValueError("expired")
+            target = job.video_dir()
+            for rel_path in meta["files"]:
+                path = os.path.join(target, rel_path)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                shutil.copy2(os.path.join(entry_dir, "files", rel_path), f"{path}.tmp")
+                os.replace(f"{path}.tmp", path)
+            os.utime(entry_dir) # Touch so eviction keeps recently used renders
+        except (TypeError, OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+            self.saved_seconds += meta.get("render_seconds", 0.0)
+        meta["paths"] = [os.path.join(target, rel_path) for rel_path in meta["files"]]
+        return meta
+
+    def store(self, job, render_seconds: float, since: float):
+        """Cache the artifacts a successful render of `job` wrote at or after `since` (a time.time() value)."""
+        key = self.key_for(job)
+        video_path = job.video_path()
+        if key is None or video_path is None:
+            return
+        # Only this job's quality folder: other renders of the same scene (e.g. the -ql preview
+        # next to a -qh final render) are in sibling folders and must not be cached under this key
+        quality_path = os.path.dirname(video_path)
+        quality_dir = os.path.basename(quality_path)
+        video_dir = os.path.dirname(quality_path)
+        if not os.path.isdir(quality_path):
+            return
+        files = []
+        for name in os.listdir(quality_path):
+            path = os.path.join(quality_path, name)
+            if (os.path.isfile(path) and os.path.splitext(name)[0] == job.scene_name
+                    and os.path.getmtime(path) >= since - 1):
+                files.append(os.path.join(quality_dir, name))
+        if not any(name.endswith(".mp4") for name in files):
+            return
+        meta = {"scene_name": job.scene_name, "quality_flags": job.quality_flags, "manim_version": self.version,
+                "render_seconds": render_seconds, "created_at": time.time(), "files": files}
+        entry_dir = os.path.join(self.directory, key)
+        # Build the entry in a private directory without the lock, then swap it in
+        tmp_dir = tempfile.mkdtemp(prefix=f"{key}.", suffix=".tmp", dir=self.directory)
+        try:
+            for rel_path in files:
+                os.makedirs(os.path.dirname(os.path.join(tmp_dir, "files", rel_path)), exist_ok=True)
+                shutil.copy2(os.path.join(video_dir, rel_path), os.path.join(tmp_dir, "files", rel_path))
+            with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            with self._lock:
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                os.replace(tmp_dir, entry_dir) # Readers only ever see complete entries
+                self._evict()
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            entry_dir = os.path.join(self.directory, name)
+            if name.endswith(".tmp") or not os.path.isdir(entry_dir):
+                continue
+            size = 0
+            for root, _, files in os.walk(entry_dir):
+                for file_name in files:
+                    try:
+                        size += os.path.getsize(os.path.join(root, file_name))
+                    except OSError:
+                        pass
+            try:
+                entries.append((os.path.getmtime(entry_dir), size, name))
+            except OSError:
+                continue
+        return entries
+
+    def _evict(self):
+        now = time.time()
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, name in entries:
+            if total <= self.max_bytes and now - mtime <= self.max_age:
+                continue
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._entries()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+
+def format_render_cache_stats(stats: dict) -> str:
+    return (f"{stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate), "
+            f"{stats['saved_seconds']:.0f}s of rendering saved, {stats['entries']} cached "
+            f"({stats['bytes'] / (1024 * 1024):.0f} MiB), {stats['evictions']} evicted")
@@ -0,0 +1,211 @@
+"""
+Supervised Manim render subprocesses.
+
+Output is streamed instead of buffered. stdout and stderr are read
+incrementally, split on newlines and carriage returns (Manim's progress bars
+use \\r), and only the last MANIM_RENDER_LOG_LINES lines of each stream are
+kept. The process is killed when:
+  - a Python traceback appears. A short grace period lets the rest of the
+    traceback through, so the error report stays complete.
+  - it runs past the wall-clock deadline (MANIM_RENDER_TIMEOUT).
+On POSIX, the child can also get CPU-time and address-space rlimits. They are
+set by a small `python -c` wrapper that then execs the render. preexec_fn is
+not used, because it is unsafe in a process with threads (the render cache
+and to_thread workers). The address-space limit is off by default: RLIMIT_AS
+caps virtual memory, not resident memory, and ffmpeg, LaTeX and
+numpy/OpenBLAS reserve far more address space than they ever touch, so any
+useful cap breaks them. Use a cgroup/container limit for real memory caps.
+stdin is closed, so a LaTeX error prompt fails instead of waiting for input
+forever.
+
+Progress is reported as events (plain dicts) to an optional callback:
+  {"event": "started" | "progress" | "traceback" | "timeout" | "finished", "label", "elapsed", ...}
+"progress" events carry "animation" (1-based) and "total". The total is
+estimated from the number of self.play()/self.wait() calls in the scene
+source, and raised if Manim reports more.
+"""
+
+import asyncio
+import codecs
+import collections
+import os
+import re
+import signal
+import sys
+import time
+
+try:
+    import resource # POSIX only
+except ImportError:
+    resource = None
+
+
+MANIM_RENDER_TIMEOUT = float(os.getenv("MANIM_RENDER_TIMEOUT", 900)) # Wall-clock seconds per render
+MANIM_RENDER_MAX_CPU_SECONDS = int(os.getenv("MANIM_RENDER_MAX_CPU_SECONDS", 1800)) # RLIMIT_CPU, 0 disables
+MANIM_RENDER_MAX_MEMORY_MB = int(os.getenv("MANIM_RENDER_MAX_MEMORY_MB", 0)) # RLIMIT_AS (virtual memory), 0 disables
+MANIM_RENDER_LOG_LINES = int(os.getenv("MANIM_RENDER_LOG_LINES", 400)) # Lines kept per stream
+TRACEBACK_GRACE_SECONDS = 2.0
+
+TRACEBACK_MARKER = "Traceback (most recent call last)"
+ANIMATION_RE = re.compile(r"Animation (\d+)\s*:")
+ANIMATION_CALL_RE = re.compile(r"\bself\.(?:play|wait)\(")
+LINE_SPLIT_RE = re.compile(r"[\r\n]")
+
+
+def estimate_animations(source_path: str) -> int | None:
+    """Count self.play()/self.wait() calls in the scene source (each one is a Manim animation)."""
+    try:
+        with open(source_path, encoding="utf-8") as f:
+            return len(ANIMATION_CALL_RE.findall(f.read())) or None
+    except OSError:
+        return None
+
+
+# Applies the limits in the child, then replaces itself with the render (argv: cpu seconds, memory MB, command...)
+LIMIT_WRAPPER = """
+import os, resource, sys
+def limit(which, value):
+    hard = resource.getrlimit(which)[1]
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    resource.setrlimit(which, (value, value))
+cpu, memory_mb = int(sys.argv[1]), int(sys.argv[2])
+if cpu > 0:
+    limit(resource.RLIMIT_CPU, cpu)
+if memory_mb > 0:
+    limit(resource.RLIMIT_AS, memory_mb * 1024 * 1024)
+os.execvp(sys.argv[3], sys.argv[3:])
+"""
+
+
+def limited_command(command: list[str]) -> list[str]:
+    """Wrap a command so it runs under the configured rlimits (unchanged when none apply)."""
+    if resource is None or (MANIM_RENDER_MAX_CPU_SECONDS <= 0 and MANIM_RENDER_MAX_MEMORY_MB <= 0):
+        return command
+    return [sys.executable, "-c", LIMIT_WRAPPER, str(MANIM_RENDER_MAX_CPU_SECONDS),
+            str(MANIM_RENDER_MAX_MEMORY_MB), *command]
+
+
+def _kill(process):
+    """Kill the render and everything it started (LaTeX, ffmpeg) so no child keeps the pipes open."""
+    try:
+        if os.name == "posix":
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+class RenderSupervisor:
+    """Runs one render command, streaming and watching its output. Use `await supervisor.run()`."""
+
+    def __init__(self, command: list[str], label: str, source_path: str | None = None,
+                 timeout: float = MANIM_RENDER_TIMEOUT, on_event=None):
+        self.command = command
+        self.label = label
+        self.timeout = timeout
+        self.on_event = on_event
+        self.total = estimate_animations(source_path) if source_path else None
+        self.animation = 0
+        self.stdout = collections.deque(maxlen=MANIM_RENDER_LOG_LINES)
+        self.stderr = collections.deque(maxlen=MANIM_RENDER_LOG_LINES)
+        self.kill_reason = None
+        self._started = 0.0
+        self._traceback_seen = asyncio.Event()
+
+    def _emit(self, event: str, **fields):
+        if self.on_event is None:
+            return
+        try:
+            self.on_event({"event": event, "label": self.label, "elapsed": time.monotonic() - self._started, **fields})
+        except Exception as e:
+            print(f"  [Render Supervisor] Event consumer failed: {e}")
+
+    def _on_line(self, line: str):
+        if TRACEBACK_MARKER in line and not self._traceback_seen.is_set():
+            self._traceback_seen.set()
+            self._emit("traceback")
+        match = ANIMATION_RE.search(line)
+        if match:
+            animation = int(match.group(1)) + 1 # Manim counts from 0
+            if animation > self.animation:
+                self.animation = animation
+                if self.total is not None and animation > self.total:
+                    self.total = animation
+                self._emit("progress", animation=animation, total=self.total)
+
+    async def _pump(self, stream: asyncio.StreamReader, lines: collections.deque):
+        pending = ""
+        # A multi-byte character can be split across two reads; the incremental decoder holds on to its first bytes
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while chunk := await stream.read(4096):
+            parts = LINE_SPLIT_RE.split(pending + decoder.decode(chunk))
+            pending = parts.pop()
+            for line in parts:
+                if line.strip():
+                    # Progress bars redraw the same line; keep only its latest state
+                    if lines and "%|" in line and "%|" in lines[-1]:
+                        lines[-1] = line
+                    else:
+                        lines.append(line)
+                    self._on_line(line)
+        pending += decoder.decode(b"", final=True)
+        if pending.strip():
+            lines.append(pending)
+            self._on_line(pending)
+
+    async def _watch(self, process) -> str:
+        """Wait for the process to exit. Returns why it was killed, or None if it exited by itself."""
+        exited = asyncio.ensure_future(process.wait())
+        traceback_seen = asyncio.ensure_future(self._traceback_seen.wait())
+        try:
+            done, _ = await asyncio.wait({exited, traceback_seen}, timeout=self.timeout, return_when=asyncio.FIRST_COMPLETED)
+            if exited in done:
+                return None
+            if traceback_seen in done:
+                # Let the rest of the traceback through; the process may also exit on its own
+                remaining = max(0.0, self.timeout - (time.monotonic() - self._started))
+                done, _ = await asyncio.wait({exited}, timeout=min(TRACEBACK_GRACE_SECONDS, remaining))
+                return None if exited in done else "traceback"
+            self._emit("timeout", timeout=self.timeout)
+            return "timeout"
+        finally:
+            traceback_seen.cancel()
+
+    async def run(self) -> int:
+        """Run the command and return its exit code. Raises OSError if it cannot be started."""
+        self._started = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            *limited_command(self.command),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            start_new_session=os.name == "posix", # Own process group, so _kill() reaches the children too
+        )
+        self._emit("started", total=self.total)
+        pumps = asyncio.gather(self._pump(process.stdout, self.stdout), self._pump(process.stderr, self.stderr))
+        try:
+            self.kill_reason = await self._watch(process)
+            if self.kill_reason:
+                _kill(process)
+            await process.wait()
+            try:
+                await asyncio.wait_for(asyncio.shield(pumps), TRACEBACK_GRACE_SECONDS)
+            except asyncio.TimeoutError:
+                # A leftover child still holds the pipes open
+                _kill(process)
+                pumps.cancel()
+        except asyncio.CancelledError:
+            # Don't leave an orphaned Manim process behind when the pool shuts down
+            _kill(process)
+            await process.wait()
+            pumps.cancel()
+            raise
+        if self.kill_reason == "timeout":
+            self.stderr.append(f"[Render Supervisor] Killed after exceeding the {self.timeout:.0f}s deadline.")
+        elif self.kill_reason == "traceback":
+            self.stderr.append("[Render Supervisor] Killed after a Python traceback.")
+        self._emit("finished", returncode=process.returncode, kill_reason=self.kill_reason,
+                   animation=self.animation, total=self.total)
+        return process.returncode
@@ -0,0 +1,77 @@
+"""
+Checkpoint file for course sourcing runs (browser_use.py).
+
+Each finished piece of work (course overview, a chapter's search result,
+transcript or relevance verdict) is appended as one JSON line to a per-topic
+file as soon as it completes. A run started with --resume replays the file and
+only does the work that is missing, so a crash or Ctrl+C near the end of a
+long run costs just the unfinished chapters. Only successful results are
+recorded, so failed stages are retried on resume.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+
+
+RUN_STATE_DIR = os.getenv("RUN_STATE_DIR", "run_state")
+
+
+def topic_slug(topic: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", topic.lower()).strip("-") or "untitled"
+
+
+class RunState:
+    """Append-only JSONL checkpoint keyed by (stage, chapter) for one topic."""
+
+    def __init__(self, topic: str, resume: bool = False, directory: str = RUN_STATE_DIR):
+        self.topic = topic
+        self.path = os.path.join(directory, f"{topic_slug(topic)}.jsonl")
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.backup = None # Where a fresh run moved the previous checkpoint
+        os.makedirs(directory, exist_ok=True)
+        if resume:
+            self._load()
+        elif os.path.exists(self.path):
+            # A fresh run starts a new checkpoint file, but keeps the last one (maybe from a crashed
+            # run the user forgot to --resume) as .bak instead of truncating it
+            self.backup = self.path + ".bak"
+            os.replace(self.path, self.backup)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue # A line cut short by a crash
+                if record.get("topic") == self.topic:
+                    self._entries[(record["stage"], record.get("chapter"))] = record["data"]
+
+    @property
+    def completed(self) -> int:
+        return len(self._entries)
+
+    def get(self, stage: str, chapter: str | None = None):
+        """Return the recorded data for a stage (and chapter), or None if it has not completed."""
+        return self._entries.get((stage, chapter))
+
+    def record(self, stage: str, data, chapter: str | None = None):
+        """Append a completed stage result and flush it to disk immediately."""
+        line = json.dumps({"topic": self.topic, "stage": stage, "chapter": chapter, "data": data, "ts": time.time()})
+        with self._lock:
+            self._entries[(stage, chapter)] = data
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
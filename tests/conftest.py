@@ -0,0 +1,31 @@
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from website import db, init_database, user_cache
+
+
+@pytest.fixture
+def app(tmp_path):
+    """An app bound to a fresh SQLite file with the production engine profile (no blueprints)"""
+    app = Flask('website')
+    init_database(app, f"sqlite:///{tmp_path / 'test.db'}")
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+    user_cache.clear()
+
+
+@pytest.fixture
+def statements(app):
+    """List of (sql, parameters) for every statement executed while the test runs"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(db.engine, 'before_cursor_execute', record)
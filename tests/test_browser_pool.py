@@ -0,0 +1,167 @@
+"""BrowserContextPool reuse, reset, recycling and shutdown with fake browser contexts"""
+import asyncio
+
+import pytest
+
+import browser_pool
+from browser_pool import BrowserContextPool
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+
+    async def evaluate(self, script):
+        if self.context.hung:
+            await asyncio.sleep(3600)
+        return self.context.heap_bytes
+
+
+class FakeContext:
+    def __init__(self, number):
+        self.number = number
+        self.pages = []
+        self.heap_bytes = 10 * 1024 * 1024
+        self.hung = False
+        self.resets = 0
+        self.closed = False
+
+    async def get_current_page(self):
+        if not self.pages:
+            self.pages.append(FakePage(self))
+        return self.pages[-1]
+
+    async def reset_context(self):
+        self.resets += 1
+        self.pages = []
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+
+    async def new_context(self):
+        self.contexts.append(FakeContext(len(self.contexts) + 1))
+        return self.contexts[-1]
+
+
+@pytest.fixture(autouse=True)
+def no_psutil(monkeypatch):
+    monkeypatch.setattr(browser_pool, 'psutil', None) # Measure the fake JS heap, not this process
+    monkeypatch.setattr(browser_pool, 'BROWSER_POOL_HEALTH_TIMEOUT', 0.05)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_contexts_are_prewarmed_and_reused():
+    async def scenario():
+        browser = FakeBrowser()
+        pool = BrowserContextPool(browser, size=2, max_tasks=100)
+        await pool.start()
+        assert all(context.pages for context in browser.contexts)
+        used = []
+
+        async def task():
+            async with pool.lease() as context:
+                used.append(context)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(task() for _ in range(10)))
+        return browser, pool, used
+
+    browser, pool, used = run(scenario())
+    assert len(browser.contexts) == 2
+    assert {id(context) for context in used} == {id(context) for context in browser.contexts}
+    assert pool.metrics()['in_use'] == 0 and pool.metrics()['idle'] == 2
+
+
+def test_concurrent_leases_never_share_a_context():
+    async def scenario():
+        pool = BrowserContextPool(FakeBrowser(), size=3)
+        await pool.start()
+        active, overlaps = set(), []
+
+        async def task():
+            async with pool.lease() as context:
+                overlaps.append(context.number in active)
+                active.add(context.number)
+                await asyncio.sleep(0.01)
+                active.discard(context.number)
+
+        await asyncio.gather(*(task() for _ in range(9)))
+        return overlaps
+
+    assert not any(run(scenario()))
+
+
+def test_context_is_reset_between_uses():
+    async def scenario():
+        pool = BrowserContextPool(FakeBrowser(), size=1, max_tasks=100)
+        await pool.start()
+        async with pool.lease() as first:
+            first.pages.append(FakePage(first)) # The agent opened another tab
+        async with pool.lease() as second:
+            return first, second
+
+    first, second = run(scenario())
+    assert second is first
+    assert first.resets >= 1 and first.pages == []
+
+
+def test_failed_reset_recycles_the_context():
+    async def scenario():
+        browser = FakeBrowser()
+        pool = BrowserContextPool(browser, size=1, max_tasks=100)
+        await pool.start()
+        async with pool.lease() as context:
+            async def broken():
+                raise RuntimeError('target closed')
+            context.reset_context = broken
+        async with pool.lease() as replacement:
+            return browser, pool, context, replacement
+
+    browser, pool, context, replacement = run(scenario())
+    assert replacement is not context and context.closed
+    assert pool.recycled == 1
+
+
+@pytest.mark.parametrize('break_context, reason', [
+    (lambda context: None, 'max tasks'),
+    (lambda context: setattr(context, 'heap_bytes', 1024 ** 3), 'heap'),
+    (lambda context: setattr(context, 'hung', True), 'health check'),
+])
+def test_contexts_are_recycled(break_context, reason):
+    async def scenario():
+        browser = FakeBrowser()
+        pool = BrowserContextPool(browser, size=1, max_tasks=2 if reason == 'max tasks' else 100, max_heap_mb=512)
+        await pool.start()
+        async with pool.lease() as context:
+            break_context(context)
+        async with pool.lease() as context:
+            pass
+        return browser, pool
+
+    browser, pool = run(scenario())
+    assert pool.recycled == 1
+    assert browser.contexts[0].closed and not browser.contexts[1].closed
+    assert pool.health_failures == (1 if reason == 'health check' else 0)
+
+
+def test_close_shuts_every_idle_context():
+    async def scenario():
+        browser = FakeBrowser()
+        pool = BrowserContextPool(browser, size=3)
+        await pool.start()
+        async with pool.lease():
+            pass
+        await pool.close()
+        return browser
+
+    browser = run(scenario())
+    assert len(browser.contexts) == 3
+    assert all(context.closed for context in browser.contexts)
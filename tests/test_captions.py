@@ -0,0 +1,108 @@
+"""Caption track choice and caption document parsing"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import captions
+from captions import choose_caption_track, extract_caption_tracks, parse_caption_document
+
+BASE = 'https://www.youtube.com/api/timedtext?v=abcdefghijk&lang='
+
+SRV1 = (
+    '<?xml version="1.0" encoding="utf-8" ?><transcript>'
+    '<text start="0" dur="2">Today we&amp;#39;ll cover\nbinary search</text>'
+    '<text start="2" dur="2">Tom &amp;amp; Jerry &amp;lt;3</text>'
+    '<text start="4" dur="1">  </text>'
+    '</transcript>'
+)
+SRV3 = (
+    '<?xml version="1.0" encoding="utf-8" ?><timedtext format="3"><body>'
+    '<p t="0" d="2000">First <s>line</s></p>'
+    '<p t="2000" d="2000">Second   line</p>'
+    '</body></timedtext>'
+)
+JSON3 = json.dumps({'events': [
+    {'tStartMs': 0, 'segs': [{'utf8': 'Hello'}, {'utf8': ' world'}]},
+    {'tStartMs': 1000, 'segs': [{'utf8': '\n'}]},
+    {'tStartMs': 2000},
+    {'tStartMs': 3000, 'segs': [{'utf8': 'AT&amp;T is literal here'}]},
+]})
+
+
+def track(code, kind=None, translatable=False):
+    track = {'languageCode': code, 'baseUrl': BASE + code, 'isTranslatable': translatable}
+    if kind:
+        track['kind'] = kind
+    return track
+
+
+def watch_page(tracks):
+    player_response = {'captions': {'playerCaptionsTracklistRenderer': {'captionTracks': tracks}}}
+    return f'<script>var ytInitialPlayerResponse = {json.dumps(player_response)};var meta = {{}};</script>'
+
+
+def test_srv1_is_unescaped_once():
+    assert parse_caption_document(SRV1) == "Today we'll cover binary search\nTom & Jerry <3"
+
+
+def test_srv3_paragraphs():
+    assert parse_caption_document(SRV3) == 'First line\nSecond line'
+
+
+def test_json3_segments():
+    assert parse_caption_document(JSON3) == 'Hello world\nAT&amp;T is literal here'
+
+
+def test_tracks_are_read_from_the_watch_page():
+    tracks = [track('en'), track('de', 'asr')]
+    assert extract_caption_tracks(watch_page(tracks)) == tracks
+    assert extract_caption_tracks('<html>no player</html>') == []
+
+
+@pytest.mark.parametrize('tracks, expected', [
+    ([track('de'), track('en', 'asr'), track('en-GB')], 'en-GB'),  # Uploaded English beats auto-generated
+    ([track('fr'), track('en', 'asr')], 'en'),
+    ([track('en-US', 'asr'), track('en')], 'en'),
+])
+def test_english_tracks_are_preferred(tracks, expected):
+    chosen = choose_caption_track(tracks)
+    assert chosen['languageCode'] == expected
+    assert 'tlang' not in chosen['baseUrl']
+
+
+def test_other_languages_are_translated_to_english():
+    chosen = choose_caption_track([track('de', 'asr', translatable=True), track('fr', translatable=True)])
+    assert chosen['languageCode'] == 'fr'
+    assert chosen['baseUrl'] == BASE + 'fr&tlang=en'
+
+
+@pytest.mark.parametrize('tracks', [[], [track('de'), track('fr', 'asr')]])
+def test_no_english_or_translatable_track(tracks):
+    assert choose_caption_track(tracks) is None
+
+
+def test_fetch_reads_the_chosen_track(monkeypatch):
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        if request.url.path == '/watch':
+            return httpx.Response(200, text=watch_page([track('es', translatable=True)]))
+        return httpx.Response(200, text=JSON3)
+
+    monkeypatch.setattr(captions, 'get_async_client',
+                        lambda url: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    text = asyncio.run(captions.fetch_caption_transcript('https://youtu.be/abcdefghijk'))
+
+    assert text.startswith('Hello world')
+    assert requested[-1].endswith('lang=es&tlang=en')
+
+
+def test_fetch_without_usable_captions_returns_none(monkeypatch):
+    monkeypatch.setattr(captions, 'get_async_client', lambda url: httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, text=watch_page([track('de')])))))
+
+    assert asyncio.run(captions.fetch_caption_transcript('https://youtu.be/abcdefghijk')) is None
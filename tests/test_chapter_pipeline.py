@@ -0,0 +1,162 @@
+"""run_chapter_pipeline against the sequential search -> transcript -> relevance run it replaced"""
+import asyncio
+import random
+
+import pytest
+
+from chapter_pipeline import is_valid_transcript, process_agent_result, run_chapter_pipeline
+from run_state import RunState
+
+CHAPTERS = [f'Chapter {i}' for i in range(12)]
+
+
+class AgentResult:
+    def __init__(self, output):
+        self.output = output
+
+    def final_result(self):
+        return self.output
+
+
+class Stages:
+    """Stub stages with random delays so chapters finish out of order."""
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.calls = {'search': [], 'transcribe': [], 'analyze': []}
+
+    async def pause(self):
+        await asyncio.sleep(self.random.random() / 100)
+
+    async def search(self, chapter_title):
+        self.calls['search'].append(chapter_title)
+        await self.pause()
+        index = int(chapter_title.split()[-1])
+        if index == 3:
+            return RuntimeError('agent crashed')
+        if index == 5:
+            return AgentResult('no video found')
+        return AgentResult(f'https://www.youtube.com/watch?v=vid{index:08d}')
+
+    async def transcribe(self, link):
+        self.calls['transcribe'].append(link)
+        await self.pause()
+        if link.endswith('7'):
+            return '[Transcript failed: Captions disabled]'
+        return f'transcript of {link}'
+
+    async def analyze(self, transcript_text, chapter_title):
+        self.calls['analyze'].append(chapter_title)
+        await self.pause()
+        return f'Relevant: {chapter_title} / {transcript_text}'
+
+
+class NoState:
+    def get(self, stage, chapter=None):
+        return None
+
+    def record(self, stage, data, chapter=None):
+        pass
+
+
+async def run_sequential(chapters, stages):
+    """The barrier version: every search, then every transcript, then every analysis."""
+    results = await asyncio.gather(*(stages.search(c) for c in chapters))
+    agent_outcomes, agent_results_status, parsed_links_by_chapter = {}, {}, {}
+    for chapter_title, result_or_exc in zip(chapters, results):
+        outcome, status_message, link = process_agent_result(chapter_title, result_or_exc)
+        agent_outcomes[chapter_title] = outcome
+        agent_results_status[chapter_title] = status_message
+        parsed_links_by_chapter[chapter_title] = [link] if link else []
+    links = list(dict.fromkeys(link for c in chapters for link in parsed_links_by_chapter[c]))
+    transcripts_by_link = dict(zip(links, await asyncio.gather(*(stages.transcribe(link) for link in links))))
+    link_to_chapter = {link: c for c in chapters for link in parsed_links_by_chapter[c]}
+    relevance_results_by_link = {}
+    for link in links:
+        if is_valid_transcript(transcripts_by_link[link]):
+            relevance_results_by_link[link] = await stages.analyze(transcripts_by_link[link], link_to_chapter[link])
+        else:
+            relevance_results_by_link[link] = '[Analysis Skipped: Invalid Transcript]'
+    return agent_outcomes, agent_results_status, parsed_links_by_chapter, transcripts_by_link, relevance_results_by_link
+
+
+def pipeline(stages, run_state=None, chapters=CHAPTERS, queue_size=20, concurrency=(4, 3, 2)):
+    return asyncio.run(asyncio.wait_for(run_chapter_pipeline(
+        chapters, stages.search, stages.transcribe, stages.analyze, run_state or NoState(),
+        *concurrency, queue_size=queue_size,
+    ), timeout=10))
+
+
+def comparable(output):
+    # Exceptions don't compare equal, compare their text
+    agent_outcomes, agent_results_status, *rest = output
+    return (agent_outcomes, {c: str(s) for c, s in agent_results_status.items()}, *rest)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_pipeline_matches_sequential_run(seed):
+    expected = comparable(asyncio.run(run_sequential(CHAPTERS, Stages(seed))))
+    result = comparable(pipeline(Stages(seed)))
+
+    assert result == expected
+    # Same report order too, not just the same contents
+    assert [list(part) for part in result] == [list(part) for part in expected]
+    agent_outcomes, agent_results_status, _, transcripts_by_link, relevance_results_by_link = result
+    assert agent_outcomes['Chapter 3'] == 'failed'
+    assert agent_results_status['Chapter 5'] == '[Invalid Output: no video found]'
+    assert relevance_results_by_link['https://www.youtube.com/watch?v=vid00000007'] == '[Analysis Skipped: Invalid Transcript]'
+
+
+def test_duplicate_links_are_transcribed_and_analyzed_once():
+    stages = Stages()
+
+    async def search(chapter_title):
+        return AgentResult('https://www.youtube.com/watch?v=samevideo01')
+
+    stages.search = search
+    _, _, parsed_links_by_chapter, transcripts_by_link, _ = pipeline(stages)
+
+    assert all(links == ['https://www.youtube.com/watch?v=samevideo01'] for links in parsed_links_by_chapter.values())
+    assert stages.calls['transcribe'] == ['https://www.youtube.com/watch?v=samevideo01']
+    assert len(stages.calls['analyze']) == 1
+    assert list(transcripts_by_link) == ['https://www.youtube.com/watch?v=samevideo01']
+
+
+@pytest.mark.parametrize('failing', ['search', 'transcribe', 'analyze'])
+def test_failing_stage_does_not_deadlock_bounded_queues(failing):
+    stages = Stages()
+
+    async def broken(*args):
+        raise RuntimeError(f'{failing} blew up')
+
+    setattr(stages, failing, broken)
+    agent_outcomes, _, _, transcripts_by_link, relevance_results_by_link = pipeline(
+        stages, queue_size=1, concurrency=(4, 1, 1))
+
+    assert list(agent_outcomes) == CHAPTERS
+    if failing == 'search':
+        assert set(agent_outcomes.values()) == {'failed'}
+        assert transcripts_by_link == {}
+    elif failing == 'transcribe':
+        assert all(text.startswith('[Transcript failed') for text in transcripts_by_link.values())
+        assert set(relevance_results_by_link.values()) == {'[Analysis Skipped: Invalid Transcript]'}
+    else:
+        valid = [link for link, text in transcripts_by_link.items() if is_valid_transcript(text)]
+        assert valid and all(relevance_results_by_link[link] == '[Analysis Failed: RuntimeError]' for link in valid)
+
+
+def test_resume_skips_recorded_stages(tmp_path):
+    first = RunState('Python', directory=tmp_path)
+    expected = comparable(pipeline(Stages(), first))
+    first.close()
+
+    stages = Stages()
+    resumed = RunState('Python', resume=True, directory=tmp_path)
+    result = comparable(pipeline(stages, resumed))
+    resumed.close()
+
+    # Only the chapters that never completed a stage run again
+    assert stages.calls['search'] == ['Chapter 3', 'Chapter 5']
+    assert stages.calls['transcribe'] == ['https://www.youtube.com/watch?v=vid00000007']
+    assert stages.calls['analyze'] == []
+    assert result[2:] == expected[2:]
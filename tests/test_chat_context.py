@@ -0,0 +1,52 @@
+"""Chat context token budget"""
+import pytest
+
+from website import config, db
+from website.chat_context import build_chat_context, estimate_tokens
+from website.models import ChatMessage, ChatSummary, User
+
+
+@pytest.fixture
+def user_id(app):
+    user = User(email='chat@example.com', first_name='Chat')
+    db.session.add(user)
+    db.session.commit()
+    for i in range(20):
+        ChatMessage.add_message(user.id, 'user' if i % 2 == 0 else 'assistant', f'turn {i} ' + 'word ' * 40)
+    return user.id
+
+
+def prompt_tokens(messages):
+    return sum(estimate_tokens(message['content']) for message in messages)
+
+
+@pytest.mark.parametrize('budget', [100, 400, 3000])
+@pytest.mark.parametrize('message_words', [5, 400, 5000])
+def test_prompt_fits_the_budget(user_id, budget, message_words):
+    messages, stats = build_chat_context(user_id, 'question ' * message_words, budget=budget)
+
+    assert prompt_tokens(messages) <= budget
+    assert stats['prompt_tokens'] == prompt_tokens(messages)
+    assert messages[-1]['role'] == 'user'
+
+
+def test_long_message_is_truncated_not_dropped(user_id):
+    messages, stats = build_chat_context(user_id, 'question ' * 5000, budget=400)
+
+    assert stats['message_truncated']
+    assert messages[-1]['content'].startswith('question question')
+
+
+def test_folding_ignores_the_new_message(user_id):
+    build_chat_context(user_id, 'short?', budget=400)
+    folded_upto = ChatSummary.query.filter_by(user_id=user_id).one().last_message_id
+
+    _, stats = build_chat_context(user_id, 'question ' * 5000, budget=400)
+
+    assert ChatSummary.query.filter_by(user_id=user_id).one().last_message_id == folded_upto
+    assert stats['history_messages'] > 0
+
+
+def test_budget_below_the_system_prompt_is_rejected(user_id):
+    with pytest.raises(ValueError):
+        build_chat_context(user_id, 'hi', budget=estimate_tokens(config.SYSTEM_PROMPT))
@@ -0,0 +1,85 @@
+"""/chat/stream against the local OpenRouter stub"""
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+from flask_login import LoginManager
+
+import openrouter_stub
+from website import config, db, user_cache
+from website.chat import chat
+from website.models import ChatMessage, User
+
+
+@pytest.fixture
+def stub_url(monkeypatch):
+    monkeypatch.setattr(openrouter_stub.StubHandler, 'first_token_delay', 0.0)
+    monkeypatch.setattr(openrouter_stub.StubHandler, 'token_delay', 0.0)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), openrouter_stub.StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(app):
+    app.config['SECRET_KEY'] = 'test'
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    login_manager.user_loader(lambda id: user_cache.load_user(int(id)))
+    app.register_blueprint(chat, url_prefix='/')
+
+    user = User(email='chat@example.com', first_name='Chat')
+    db.session.add(user)
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+        session['_fresh'] = True
+    client.user_id = user.id
+    return client
+
+
+def events(body):
+    """Parse an SSE body into (event, data) pairs"""
+    parsed = []
+    for block in body.strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        parsed.append((fields.get('event', 'message'), json.loads(fields['data'])))
+    return parsed
+
+
+def test_reply_streams_in_order_and_is_saved(client, stub_url, monkeypatch):
+    monkeypatch.setattr(config, 'OPENROUTER_URL', f"{stub_url}/api/v1/chat/completions")
+
+    response = client.post('/chat/stream', json={'message': 'What is recursion?'})
+
+    assert response.mimetype == 'text/event-stream'
+    received = events(response.get_data(as_text=True))
+    tokens = [data['token'] for event, data in received if event == 'message']
+    assert ''.join(tokens) == ''.join(word + ' ' for word in openrouter_stub.REPLY.split())
+    assert received[-1][0] == 'done' and received[-1][1]['done']
+
+    saved = ChatMessage.query.filter_by(user_id=client.user_id).order_by(ChatMessage.id).all()
+    assert [(m.role, m.content) for m in saved] == [('user', 'What is recursion?'), ('assistant', ''.join(tokens))]
+
+
+def test_upstream_failure_sends_an_error_event(client, stub_url, monkeypatch):
+    monkeypatch.setattr(config, 'OPENROUTER_URL', f"{stub_url}/not-an-endpoint")  # Stub answers 404
+
+    response = client.post('/chat/stream', json={'message': 'What is recursion?'})
+
+    received = events(response.get_data(as_text=True))
+    assert [event for event, _ in received] == ['error']
+    assert 'error' in received[0][1]
+    saved = ChatMessage.query.filter_by(user_id=client.user_id).all()
+    assert [m.role for m in saved] == ['user']
+
+
+def test_empty_message_is_rejected(client):
+    response = client.post('/chat/stream', json={'message': '  '})
+
+    assert response.status_code == 400
+    assert ChatMessage.query.count() == 0
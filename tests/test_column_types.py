@@ -0,0 +1,82 @@
+"""mutable_json columns: change tracking, pre-serialized strings and rows written by older code"""
+import json
+
+import pytest
+from sqlalchemy import text
+
+from website import db
+from website.models import LearningPath
+
+
+def reload(path_id):
+    db.session.expunge_all()
+    return db.session.get(LearningPath, path_id)
+
+
+def save(**fields):
+    path = LearningPath(career_path='Software Engineer', **fields)
+    db.session.add(path)
+    db.session.commit()
+    return path.id
+
+
+def test_in_place_changes_are_saved(app):
+    path = reload(save(focus_areas=['algorithms']))
+    path.focus_areas.append('databases')
+    db.session.commit()
+
+    assert reload(path.id).focus_areas == ['algorithms', 'databases']
+
+
+def test_pre_serialized_json_string_is_decoded(app):
+    path = reload(save(focus_areas='["web", "security"]'))
+
+    assert path.focus_areas == ['web', 'security']
+
+
+def test_non_json_string_is_rejected_clearly(app):
+    path = LearningPath(career_path='Software Engineer')
+
+    with pytest.raises(TypeError, match='focus_areas'):
+        path.focus_areas = 'algorithms, databases'
+
+
+def test_unsupported_type_is_rejected_clearly(app):
+    path = LearningPath(career_path='Software Engineer')
+
+    with pytest.raises(TypeError, match='set'):
+        path.focus_areas = {'algorithms'}
+
+
+@pytest.mark.parametrize('stored, expected', [
+    ('5', 5),
+    ('2.5', 2.5),
+    ('"algorithms"', 'algorithms'),
+    ('true', True),
+    ('null', None),
+    ('legacy plain text', 'legacy plain text'),
+])
+def test_legacy_rows_load(app, stored, expected):
+    path_id = save()
+    db.session.execute(text('UPDATE learning_path SET focus_areas = :value WHERE id = :id'),
+                       {'value': stored, 'id': path_id})
+    db.session.commit()
+
+    assert reload(path_id).focus_areas == expected
+
+
+
+def stored_text(path_id):
+    return db.session.execute(text('SELECT focus_areas FROM learning_path WHERE id = :id'), {'id': path_id}).scalar()
+
+
+@pytest.mark.parametrize('value', ['"123"', '"algorithms"', '42', '[1, "two"]', '{"a": [1, 2]}'])
+def test_decoded_values_round_trip(app, value):
+    decoded = reload(save(focus_areas=value)).focus_areas
+
+    copy_id = save(focus_areas=decoded)  # Written back from the decoded value
+
+    assert json.loads(stored_text(copy_id)) == json.loads(value)
+    copied = reload(copy_id).focus_areas
+    assert copied == json.loads(value)
+    assert isinstance(copied, type(json.loads(value)))  # "123" stays a string
@@ -0,0 +1,87 @@
+"""The dashboard loaders run a fixed number of statements however much data a user has"""
+from datetime import datetime, timedelta
+
+from website import db
+from website.models import (
+    Achievement, Course, LearningPath, Module, Note, Quiz, QuizAttempt, Schedule, User, UserProgress,
+)
+
+
+def add_user(courses):
+    user = User(email=f'user{courses}@example.com', first_name='User')
+    db.session.add(user)
+    db.session.flush()
+    now = datetime.now()
+    for c in range(courses):
+        course = Course(title=f'Course {c}', user_id=user.id)
+        db.session.add(course)
+        db.session.flush()
+        for m in range(3):
+            module = Module(title=f'Module {m}', course_id=course.id, order=m)
+            db.session.add(module)
+            db.session.flush()
+            quiz = Quiz(title='Quiz', module_id=module.id)
+            db.session.add(quiz)
+            db.session.flush()
+            db.session.add_all([
+                UserProgress(user_id=user.id, module_id=module.id, is_completed=m == 0),
+                QuizAttempt(user_id=user.id, quiz_id=quiz.id, score=90, is_passed=True),
+            ])
+        db.session.add_all([
+            Achievement(title=f'Achievement {c}', user_id=user.id),
+            Schedule(user_id=user.id, title='Study', start_time=now + timedelta(days=c + 1),
+                     end_time=now + timedelta(days=c + 1, hours=1)),
+            Note(user_id=user.id, data='note'),
+        ])
+    db.session.add(LearningPath(user_id=user.id, career_path='Data Scientist'))
+    db.session.commit()
+    user_id = user.id
+    db.session.expunge_all()
+    return user_id
+
+
+def render_dashboard(user_id):
+    """Touch everything the dashboard and progress pages show"""
+    user = User.get_dashboard(user_id)
+    for course in user.courses:
+        [module.title for module in course.modules]
+    for progress in user.user_progress:
+        progress.module.title
+    return (len(user.achievements), len(user.schedules), len(user.learning_path),
+            len(user.quiz_attempts), len(user.notes))
+
+
+def count_statements(statements, action):
+    statements.clear()
+    action()
+    count = len(statements)
+    db.session.expunge_all()
+    return count
+
+
+def test_dashboard_statement_count_is_constant(app, statements):
+    small, large = add_user(1), add_user(8)
+
+    small_count = count_statements(statements, lambda: render_dashboard(small))
+    large_count = count_statements(statements, lambda: render_dashboard(large))
+
+    assert small_count == large_count
+    assert large_count <= 9  # The user, one per relationship, and the progress modules joined in
+
+
+def test_progress_summary_is_one_statement(app, statements):
+    user_id = add_user(4)
+
+    statements.clear()
+    summary = User.get_progress_summary(user_id)
+
+    assert len(statements) == 1
+    assert summary == {
+        'courses': 4,
+        'modules_started': 12,
+        'modules_completed': 4,
+        'achievements': 4,
+        'quiz_attempts': 12,
+        'quizzes_passed': 12,
+        'upcoming_sessions': 4,
+    }
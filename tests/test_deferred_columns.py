@@ -0,0 +1,44 @@
+"""Rarely used User columns stay out of list queries and load per group on first access"""
+import pytest
+from sqlalchemy import inspect
+
+from website import db
+from website.models import User
+
+PROFILE = ('username', 'phone', 'date_of_birth', 'bio', 'profile_image', 'job_title', 'company', 'location',
+           'website', 'timezone')
+DEFERRED = PROFILE + ('password', 'last_login', 'created_at', 'updated_at', 'email_notifications',
+                      'public_profile', 'show_courses', 'show_achievements')
+
+
+@pytest.fixture
+def users(app):
+    db.session.add_all([
+        User(email=f'user{i}@example.com', first_name='User', password='hash', bio='x' * 2000, job_title='Engineer')
+        for i in range(5)
+    ])
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def test_list_query_skips_deferred_columns(users, statements):
+    listed = User.query.all()
+
+    assert len(statements) == 1
+    select_list = statements[0][0].split(' FROM ')[0]
+    assert 'user.email' in select_list
+    for name in DEFERRED:
+        assert f'user.{name}' not in select_list
+    assert set(DEFERRED) <= inspect(listed[0]).unloaded
+
+
+def test_deferred_group_loads_together(users, statements):
+    user = User.query.first()
+    statements.clear()
+
+    assert user.job_title == 'Engineer'
+    assert len(statements) == 1
+    # The rest of the profile group came with it, the other groups did not
+    assert not set(PROFILE) & inspect(user).unloaded
+    assert user.bio == 'x' * 2000 and len(statements) == 1
+    assert 'password' in inspect(user).unloaded
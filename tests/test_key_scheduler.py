@@ -0,0 +1,214 @@
+"""KeyScheduler retry, AIMD and quarantine behavior, and the per-key model wrappers"""
+import asyncio
+import enum
+import sys
+import time
+import types
+
+import pytest
+
+import key_scheduler
+from key_scheduler import GeminiModel, KeyScheduler, NoHealthyKeysError, pooled_agenerate
+
+
+class RateLimited(Exception):
+    def __init__(self):
+        super().__init__('429 ResourceExhausted: quota exceeded')
+
+
+class InvalidKey(Exception):
+    def __init__(self):
+        super().__init__('400 API key not valid. Please pass a valid API key.')
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def state(scheduler, key):
+    return next(s for s in scheduler._states if s.key == key)
+
+
+def test_rate_limited_call_is_retried_on_another_key():
+    scheduler = KeyScheduler(['a', 'b'], burst=10)
+    used = []
+
+    async def call(lease):
+        used.append(lease.key)
+        if lease.key == 'a':
+            raise RateLimited()
+        return 'ok'
+
+    async def main():
+        # Make 'a' the first pick
+        state(scheduler, 'b').tokens = 5
+        return await scheduler.run(call)
+
+    assert run(main()) == 'ok'
+    assert used == ['a', 'b']
+    assert state(scheduler, 'a').throttles == 1
+    assert state(scheduler, 'b').successes == 1
+
+
+def test_rate_limit_halves_the_limit_and_starts_a_cooldown():
+    scheduler = KeyScheduler(['a'], initial_concurrency=4, max_concurrency=4)
+
+    async def main():
+        async with scheduler.lease() as lease:
+            lease.report(RateLimited())
+
+    before = time.monotonic()
+    run(main())
+
+    a = state(scheduler, 'a')
+    assert a.limit == 2
+    assert a.tokens == 0
+    assert a.cooldown_until >= before + key_scheduler.KEY_BACKOFF_BASE
+    assert a.in_flight == 0
+
+
+def test_successes_grow_the_limit_additively():
+    scheduler = KeyScheduler(['a'], burst=10, initial_concurrency=1, max_concurrency=4)
+
+    async def main():
+        for _ in range(3):
+            await scheduler.run(lambda lease: asyncio.sleep(0))
+
+    run(main())
+    assert state(scheduler, 'a').limit == pytest.approx(2.9)  # 1 -> 2 -> 2.5 -> 2.9 (+1/limit each)
+
+
+def test_invalid_key_is_quarantined_and_the_call_moves_on():
+    scheduler = KeyScheduler(['bad', 'good'], burst=10)
+
+    async def call(lease):
+        if lease.key == 'bad':
+            raise InvalidKey()
+        return lease.key
+
+    async def main():
+        state(scheduler, 'good').tokens = 5
+        return await scheduler.run(call)
+
+    assert run(main()) == 'good'
+    assert state(scheduler, 'bad').quarantined
+    assert scheduler.healthy_keys == 1
+
+
+def test_no_healthy_keys_error_once_every_key_is_quarantined():
+    scheduler = KeyScheduler(['bad'])
+
+    async def call(lease):
+        raise InvalidKey()
+
+    with pytest.raises(NoHealthyKeysError):
+        run(scheduler.run(call))
+
+
+def test_other_errors_are_not_retried():
+    scheduler = KeyScheduler(['a', 'b'], burst=10)
+    calls = []
+
+    async def call(lease):
+        calls.append(lease.key)
+        raise ValueError('bad prompt')
+
+    with pytest.raises(ValueError):
+        run(scheduler.run(call))
+    assert len(calls) == 1
+
+
+class FakeChatModel:
+    """Stands in for the per-key ChatGoogleGenerativeAI"""
+
+    def __init__(self, key):
+        self.key = key
+        self.calls = []
+
+    async def _agenerate(self, messages, stop=None, **kwargs):
+        self.calls.append((messages, stop, kwargs))
+        if self.key == 'a':
+            raise RateLimited()
+        return f'generated with {self.key}'
+
+
+def test_pooled_agenerate_borrows_a_key_per_call():
+    scheduler = KeyScheduler(['a', 'b'], burst=10)
+
+    async def main():
+        state(scheduler, 'b').tokens = 5
+        return await pooled_agenerate(scheduler, 'agent_llm', FakeChatModel, ['hi'], stop=['\n'], tools=['search'])
+
+    assert run(main()) == 'generated with b'
+    b = scheduler._resources[(1, 'agent_llm')]
+    assert b.calls == [(['hi'], ['\n'], {'tools': ['search']})]  # Bound tools are passed on
+    assert all(s.in_flight == 0 for s in scheduler._states)  # Nothing is held between calls
+
+
+@pytest.fixture
+def fake_genai(monkeypatch):
+    """Minimal google.ai.generativelanguage / google.generativeai modules"""
+    glm = types.ModuleType('google.ai.generativelanguage')
+    clients = []
+
+    class Client:
+        def __init__(self, client_options):
+            self.api_key = client_options['api_key']
+            self.requests = []
+            clients.append(self)
+
+        async def generate_content(self, request):
+            self.requests.append(request)
+            return {'raw': f'reply via {self.api_key}'}
+
+    class SafetySetting(types.SimpleNamespace):
+        HarmBlockThreshold = enum.Enum('HarmBlockThreshold', 'BLOCK_NONE BLOCK_ONLY_HIGH')
+
+    glm.GenerativeServiceAsyncClient = Client
+    glm.GenerateContentRequest = types.SimpleNamespace
+    glm.Content = types.SimpleNamespace
+    glm.Part = types.SimpleNamespace
+    glm.SafetySetting = SafetySetting
+    glm.HarmCategory = enum.Enum('HarmCategory', 'HARM_CATEGORY_HARASSMENT HARM_CATEGORY_HATE_SPEECH')
+
+    genai = types.ModuleType('google.generativeai')
+    genai.types = types.SimpleNamespace(AsyncGenerateContentResponse=types.SimpleNamespace(
+        from_response=lambda response: ('wrapped', response)))
+
+    google = types.ModuleType('google')
+    google_ai = types.ModuleType('google.ai')
+    google.ai, google_ai.generativelanguage, google.generativeai = google_ai, glm, genai
+    for name, module in (('google', google), ('google.ai', google_ai), ('google.ai.generativelanguage', glm),
+                         ('google.generativeai', genai)):
+        monkeypatch.setitem(sys.modules, name, module)
+    return glm, clients
+
+
+def test_gemini_model_uses_its_own_key(fake_genai):
+    glm, clients = fake_genai
+    scheduler = KeyScheduler(['a', 'b'], burst=10)
+    safety = [{'category': 'HARM_CATEGORY_HARASSMENT', 'threshold': 'BLOCK_NONE'}]
+
+    async def main():
+        return await scheduler.run(
+            lambda lease: lease.model('gemini-1.5-flash').generate_content_async('Summarize', safety_settings=safety))
+
+    assert run(main()) == ('wrapped', {'raw': 'reply via a'})
+    request, = clients[0].requests
+    assert request.model == 'models/gemini-1.5-flash'
+    assert request.contents[0].parts[0].text == 'Summarize'
+    assert request.safety_settings[0].category is glm.HarmCategory.HARM_CATEGORY_HARASSMENT
+    assert request.safety_settings[0].threshold is glm.SafetySetting.HarmBlockThreshold.BLOCK_NONE
+
+
+def test_gemini_model_is_created_once_per_key(fake_genai):
+    _, clients = fake_genai
+    scheduler = KeyScheduler(['a'], burst=10)
+
+    async def main():
+        for _ in range(3):
+            await scheduler.run(lambda lease: lease.model('gemini-1.5-flash').generate_content_async('hi'))
+
+    run(main())
+    assert [client.api_key for client in clients] == ['a']
+    assert isinstance(scheduler._resources[(0, 'gemini:gemini-1.5-flash')], GeminiModel)
@@ -0,0 +1,54 @@
+"""Deferred LRU bookkeeping in the LLM response cache"""
+import sqlite3
+
+import pytest
+
+from llm_cache import LLMCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = LLMCache(str(tmp_path / 'llm_cache.sqlite3'), max_entries=2)
+    yield cache
+    cache.close()
+
+
+def last_access(cache):
+    """Read through a second connection, as another process would see it"""
+    with sqlite3.connect(cache.path) as conn:
+        return conn.execute('SELECT last_access FROM llm_cache').fetchone()[0]
+
+
+def test_hits_do_not_write(cache):
+    cache.set('model', 'prompt', 'answer')
+    changes = cache._conn.total_changes
+
+    for _ in range(10):
+        assert cache.get('model', 'prompt') == 'answer'
+    cache.get('model', 'other prompt')
+
+    assert cache._conn.total_changes == changes
+
+
+def test_flush_writes_touches_and_counters(cache):
+    cache.set('model', 'prompt', 'answer')
+    before = last_access(cache)
+    cache.get('model', 'prompt')
+    cache.get('model', 'missing')
+
+    cache.flush()
+
+    assert last_access(cache) > before
+    stats = cache.stats()
+    assert (stats['lifetime_hits'], stats['lifetime_misses']) == (1, 1)
+
+
+def test_eviction_sees_deferred_touches(cache):
+    cache.set('model', 'first', 'a')
+    cache.set('model', 'second', 'b')
+    cache.get('model', 'first')  # Now more recently used than 'second'
+
+    cache.set('model', 'third', 'c')
+
+    assert cache.get('model', 'first') == 'a'
+    assert cache.get('model', 'second') is None
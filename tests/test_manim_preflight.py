@@ -0,0 +1,82 @@
+"""Static preflight checks on generated Manim scenes"""
+import pytest
+
+from manim_preflight import PreflightStats, preflight_check
+
+# The shape manim.py asks the model for
+VALID_SCENE = '''
+from manim import *
+from manim_voiceover import VoiceoverScene
+from manim_voiceover.services.gtts import GTTSService
+import numpy as np
+
+
+class ChapterOneScene(VoiceoverScene):
+    def construct(self):
+        self.set_speech_service(GTTSService(lang='en'))
+        title = Text("Lists in Python")
+        with self.voiceover(text="A list is an ordered collection.") as tracker:
+            self.play(Write(title), run_time=tracker.duration)
+        self.wait(1)
+
+
+if __name__ == "__main__":
+    scene = ChapterOneScene()
+    scene.render()
+'''
+
+
+def test_valid_generated_scene_passes():
+    assert preflight_check(VALID_SCENE, 'ChapterOneScene') == []
+
+
+@pytest.mark.parametrize('source, expected', [
+    (VALID_SCENE.replace('def construct(self):', 'def construct(self)'), 'Syntax error on line 9'),
+    (VALID_SCENE.replace('        self.wait(1)', 'return 1'), 'Syntax error'), # Parses, but compile() rejects it
+])
+def test_syntax_error(source, expected):
+    problems = preflight_check(source, 'ChapterOneScene')
+    assert len(problems) == 1 and problems[0].startswith(expected)
+
+
+def test_missing_scene_class():
+    problems = preflight_check(VALID_SCENE, 'ChapterTwoScene')
+    assert problems == ["Scene class 'ChapterTwoScene' not found (classes: ChapterOneScene)"]
+
+
+@pytest.mark.parametrize('line, module', [
+    ('import os', 'os'),
+    ('import subprocess as sp', 'subprocess'),
+    ('from requests.adapters import HTTPAdapter', 'requests.adapters'),
+    ('from . import helpers', '.'),
+])
+def test_disallowed_import(line, module):
+    problems = preflight_check(f'{line}\n{VALID_SCENE}', 'ChapterOneScene')
+    assert problems == [f"Import of '{module}' on line 1 is not allowed"]
+
+
+def test_allowed_submodule_imports_pass():
+    source = f'import numpy.linalg\nfrom manim.utils.color import BLUE\n{VALID_SCENE}'
+    assert preflight_check(source, 'ChapterOneScene') == []
+
+
+def test_scene_must_be_a_voiceover_scene_with_speech_service():
+    source = VALID_SCENE.replace('(VoiceoverScene)', '(Scene)').replace(
+        "        self.set_speech_service(GTTSService(lang='en'))\n", '')
+    assert preflight_check(source, 'ChapterOneScene') == [
+        "Class 'ChapterOneScene' does not inherit from VoiceoverScene",
+        'construct() never calls self.set_speech_service(...)',
+    ]
+
+
+def test_qualified_base_and_missing_construct():
+    source = 'import manim_voiceover\n\nclass ChapterOneScene(manim_voiceover.VoiceoverScene):\n    pass\n'
+    assert preflight_check(source, 'ChapterOneScene') == ["Class 'ChapterOneScene' has no construct(self) method"]
+
+
+def test_stats():
+    stats = PreflightStats()
+    stats.record(True)
+    stats.record(False)
+    stats.record(False, dry_run=True)
+    assert (stats.passed, stats.rejected_static, stats.rejected_dry_run) == (1, 1, 1)
@@ -0,0 +1,63 @@
+"""Per-job media directories for concurrent renders"""
+import asyncio
+import os
+import sys
+
+from manim_render import RenderJob, run_render
+
+# Stands in for Manim: writes the scene video, subtitles, a partial movie file and a voiceover cache
+FAKE_MANIM = """
+import json, os, sys
+media_dir, stem, scene = sys.argv[1:4]
+quality_dir = os.path.join(media_dir, 'videos', stem, '480p15')
+os.makedirs(os.path.join(quality_dir, 'partial_movie_files', scene))
+for name in (scene + '.mp4', scene + '.srt', os.path.join('partial_movie_files', scene, '0001.mp4')):
+    with open(os.path.join(quality_dir, name), 'w') as f:
+        f.write(scene)
+os.makedirs(os.path.join(media_dir, 'voiceovers'))
+cache = os.path.join(media_dir, 'voiceovers', 'cache.json')
+if os.path.exists(cache):
+    sys.exit('voiceover cache already exists')
+with open(cache, 'w') as f:
+    json.dump([scene], f)
+sys.exit(int(scene.startswith('Broken')))
+"""
+
+
+class FakeJob(RenderJob):
+    def command(self, media_dir=None):
+        stem = os.path.splitext(os.path.basename(self.source_path))[0]
+        return [sys.executable, '-c', FAKE_MANIM, media_dir or self.media_dir, stem, self.scene_name]
+
+
+def render_all(jobs):
+    async def main():
+        return await asyncio.gather(*(run_render(job) for job in jobs))
+    return asyncio.run(main())
+
+
+def test_concurrent_renders_do_not_share_scratch_files(tmp_path):
+    media_dir = str(tmp_path / 'media')
+    jobs = [FakeJob(str(tmp_path / f'chapter_{i}.py'), f'Scene{i}', media_dir) for i in range(4)]
+
+    results = render_all(jobs)
+
+    assert [result.returncode for result in results] == [0, 0, 0, 0], [result.stderr for result in results]
+    for job in jobs:
+        with open(job.video_path()) as f:
+            assert f.read() == job.scene_name
+        assert os.path.exists(job.video_path()[:-4] + '.srt')
+        assert not os.path.exists(os.path.join(os.path.dirname(job.video_path()), 'partial_movie_files'))
+    assert os.listdir(os.path.join(media_dir, 'jobs')) == []
+    assert not os.path.exists(os.path.join(media_dir, 'voiceovers'))
+
+
+def test_failed_render_publishes_nothing(tmp_path):
+    media_dir = str(tmp_path / 'media')
+    job = FakeJob(str(tmp_path / 'chapter.py'), 'BrokenScene', media_dir)
+
+    result, = render_all([job])
+
+    assert result.returncode == 1
+    assert not os.path.exists(job.video_path())
+    assert os.listdir(os.path.join(media_dir, 'jobs')) == []
@@ -0,0 +1,49 @@
+"""Module.manim_video_url is resolved from manim_video_path"""
+import pytest
+from sqlalchemy import text
+
+from migrate_db import backfill_video_urls
+from website import db
+from website.models import Module
+
+
+@pytest.mark.parametrize('path, url', [
+    ('website/static/videos/chapter_1/480p15/Scene.mp4', '/static/videos/chapter_1/480p15/Scene.mp4'),
+    ('C:\\project\\website\\static\\videos\\Scene.mp4', '/static/videos/Scene.mp4'),
+    ('/tmp/media/Scene.mp4', '/tmp/media/Scene.mp4'),  # Outside the static folder
+])
+def test_local_path_stores_resolved_url(app, path, url):
+    module = Module(title='Intro', manim_video_path=path)
+    db.session.add(module)
+    db.session.commit()
+    module_id = module.id
+    db.session.expunge_all()
+
+    assert db.session.get(Module, module_id).manim_video_url == url
+
+
+@pytest.mark.parametrize('url', ['/static/videos/Scene.mp4', 'https://cdn.example.com/static/videos/Scene.mp4'])
+def test_resolved_url_is_left_unchanged(app, url):
+    assert Module(title='Intro', manim_video_path=url).manim_video_url == url
+
+
+def test_clearing_the_path_clears_the_url(app):
+    module = Module(title='Intro', manim_video_path='website/static/videos/Scene.mp4')
+    module.manim_video_path = None
+
+    assert module.manim_video_url is None
+    assert module.get_video_url() is None
+
+
+def test_backfill_resolves_rows_written_before_the_column(app):
+    module = Module(title='Intro', manim_video_path='website/static/videos/Scene.mp4')
+    db.session.add(module)
+    db.session.commit()
+    db.session.execute(text('UPDATE module SET manim_video_url = NULL'))
+    db.session.commit()
+
+    module_id = module.id
+    backfill_video_urls()
+
+    db.session.expunge_all()
+    assert db.session.get(Module, module_id).manim_video_url == '/static/videos/Scene.mp4'
@@ -0,0 +1,86 @@
+"""
+EXPLAIN QUERY PLAN on the SQL the model helpers actually emit.
+
+Each helper runs against a seeded database while its statements are recorded.
+Every recorded statement must be served by an index, so a bare "SCAN <table>"
+(a full table scan) fails the test.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from website import db, user_cache
+from website.models import (
+    Achievement, ChatMessage, Course, LearningPath, Lesson, Module, Note, Quiz, QuizAttempt, Schedule,
+    User, UserProgress, UserSettings,
+)
+
+
+@pytest.fixture
+def seeded(app):
+    user = User(email='ada@example.com', first_name='Ada', last_name='Lovelace')
+    db.session.add(user)
+    db.session.flush()
+    course = Course(title='Algorithms', user_id=user.id)
+    db.session.add(course)
+    db.session.flush()
+    modules = [Module(title=f'Module {i}', course_id=course.id, order=i) for i in range(3)]
+    db.session.add_all(modules)
+    db.session.flush()
+    quiz = Quiz(title='Quiz', module_id=modules[0].id)
+    db.session.add(quiz)
+    db.session.flush()
+    now = datetime.now()
+    db.session.add_all([
+        Lesson(title='Lesson', module_id=modules[0].id, course_id=course.id, order=0),
+        UserProgress(user_id=user.id, module_id=modules[0].id, is_completed=True),
+        Achievement(title='First steps', user_id=user.id),
+        QuizAttempt(user_id=user.id, quiz_id=quiz.id, score=80, is_passed=True),
+        Schedule(user_id=user.id, title='Study', start_time=now + timedelta(days=1), end_time=now + timedelta(days=1, hours=1)),
+        LearningPath(user_id=user.id, career_path='Software Engineer', focus_areas=['algorithms']),
+        Note(user_id=user.id, data='note'),
+        UserSettings(user_id=user.id),
+        ChatMessage(user_id=user.id, role='user', content='hello'),
+    ])
+    ids = {'user_id': user.id, 'course_id': course.id, 'module_id': modules[0].id, 'quiz_id': quiz.id}
+    db.session.commit()
+    db.session.expunge_all()
+    return ids
+
+
+QUERIES = {
+    'User.get_dashboard': lambda ids: User.get_dashboard(ids['user_id']),
+    'User.get_progress_summary': lambda ids: User.get_progress_summary(ids['user_id']),
+    'UserCache.load_user': lambda ids: user_cache.load_user(ids['user_id']),
+    'ChatMessage.get_chat_history': lambda ids: ChatMessage.get_chat_history(ids['user_id']),
+    'Course modules in order': lambda ids: Module.query.filter_by(course_id=ids['course_id']).order_by(Module.order).all(),
+    'Module lessons in order': lambda ids: Lesson.query.filter_by(module_id=ids['module_id']).order_by(Lesson.order).all(),
+    'UserProgress by user/module': lambda ids: UserProgress.query.filter_by(
+        user_id=ids['user_id'], module_id=ids['module_id']).first(),
+    'QuizAttempt by user/quiz': lambda ids: QuizAttempt.query.filter_by(
+        user_id=ids['user_id'], quiz_id=ids['quiz_id']).all(),
+    'Schedule by user': lambda ids: Schedule.query.filter_by(user_id=ids['user_id']).order_by(Schedule.start_time).all(),
+}
+
+
+def full_scans(statement, parameters):
+    """Return the plan lines of a statement that scan a whole table"""
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        details = [row[3] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+    # "SCAN t USING [COVERING] INDEX" walks an index; a bare "SCAN t" reads every row
+    return [d for d in details if d.startswith('SCAN') and 'USING' not in d and d != 'SCAN CONSTANT ROW']
+
+
+@pytest.mark.parametrize('name', QUERIES)
+def test_query_uses_indexes(seeded, statements, name):
+    user_cache.clear()
+    statements.clear()
+    QUERIES[name](seeded)
+    assert statements, f"{name} did not run any SQL"
+    for statement, parameters in list(statements):
+        scans = full_scans(statement, parameters)
+        assert not scans, f"{name} does a full table scan ({'; '.join(scans)}):\n{statement}"
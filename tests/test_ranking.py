@@ -0,0 +1,73 @@
+"""Ranking cache freshness"""
+from types import SimpleNamespace
+
+import pytest
+
+import youtube_stub
+from website import config
+from website.models import Module
+from website.ranking import RankingCache, rank_course_videos, ranking_cache
+from website.youtube import fetch_video_metadata
+
+
+@pytest.fixture
+def stub(app, monkeypatch):
+    server, url = youtube_stub.start_stub()
+    youtube_stub.YouTubeStubHandler.requests_served = 0
+    monkeypatch.setattr(config, 'YOUTUBE_API_URL', url)
+    monkeypatch.setattr(config, 'YOUTUBE_API_KEY', None)
+    ranking_cache._entries.clear()
+    yield youtube_stub.YouTubeStubHandler
+    ranking_cache._entries.clear()
+    server.shutdown()
+    server.server_close()
+
+
+def course():
+    return [
+        Module(id=i, title=f'Module {i}', youtube_links=[f'https://youtu.be/vid0000000{2 * i + j}' for j in range(2)])
+        for i in range(3)
+    ]
+
+
+USER = SimpleNamespace(id=1, settings=[], cs_survey=None)
+
+
+def test_ranking_made_without_metadata_is_not_reused_once_it_exists(stub, monkeypatch):
+    rank_course_videos(USER, course())
+    assert stub.requests_served == 0
+
+    monkeypatch.setattr(config, 'YOUTUBE_API_KEY', 'stub-key')
+    rank_course_videos(USER, course())
+    assert stub.requests_served == 1  # Not answered from the keyless entry
+
+    rank_course_videos(USER, course())
+    assert stub.requests_served == 1
+    assert len(ranking_cache._entries) == 2
+
+
+def test_refreshed_metadata_invalidates_the_ranking(stub, monkeypatch):
+    monkeypatch.setattr(config, 'YOUTUBE_API_KEY', 'stub-key')
+    rank_course_videos(USER, course())
+    entries_before = len(ranking_cache._entries)
+
+    # Another page refreshes the same videos' metadata
+    with monkeypatch.context() as m:
+        m.setattr(config, 'VIDEO_METADATA_TTL', 0)
+        fetch_video_metadata([f'vid0000000{i}' for i in range(6)])
+    assert stub.requests_served == 2
+
+    rank_course_videos(USER, course())
+    assert len(ranking_cache._entries) == entries_before + 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr('website.ranking.time.monotonic', lambda: clock[0])
+    cache = RankingCache(ttl=60)
+    cache.set('key', ['ranked'])
+
+    clock[0] += 59
+    assert cache.get('key') == ['ranked']
+    clock[0] += 2
+    assert cache.get('key') is None
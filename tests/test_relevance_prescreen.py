@@ -0,0 +1,100 @@
+"""Relevance pre-screen bands and their calibration on the hand-labeled transcripts in tests/data"""
+import os
+
+import pytest
+
+import relevance_prescreen
+from relevance_prescreen import (
+    band_label, calibrate, load_labeled, log_label, prescreen_relevance, query_terms, score_transcript, tokenize,
+)
+
+SAMPLES = load_labeled(os.path.join(os.path.dirname(__file__), 'data', 'prescreen_labeled.jsonl'))
+
+
+def sample(chapter_title, label):
+    return next(s for s in SAMPLES if s['chapter_title'] == chapter_title and s['label'] == label)
+
+
+def local_label(s):
+    return band_label(score_transcript(s['transcript'], s['chapter_title'], s['course_topic']))
+
+
+def test_title_filler_is_not_a_required_term():
+    terms = query_terms('Working with Lists in Python', 'Python Programming')
+    assert {t for t, w in terms.items() if w == relevance_prescreen.TITLE_WEIGHT} == {'list', 'python'}
+    assert set(query_terms('Understanding Dictionaries: The Basics', 'Python')) == {'dictionary', 'python'}
+    assert set(query_terms('Getting Started: Using Loops', 'Python')) == {'loop', 'python'}
+
+
+def test_plurals_match_singulars():
+    assert tokenize('Dictionaries arrays class') == tokenize('dictionary array class')
+
+
+def test_filler_title_reaches_full_coverage():
+    s = sample('Working with Lists in Python', 'Highly Relevant')
+    assert score_transcript(s['transcript'], s['chapter_title'], s['course_topic'])['title_coverage'] == 1.0
+
+
+@pytest.mark.parametrize('chapter_title', ['Working with Lists in Python', 'Understanding Dictionaries',
+                                           'Using Loops in Python', 'Binary Search Trees'])
+def test_high_band(chapter_title):
+    assert local_label(sample(chapter_title, 'Highly Relevant')) == 'Highly Relevant'
+
+
+@pytest.mark.parametrize('chapter_title', ['Understanding Dictionaries', 'Recursion Basics'])
+def test_low_band(chapter_title):
+    assert local_label(sample(chapter_title, 'Not Relevant')) == 'Not Relevant'
+
+
+@pytest.mark.parametrize('chapter_title, label', [
+    ('Working with Lists in Python', 'Moderately Relevant'), # Tuples and sets, lists mentioned throughout
+    ('Using Loops in Python', 'Moderately Relevant'), # JavaScript loops, Python mentioned once
+    ('Binary Search Trees', 'Moderately Relevant'), # Binary search on arrays, no trees
+    ('Understanding Dictionaries', 'Moderately Relevant'), # Hash tables
+    ('File Handling in Python', 'Not Relevant'), # pip and venv: on topic, off chapter
+])
+def test_ambiguous_transcripts_are_escalated(chapter_title, label):
+    assert local_label(sample(chapter_title, label)) is None
+
+
+def test_no_labeled_transcript_is_mislabeled():
+    for s in SAMPLES:
+        assert local_label(s) in (None, s['label']), s['chapter_title']
+
+
+def test_short_transcript_is_escalated():
+    s = sample('Binary Search Trees', 'Highly Relevant')
+    short = ' '.join(s['transcript'].split()[:relevance_prescreen.PRESCREEN_MIN_TOKENS - 1])
+    assert local_label({**s, 'transcript': short}) is None
+
+
+def test_defaults_match_calibration():
+    result = calibrate(SAMPLES)
+    assert result['PRESCREEN_HIGH_COVERAGE'] == relevance_prescreen.PRESCREEN_HIGH_COVERAGE
+    assert round(result['PRESCREEN_HIGH_SCORE'], 2) == relevance_prescreen.PRESCREEN_HIGH_SCORE
+    assert result['PRESCREEN_LOW_COVERAGE'] == relevance_prescreen.PRESCREEN_LOW_COVERAGE
+    assert result['PRESCREEN_LOW_SCORE'] == relevance_prescreen.PRESCREEN_LOW_SCORE
+    assert (result['high_labeled'], result['low_labeled'], result['samples']) == (4, 2, len(SAMPLES))
+
+
+def test_calibrate_closes_a_band_that_always_disagrees():
+    relevant = sample('Binary Search Trees', 'Highly Relevant')
+    result = calibrate([relevant, {**relevant, 'label': 'Not Relevant'}])
+    assert result['high_labeled'] == 0 and result['low_labeled'] == 0
+    assert result['PRESCREEN_HIGH_SCORE'] == float('inf')
+
+
+def test_label_log_round_trip(tmp_path):
+    path = str(tmp_path / 'labels.jsonl')
+    for s in SAMPLES[:3]:
+        log_label(s['transcript'], s['chapter_title'], s['course_topic'], s['label'], path=path)
+    log_label('ignored', 'ignored', 'ignored', 'Not Relevant', path=None)
+    assert load_labeled(path) == SAMPLES[:3]
+
+
+def test_stats_count_labeled_and_escalated(monkeypatch):
+    stats = relevance_prescreen.PrescreenStats()
+    monkeypatch.setattr(relevance_prescreen, 'prescreen_stats', stats)
+    for s in SAMPLES:
+        prescreen_relevance(s['transcript'], s['chapter_title'], s['course_topic'])
+    assert (stats.labeled, stats.escalated) == (6, 5)
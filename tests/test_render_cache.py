@@ -0,0 +1,129 @@
+"""RenderCache hits, misses, key invalidation, per-quality storage and eviction"""
+import os
+import time
+
+import pytest
+
+from manim_render import RenderJob
+from render_cache import RenderCache
+
+
+@pytest.fixture
+def scene(tmp_path):
+    path = tmp_path / 'scene_1.py'
+    path.write_text('class Intro(VoiceoverScene): pass\n')
+    return str(path)
+
+
+def job(scene, tmp_path, flags=('-ql',), media='media'):
+    return RenderJob(scene, 'Intro', str(tmp_path / media), quality_flags=list(flags))
+
+
+def render(job, content='video'):
+    """Write what Manim would: <Scene>.mp4 and .srt in the job's quality folder."""
+    folder = os.path.dirname(job.video_path())
+    os.makedirs(folder, exist_ok=True)
+    for ext in ('.mp4', '.srt'):
+        with open(os.path.join(folder, job.scene_name + ext), 'w') as f:
+            f.write(f'{content}{ext}')
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def test_miss_then_hit_restores_files(scene, tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    first = job(scene, tmp_path)
+    assert cache.restore(first) is None
+
+    since = time.time()
+    render(first)
+    cache.store(first, render_seconds=12.5, since=since)
+
+    second = job(scene, tmp_path, media='other_media')
+    meta = cache.restore(second)
+    assert meta['render_seconds'] == 12.5
+    assert sorted(meta['files']) == [os.path.join('480p15', 'Intro.mp4'), os.path.join('480p15', 'Intro.srt')]
+    assert read(second.video_path()) == 'video.mp4'
+    assert second.video_path() in meta['paths']
+    assert not any(name.endswith('.tmp') for name in os.listdir(os.path.dirname(second.video_path())))
+    assert (cache.hits, cache.misses, cache.saved_seconds) == (1, 1, 12.5)
+
+
+def test_changed_source_is_a_miss(scene, tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    first = job(scene, tmp_path)
+    render(first)
+    cache.store(first, 1.0, since=0)
+
+    with open(scene, 'a') as f:
+        f.write('# regenerated\n')
+    assert cache.restore(job(scene, tmp_path, media='other_media')) is None
+
+
+def test_key_covers_quality_and_version(scene, tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    preview = job(scene, tmp_path)
+    assert cache.key_for(preview) != cache.key_for(job(scene, tmp_path, flags=('-qh',)))
+    key = cache.key_for(preview)
+    cache.version = 'other'
+    assert cache.key_for(preview) != key
+    assert cache.key_for(RenderJob(str(tmp_path / 'missing.py'), 'Intro', str(tmp_path))) is None
+
+
+def test_final_render_does_not_cache_the_preview_files(scene, tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    preview = job(scene, tmp_path)
+    final = job(scene, tmp_path, flags=('-qh',))
+    since = time.time()
+    render(preview, 'preview')
+    render(final, 'final')
+    cache.store(final, 30.0, since=since)
+
+    restored = job(scene, tmp_path, flags=('-qh',), media='other_media')
+    meta = cache.restore(restored)
+    assert all(path.startswith('1080p60') for path in meta['files'])
+    assert read(restored.video_path()) == 'final.mp4'
+    assert not os.path.exists(job(scene, tmp_path, media='other_media').video_path())
+
+
+def test_files_from_earlier_renders_are_not_stored(scene, tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    stale = job(scene, tmp_path)
+    render(stale)
+    os.utime(stale.video_path(), (0, 0))
+    os.utime(os.path.join(os.path.dirname(stale.video_path()), 'Intro.srt'), (0, 0))
+    cache.store(stale, 1.0, since=time.time())
+    assert cache.stats()['entries'] == 0
+
+
+def test_expired_entry_is_a_miss(scene, tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'), max_age=60)
+    first = job(scene, tmp_path)
+    render(first)
+    cache.store(first, 1.0, since=0)
+    cache.max_age = -1
+    assert cache.restore(job(scene, tmp_path, media='other_media')) is None
+
+
+def test_least_recently_used_entry_is_evicted_over_the_size_limit(tmp_path):
+    cache = RenderCache(str(tmp_path / 'cache'))
+    jobs, now = [], time.time()
+    for i in range(3):
+        source = tmp_path / f'scene_{i}.py'
+        source.write_text(f'class Intro(Scene): pass  # {i}\n')
+        jobs.append(job(str(source), tmp_path))
+        render(jobs[i])
+        cache.store(jobs[i], 1.0, since=0)
+        os.utime(os.path.join(cache.directory, cache.key_for(jobs[i])), (now - 10 + i, now - 10 + i))
+    cache.restore(jobs[0]) # Used most recently, so it outlives jobs[1]
+
+    cache.max_bytes = cache.stats()['bytes'] - 1
+    cache.store(jobs[2], 1.0, since=0) # Any store trims the cache
+
+    assert cache.evictions == 1
+    assert cache.stats()['entries'] == 2
+    assert cache.restore(jobs[1]) is None
+    assert cache.restore(jobs[0]) is not None and cache.restore(jobs[2]) is not None
@@ -0,0 +1,83 @@
+"""Resource limits applied to supervised renders, and decoding of their output"""
+import asyncio
+import sys
+
+import pytest
+
+import render_supervisor
+from render_supervisor import RenderSupervisor
+
+posix_only = pytest.mark.skipif(render_supervisor.resource is None, reason='rlimits are POSIX only')
+
+PRINT_LIMITS = 'import resource; print(resource.getrlimit(resource.RLIMIT_CPU)[0], resource.getrlimit(resource.RLIMIT_AS)[0])'
+
+
+def run(command):
+    supervisor = RenderSupervisor(command, 'test')
+    returncode = asyncio.run(supervisor.run())
+    return returncode, list(supervisor.stdout), list(supervisor.stderr)
+
+
+@posix_only
+def test_limits_are_applied_before_the_command_runs(monkeypatch):
+    monkeypatch.setattr(render_supervisor, 'MANIM_RENDER_MAX_CPU_SECONDS', 120)
+    monkeypatch.setattr(render_supervisor, 'MANIM_RENDER_MAX_MEMORY_MB', 4096)
+
+    returncode, stdout, stderr = run([sys.executable, '-c', PRINT_LIMITS])
+
+    assert returncode == 0, stderr
+    assert stdout == [f'120 {4096 * 1024 * 1024}']
+
+
+@posix_only
+def test_address_space_is_left_alone_by_default(monkeypatch):
+    monkeypatch.setattr(render_supervisor, 'MANIM_RENDER_MAX_CPU_SECONDS', 120)
+
+    returncode, stdout, _ = run([sys.executable, '-c', PRINT_LIMITS])
+
+    assert returncode == 0
+    cpu, address_space = map(int, stdout[0].split())
+    assert cpu == 120
+    resource = render_supervisor.resource
+    assert address_space == resource.getrlimit(resource.RLIMIT_AS)[0]  # Inherited unchanged
+
+
+@posix_only
+def test_no_wrapper_without_limits(monkeypatch):
+    monkeypatch.setattr(render_supervisor, 'MANIM_RENDER_MAX_CPU_SECONDS', 0)
+    monkeypatch.setattr(render_supervisor, 'MANIM_RENDER_MAX_MEMORY_MB', 0)
+
+    assert render_supervisor.limited_command(['manim', 'scene.py']) == ['manim', 'scene.py']
+
+
+@posix_only
+def test_exit_code_of_the_wrapped_command_is_kept(monkeypatch):
+    monkeypatch.setattr(render_supervisor, 'MANIM_RENDER_MAX_CPU_SECONDS', 120)
+
+    returncode, _, _ = run([sys.executable, '-c', 'import sys; sys.exit(3)'])
+
+    assert returncode == 3
+
+
+def pump(chunks):
+    """Feed raw output chunks through RenderSupervisor._pump and return the lines it kept."""
+    async def main():
+        stream = asyncio.StreamReader()
+        for chunk in chunks:
+            stream.feed_data(chunk)
+        stream.feed_eof()
+        lines = []
+        await RenderSupervisor([], 'test')._pump(stream, lines)
+        return lines
+    return asyncio.run(main())
+
+
+def test_multibyte_characters_split_across_reads_are_kept():
+    # Manim's progress bars draw with box characters (3 bytes each in UTF-8); make one straddle the 4096-byte read
+    line = 'x' * 4095 + '\u2588\u2588 done\n'
+    data = (line + 'Animation 1: \u2502\u2502\u2502').encode('utf-8')
+    assert pump([data[:4096], data[4096:]]) == [line.rstrip('\n'), 'Animation 1: \u2502\u2502\u2502']
+
+
+def test_invalid_and_truncated_bytes_are_replaced():
+    assert pump([b'bad \xff byte\n', b'cut \xe2\x94']) == ['bad \ufffd byte', 'cut \ufffd']
@@ -0,0 +1,66 @@
+"""RunState checkpoints: resume, crash-truncated lines and keeping the previous file on a fresh run"""
+import os
+
+from run_state import RunState
+
+
+def test_resume_returns_completed_stages(tmp_path):
+    state = RunState('Python Basics', directory=tmp_path)
+    state.record('overview', {'text': 'outline'})
+    state.record('search', {'link': 'https://youtu.be/abc'}, 'Lists')
+    state.close()
+
+    resumed = RunState('Python Basics', resume=True, directory=tmp_path)
+    assert resumed.completed == 2
+    assert resumed.get('overview') == {'text': 'outline'}
+    assert resumed.get('search', 'Lists') == {'link': 'https://youtu.be/abc'}
+    assert resumed.get('search', 'Loops') is None
+    resumed.record('search', {'link': 'https://youtu.be/def'}, 'Loops')
+    resumed.close()
+
+    # Resuming appends, so both runs' results are there next time
+    again = RunState('Python Basics', resume=True, directory=tmp_path)
+    assert again.completed == 3
+    again.close()
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    state = RunState('Python Basics', directory=tmp_path)
+    state.record('search', {'link': 'https://youtu.be/abc'}, 'Lists')
+    state.close()
+    with open(state.path, 'a', encoding='utf-8') as f:
+        f.write('{"topic": "Python Basics", "stage": "search", "chap') # Killed mid-write
+
+    resumed = RunState('Python Basics', resume=True, directory=tmp_path)
+    assert resumed.completed == 1
+    assert resumed.get('search', 'Lists') == {'link': 'https://youtu.be/abc'}
+    resumed.close()
+
+
+def test_other_topics_in_the_file_are_ignored(tmp_path):
+    # Topics that slug to the same file don't leak into each other
+    state = RunState('C++', directory=tmp_path)
+    state.record('overview', {'text': 'c++ outline'})
+    state.close()
+    resumed = RunState('C', resume=True, directory=tmp_path)
+    assert resumed.path == state.path and resumed.get('overview') is None
+    resumed.close()
+
+
+def test_fresh_run_keeps_previous_checkpoint(tmp_path):
+    crashed = RunState('Python Basics', directory=tmp_path)
+    crashed.record('search', {'link': 'https://youtu.be/abc'}, 'Lists')
+    crashed.close()
+
+    fresh = RunState('Python Basics', directory=tmp_path)
+    assert fresh.completed == 0
+    assert fresh.backup == crashed.path + '.bak'
+    fresh.close()
+    assert os.path.getsize(fresh.path) == 0
+
+    # The crashed run can still be resumed by moving its file back
+    os.replace(fresh.backup, fresh.path)
+    resumed = RunState('Python Basics', resume=True, directory=tmp_path)
+    assert resumed.get('search', 'Lists') == {'link': 'https://youtu.be/abc'}
+    assert resumed.backup is None
+    resumed.close()
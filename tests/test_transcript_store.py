@@ -0,0 +1,18 @@
+"""Transcript store statistics"""
+from transcript_store import CAPTIONS_MODEL, TranscriptStore, format_store_stats
+
+
+def test_caption_reads_and_llm_transcriptions_are_counted_separately(tmp_path):
+    store = TranscriptStore(str(tmp_path))
+    links = [f'https://youtu.be/video{i:06d}' for i in range(4)]
+
+    for link in links:
+        assert store.get(link) is None
+    store.put(links[0], 'from captions', CAPTIONS_MODEL)
+    store.put(links[1], 'from captions', CAPTIONS_MODEL)
+    store.put(links[2], 'from the model', 'gemini-1.5-flash-latest')
+    assert store.get(links[0])['text'] == 'from captions'
+
+    stats = store.stats()
+    assert (stats['hits'], stats['misses'], stats['captions'], stats['transcribed']) == (1, 4, 2, 1)
+    assert format_store_stats(stats).startswith('1 reused / 2 from captions / 1 transcribed by LLM / 1 failed, ')
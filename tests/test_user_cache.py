@@ -0,0 +1,73 @@
+"""The session user cache must not serve changes made by another worker's writes"""
+import pytest
+
+from website import db, user_cache
+from website.cache import UserCache
+from website.models import User, UserSettings
+
+
+@pytest.fixture
+def user_id(app):
+    user = User(email='grace@example.com', first_name='Grace', is_active=True, is_survey_completed=False)
+    db.session.add(user)
+    db.session.flush()
+    db.session.add(UserSettings(user_id=user.id, theme='light'))
+    db.session.commit()
+    user_id = user.id
+    db.session.expunge_all()
+    return user_id
+
+
+def test_hit_costs_one_primary_key_lookup(user_id, statements):
+    worker = UserCache()
+    worker.load_user(user_id)
+    db.session.expunge_all()
+    statements.clear()
+
+    user = worker.load_user(user_id)
+
+    assert worker.stats()['hits'] == 1
+    assert len(statements) == 1
+    assert user.settings[0].theme == 'light'
+
+
+def test_other_worker_sees_user_flag_changes(user_id):
+    other_worker = UserCache()  # Not reached by this process's invalidation hooks
+    assert other_worker.load_user(user_id).is_active
+    db.session.expunge_all()
+
+    user = db.session.get(User, user_id)
+    user.is_active = False
+    user.is_survey_completed = True
+    db.session.commit()
+    db.session.expunge_all()
+
+    reloaded = other_worker.load_user(user_id)
+    assert reloaded.is_active is False
+    assert reloaded.is_survey_completed is True
+    assert other_worker.stats()['hits'] == 0
+
+
+def test_other_worker_sees_settings_changes(user_id):
+    other_worker = UserCache()
+    assert other_worker.load_user(user_id).settings[0].theme == 'light'
+    db.session.expunge_all()
+
+    settings = UserSettings.query.filter_by(user_id=user_id).one()
+    settings.theme = 'dark'
+    db.session.commit()
+    db.session.expunge_all()
+
+    assert other_worker.load_user(user_id).settings[0].theme == 'dark'
+
+
+def test_deleted_user_is_not_served(user_id):
+    other_worker = UserCache()
+    other_worker.load_user(user_id)
+    db.session.expunge_all()
+
+    UserSettings.query.filter_by(user_id=user_id).delete()
+    User.query.filter_by(id=user_id).delete()
+    db.session.commit()
+
+    assert other_worker.load_user(user_id) is None
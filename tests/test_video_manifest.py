@@ -0,0 +1,85 @@
+"""Preview -> final video manifest and the Module swap"""
+import json
+import os
+
+import video_manifest
+from video_manifest import VideoManifest, swap_module_video
+from website import db
+from website.models import Module
+
+
+def test_preview_then_final_is_persisted(tmp_path):
+    manifest = VideoManifest(str(tmp_path))
+    assert manifest.current('Lists') is None
+
+    manifest.record_preview('Lists', 'ListsScene', 'media/480p15/ListsScene.mp4')
+    assert manifest.current('Lists') == 'media/480p15/ListsScene.mp4'
+    manifest.record_final('Lists', 'media/1080p60/ListsScene.mp4')
+
+    reloaded = VideoManifest(str(tmp_path))
+    entry = reloaded.chapters['Lists']
+    assert reloaded.current('Lists') == 'media/1080p60/ListsScene.mp4'
+    assert (entry['scene_name'], entry['preview'], entry['quality']) == ('ListsScene', 'media/480p15/ListsScene.mp4', 'final')
+    assert not os.path.exists(manifest.path + '.tmp')
+
+
+def test_new_preview_drops_the_older_final(tmp_path):
+    manifest = VideoManifest(str(tmp_path))
+    manifest.record_preview('Lists', 'ListsScene', 'v1/ListsScene.mp4')
+    manifest.record_final('Lists', 'v1/final/ListsScene.mp4')
+    manifest.record_preview('Lists', 'ListsScene', 'v2/ListsScene.mp4')
+
+    entry = VideoManifest(str(tmp_path)).chapters['Lists']
+    assert 'final' not in entry
+    assert (entry['current'], entry['quality']) == ('v2/ListsScene.mp4', 'preview')
+
+
+def test_unreadable_manifest_starts_empty(tmp_path):
+    (tmp_path / video_manifest.MANIFEST_FILE).write_text('{"Lists": ')
+    manifest = VideoManifest(str(tmp_path))
+    assert manifest.chapters == {}
+    manifest.record_preview('Lists', 'ListsScene', 'ListsScene.mp4')
+    assert json.loads((tmp_path / video_manifest.MANIFEST_FILE).read_text())['Lists']['current'] == 'ListsScene.mp4'
+
+
+def test_swap_points_modules_at_the_final_render(app):
+    preview = 'website/static/videos/chapter_1/480p15/ListsScene.mp4'
+    final = 'website/static/videos/chapter_1/1080p60/ListsScene.mp4'
+    db.session.add_all([
+        Module(title='Lists', manim_video_path=preview),
+        Module(title='Lists (copy)', manim_video_path=os.path.abspath(preview)),
+        Module(title='Loops', manim_video_path='website/static/videos/chapter_2/480p15/LoopsScene.mp4'),
+    ])
+    db.session.commit()
+
+    assert swap_module_video(preview, final, app=app) == 2
+
+    db.session.expire_all()
+    modules = {m.title: m for m in Module.query.all()}
+    assert modules['Lists'].manim_video_path == final
+    assert modules['Lists'].manim_video_url == '/static/videos/chapter_1/1080p60/ListsScene.mp4'
+    assert modules['Lists (copy)'].manim_video_path == final
+    assert modules['Loops'].manim_video_path.endswith('480p15/LoopsScene.mp4')
+
+
+def test_swap_without_a_matching_module_is_a_no_op(app):
+    db.session.add(Module(title='Loops', manim_video_path='website/static/videos/LoopsScene.mp4'))
+    db.session.commit()
+
+    assert swap_module_video('website/static/videos/ListsScene.mp4', 'final.mp4', app=app) == 0
+    db.session.expire_all()
+    assert Module.query.one().manim_video_path == 'website/static/videos/LoopsScene.mp4'
+
+
+def test_default_app_is_created_once(app, monkeypatch):
+    created = []
+
+    def create_app():
+        created.append(app)
+        return app
+
+    monkeypatch.setattr('website.create_app', create_app)
+    monkeypatch.setattr(video_manifest, '_app', None)
+    for _ in range(3):
+        swap_module_video('preview.mp4', 'final.mp4')
+    assert created == [app]
@@ -0,0 +1,93 @@
+"""Video metadata fetching against the local YouTube stub"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import youtube_stub
+from website import config, db
+from website.models import Module, Note, VideoMetadata
+from website.youtube import _store_metadata, fetch_video_metadata, prefetch_video_metadata
+
+
+@pytest.fixture
+def stub(app, monkeypatch):
+    server, url = youtube_stub.start_stub()
+    youtube_stub.YouTubeStubHandler.requests_served = 0
+    youtube_stub.YouTubeStubHandler.ids_requested = []
+    monkeypatch.setattr(config, 'YOUTUBE_API_URL', url)
+    monkeypatch.setattr(config, 'YOUTUBE_API_KEY', 'stub-key')
+    yield youtube_stub.YouTubeStubHandler
+    server.shutdown()
+    server.server_close()
+
+
+def video_ids(count):
+    return [f'vid{i:08d}'[:11] for i in range(count)]
+
+
+def test_configured_key_is_used_by_default(stub):
+    metadata = fetch_video_metadata(video_ids(3))
+
+    assert stub.requests_served == 1
+    assert metadata['vid00000001'].title == 'Stub video vid00000001'
+    assert VideoMetadata.query.count() == 3
+
+
+def test_ids_are_batched_and_then_served_from_the_database(stub):
+    fetch_video_metadata(video_ids(120))
+    assert [len(ids) for ids in stub.ids_requested] == [50, 50, 20]
+
+    again = fetch_video_metadata(video_ids(120))
+    assert stub.requests_served == 3
+    assert len(again) == 120
+
+
+def test_course_page_costs_one_request(stub):
+    links = [f'https://www.youtube.com/watch?v={v}' for v in video_ids(30)]
+    modules = [Module(title=f'Module {i}', youtube_links=links[2 * i:2 * i + 2]) for i in range(15)]
+
+    prefetch_video_metadata(modules)
+
+    assert stub.requests_served == 1
+    assert all(len(module.get_video_metadata()) == 2 for module in modules)
+
+
+def test_stale_rows_are_refreshed(stub):
+    old = datetime.now(timezone.utc) - timedelta(seconds=config.VIDEO_METADATA_TTL + 60)
+    db.session.add(VideoMetadata(video_id='vid00000000', title='Old title', fetched_at=old))
+    db.session.commit()
+
+    metadata = fetch_video_metadata(['vid00000000'])
+
+    assert stub.requests_served == 1
+    assert metadata['vid00000000'].title == 'Stub video vid00000000'
+    db.session.expire_all()
+    assert db.session.get(VideoMetadata, 'vid00000000').title == 'Stub video vid00000000'
+
+
+def test_callers_pending_changes_are_left_alone(stub):
+    note = Note(data='unsaved draft')
+    db.session.add(note)
+
+    fetch_video_metadata(video_ids(2))
+
+    assert note in db.session.new  # Neither flushed, committed nor rolled back
+    db.session.rollback()
+    assert Note.query.count() == 0
+    assert VideoMetadata.query.count() == 2
+
+
+def test_storing_the_same_video_twice_does_not_conflict(app):
+    row = VideoMetadata.values_from_api(youtube_stub.video_resource('vid00000000'), datetime.now(timezone.utc))
+
+    _store_metadata([row])
+    _store_metadata([dict(row, title='Renamed')])
+
+    assert VideoMetadata.query.one().title == 'Renamed'
+
+
+def test_without_a_key_nothing_is_fetched(stub, monkeypatch):
+    monkeypatch.setattr(config, 'YOUTUBE_API_KEY', None)
+
+    assert fetch_video_metadata(video_ids(2)) == {}
+    assert stub.requests_served == 0
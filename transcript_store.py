@@ -0,0 +1,165 @@
+"""
+Persistent transcript store shared across runs and topics.
+
+Transcripts are written as gzip-compressed JSON files named after the
+canonical YouTube video ID, so the watch?v=, youtu.be, embed and shorts forms
+of a link all map to the same entry. Each entry records which model (or
+"captions") produced it. The store is trimmed by age and total size, oldest
+entries first.
+"""
+
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+
+TRANSCRIPT_STORE_DIR = os.getenv("TRANSCRIPT_STORE_DIR", "transcript_store")
+TRANSCRIPT_STORE_MAX_BYTES = int(os.getenv("TRANSCRIPT_STORE_MAX_BYTES", 200 * 1024 * 1024))
+TRANSCRIPT_STORE_MAX_AGE = int(os.getenv("TRANSCRIPT_STORE_MAX_AGE", 90 * 24 * 3600)) # Seconds
+
+CAPTIONS_MODEL = "captions" # `model` of transcripts read from a caption track
+VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+
+def canonical_video_id(url: str) -> str | None:
+    """Return the 11-character video ID of any common YouTube URL form, or None."""
+    if not url:
+        return None
+    url = url.strip()
+    if VIDEO_ID_RE.match(url):
+        return url
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    host = (parsed.hostname or "").lower()
+    video_id = None
+    if host == "youtu.be" or host.endswith(".youtu.be"):
+        video_id = parsed.path.lstrip("/").split("/")[0]
+    elif host == "youtube.com" or host.endswith(".youtube.com"):
+        if parsed.path == "/watch":
+            video_id = parse_qs(parsed.query).get("v", [None])[0]
+        elif parsed.path.startswith(("/embed/", "/shorts/", "/v/", "/live/")):
+            video_id = parsed.path.split("/")[2]
+    return video_id if video_id and VIDEO_ID_RE.match(video_id) else None
+
+
+class TranscriptStore:
+    """Directory of compressed transcripts keyed by video ID, with size/age eviction."""
+
+    def __init__(self, directory: str = TRANSCRIPT_STORE_DIR, max_bytes: int = TRANSCRIPT_STORE_MAX_BYTES,
+                 max_age: int = TRANSCRIPT_STORE_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.caption_puts = 0 # Transcripts read from caption tracks this run
+        self.llm_puts = 0 # Transcripts produced by an LLM this run
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, video_id: str) -> str:
+        return os.path.join(self.directory, f"{video_id}.json.gz")
+
+    def get(self, url: str, model: str | None = None) -> dict | None:
+        """
+        Return the stored entry ({video_id, model, created_at, text}) for a URL or
+        video ID, or None. Pass `model` to only accept transcripts from that source.
+        """
+        video_id = canonical_video_id(url)
+        if video_id is None:
+            return None
+        path = self._path(video_id)
+        with self._lock:
+            try:
+                with gzip.open(path, "rt", encoding="utf-8") as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+            if time.time() - entry.get("created_at", 0) > self.max_age or (model and entry.get("model") != model):
+                self.misses += 1
+                return None
+            os.utime(path) # Touch so eviction keeps recently used transcripts
+            self.hits += 1
+            return entry
+
+    def put(self, url: str, text: str, model: str):
+        """Store a transcript for a URL or video ID. Unrecognized URLs are ignored."""
+        video_id = canonical_video_id(url)
+        if video_id is None or not text:
+            return
+        entry = {"video_id": video_id, "model": model, "created_at": time.time(), "text": text}
+        path = self._path(video_id)
+        tmp_path = f"{path}.tmp"
+        with self._lock:
+            if model == CAPTIONS_MODEL:
+                self.caption_puts += 1
+            else:
+                self.llm_puts += 1
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path) # Atomic, so readers never see a half-written file
+            self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json.gz"):
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+        return entries
+
+    def _evict(self):
+        now = time.time()
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, name in entries:
+            if total <= self.max_bytes and now - mtime <= self.max_age:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "captions": self.caption_puts,
+            "transcribed": self.llm_puts,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_transcript_store() -> TranscriptStore:
+    """Return the process-wide store (configured from TRANSCRIPT_STORE_* environment variables)."""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = TranscriptStore()
+        return _default_store
+
+
+def format_store_stats(stats: dict) -> str:
+    # A miss that was neither read from captions nor transcribed failed
+    failed = max(stats['misses'] - stats['captions'] - stats['transcribed'], 0)
+    return (f"{stats['hits']} reused / {stats['captions']} from captions / {stats['transcribed']} transcribed by LLM"
+            f" / {failed} failed, "
+            f"{stats['entries']} stored ({stats['bytes'] / 1024:.0f} KiB), {stats['evictions']} evicted")
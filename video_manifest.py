@@ -0,0 +1,86 @@
+"""
+Video manifest for the Manim quality ladder.
+
+Every chapter is first rendered at preview quality to validate the scene.
+Scenes that pass are re-rendered in the background at production quality.
+The manifest (video_manifest.json in the course output folder) records both
+artifacts per chapter and which one is current, so consumers always pick up
+the best finished video. With MANIM_UPDATE_MODULES=1, Module rows that point
+at a preview video are switched to the production render once it exists.
+The Module validator keeps manim_video_url in sync.
+"""
+
+import json
+import os
+import threading
+import time
+
+
+MANIM_UPDATE_MODULES = os.getenv("MANIM_UPDATE_MODULES", "0") == "1"
+MANIFEST_FILE = "video_manifest.json"
+
+
+class VideoManifest:
+    """Per-course JSON file of chapter -> {scene_name, preview, final, current, ...}."""
+
+    def __init__(self, output_dir: str):
+        self.path = os.path.join(output_dir, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.chapters = json.load(f)
+        except (OSError, ValueError):
+            self.chapters = {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.chapters, f, indent=2)
+        os.replace(tmp_path, self.path) # Atomic, so readers never see a half-written manifest
+
+    def record_preview(self, chapter: str, scene_name: str, video_path: str):
+        with self._lock:
+            entry = self.chapters.setdefault(chapter, {})
+            entry.update(scene_name=scene_name, preview=video_path, preview_at=time.time())
+            # A new preview replaces a final render of older scene code
+            entry.pop("final", None)
+            entry["current"] = video_path
+            entry["quality"] = "preview"
+            self._save()
+
+    def record_final(self, chapter: str, video_path: str):
+        with self._lock:
+            entry = self.chapters.setdefault(chapter, {})
+            entry.update(final=video_path, final_at=time.time(), current=video_path, quality="final")
+            self._save()
+
+    def current(self, chapter: str) -> str | None:
+        return self.chapters.get(chapter, {}).get("current")
+
+
+_app = None
+_app_lock = threading.Lock()
+
+
+def _get_app():
+    """The Flask app used for module updates, created on first use and reused for every final render."""
+    global _app
+    with _app_lock:
+        if _app is None:
+            from website import create_app # Only needed when MANIM_UPDATE_MODULES is on
+            _app = create_app()
+        return _app
+
+
+def swap_module_video(preview_path: str, final_path: str, app=None) -> int:
+    """Point Module rows that use the preview video at the final one. Returns the number of modules updated."""
+    from website import db
+    from website.models import Module
+
+    with (app or _get_app()).app_context():
+        candidates = {preview_path, os.path.abspath(preview_path), preview_path.replace("\\", "/")}
+        modules = Module.query.filter(Module.manim_video_path.in_(candidates)).all()
+        for module in modules:
+            module.manim_video_path = final_path # Validator resolves manim_video_url
+        db.session.commit()
+        return len(modules)
@@ -4,20 +4,23 @@ from os import path
 from flask_login import LoginManager
 from flask_migrate import Migrate
 from datetime import timedelta
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from . import config
 
 
 db = SQLAlchemy()
 DB_NAME = "database.db"
 
+from .cache import user_cache
+
 
 def create_app():
     app = Flask(__name__)
     app.config['SECRET_KEY']='Freestyle'
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_NAME}'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     app.config['REMEMBER_COOKIE_DURATION'] = timedelta(days=14)
     
-    db.init_app(app)
+    init_database(app, config.DATABASE_URL)
     
     # Setup migrations
     migrate = Migrate(app, db)
@@ -25,7 +28,7 @@ def create_app():
     from .views import views
     
     from .auth import auth
-    from .models import User
+    from .chat import chat
 
     # Create database
     create_database(app)
@@ -37,14 +40,70 @@ def create_app():
     
     @login_manager.user_loader
     def load_user(id):
-        return User.query.get(int(id))
+        return user_cache.load_user(int(id))
 
     app.register_blueprint(views, url_prefix='/')
     app.register_blueprint(auth, url_prefix='/')
+    app.register_blueprint(chat, url_prefix='/')
 
     return app
 
 
+def init_database(app, database_url):
+    """Bind the database (engine profile, session user cache) to an app, without the blueprints"""
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(database_url)
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['USER_CACHE_TTL'] = config.USER_CACHE_TTL
+
+    db.init_app(app)
+    user_cache.init_app(app)
+
+    # Tune every new SQLite connection before it is handed to the pool
+    if make_url(database_url).get_backend_name() == 'sqlite':
+        with app.app_context():
+            event.listen(db.engine, 'connect', apply_sqlite_pragmas)
+
+    from .cache import register_invalidation_hooks
+    register_invalidation_hooks()
+
+
+def engine_options(database_url):
+    """Return the SQLAlchemy engine options (pool sizing) for the given database URL"""
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite':
+        # In-memory databases use a single shared connection, so pool sizing does not apply
+        if not url.database or url.database == ':memory:':
+            return {}
+        return {
+            'pool_size': config.DB_POOL_SIZE,
+            'max_overflow': config.DB_MAX_OVERFLOW,
+            'pool_timeout': config.DB_POOL_TIMEOUT,
+            # The driver's own lock timeout, in seconds; busy_timeout below covers later statements too
+            'connect_args': {'timeout': config.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        }
+    return {
+        'pool_size': config.DB_POOL_SIZE,
+        'max_overflow': config.DB_MAX_OVERFLOW,
+        'pool_timeout': config.DB_POOL_TIMEOUT,
+        'pool_recycle': config.DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the SQLite engine profile (WAL, busy timeout, mmap, cache) to a new connection"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(config.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size={int(config.SQLITE_CACHE_SIZE)}")
+    finally:
+        cursor.close()
+
+
 def create_database(app):
     if not path.exists('website/' + DB_NAME):
         with app.app_context():
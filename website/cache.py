@@ -0,0 +1,174 @@
+"""
+Cross-request cache for the Flask-Login user loader
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import make_transient_to_detached, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from . import db
+
+
+def _column_snapshot(instance):
+    """Return the loaded column values of an ORM instance as a plain dict"""
+    state = inspect(instance)
+    return {
+        attr.key: state.dict[attr.key]
+        for attr in state.mapper.column_attrs
+        if attr.key in state.dict
+    }
+
+
+def _restore(model, values):
+    """Rebuild a detached ORM instance from a column snapshot without querying"""
+    instance = model(**values)
+    # Marks the snapshot values as loaded and anything missing as expired
+    make_transient_to_detached(instance)
+    return instance
+
+
+class UserCache:
+    """
+    Caches the session user (and its UserSettings) between requests.
+
+    Entries are column snapshots rather than ORM instances, so a cached user
+    never carries state from the session that loaded it. Within a request
+    Flask-Login keeps the loaded user on ``g``, so ``load_user`` runs at most
+    once per request.
+
+    The cache is per process, but a hit is never served blindly: it re-reads
+    ``User.SESSION_VERSION_COLUMNS`` (updated_at and the account flags) by
+    primary key and reloads the entry if any of them changed. Deactivating a
+    user or completing the survey in one worker therefore takes effect in
+    every worker on the next request. UserSettings writes bump the owner's
+    updated_at for the same reason. Only rows changed with raw SQL that leaves
+    updated_at alone can be served stale, for at most the TTL. A hit saves the
+    full user projection and the settings query.
+    """
+
+    def __init__(self, ttl=300, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        self.ttl = app.config.get('USER_CACHE_TTL', self.ttl)
+        self.max_entries = app.config.get('USER_CACHE_MAX_ENTRIES', self.max_entries)
+        app.extensions['user_cache'] = self
+
+    def load_user(self, user_id):
+        """Return the User for user_id, from the cache when possible"""
+        from .models import User, UserSettings
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and entry['expires'] <= now:
+                entry = None
+
+        if entry is not None and not self._is_current(user_id, entry):
+            self.invalidate(user_id)
+            entry = None
+        with self._lock:
+            if entry is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if entry is None:
+            user = User.query.options(
+                *User.session_user_options(), selectinload(User.settings)
+            ).get(user_id)
+            if user is None:
+                return None
+            self._store(user_id, user, now)
+            return user
+
+        user = _restore(User, entry['user'])
+        settings = [_restore(UserSettings, values) for values in entry['settings']]
+        set_committed_value(user, 'settings', settings)
+        # load=False attaches the instance to the session without emitting a SELECT
+        return db.session.merge(user, load=False)
+
+    def _is_current(self, user_id, entry):
+        """Compare the snapshot's version columns with the database (one primary key lookup)"""
+        from .models import User
+
+        columns = User.SESSION_VERSION_COLUMNS
+        current = db.session.execute(
+            select(*(getattr(User, name) for name in columns)).where(User.id == user_id)
+        ).first()
+        return current is not None and tuple(current) == tuple(entry['user'].get(name) for name in columns)
+
+    def _store(self, user_id, user, now):
+        entry = {
+            'user': _column_snapshot(user),
+            'settings': [_column_snapshot(s) for s in user.settings],
+            'expires': now + self.ttl,
+        }
+        with self._lock:
+            if len(self._entries) >= self.max_entries and user_id not in self._entries:
+                # Drop the entry closest to expiry to make room
+                oldest = min(self._entries, key=lambda k: self._entries[k]['expires'])
+                del self._entries[oldest]
+            self._entries[user_id] = entry
+
+    def invalidate(self, user_id):
+        """Forget the cached entry for a user"""
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the hit ratio"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+user_cache = UserCache()
+
+
+def _invalidate_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+
+
+def _invalidate_settings_owner(mapper, connection, target):
+    from .models import User
+
+    user_cache.invalidate(target.user_id)
+    # Other workers only notice the change through the owner's version columns
+    connection.execute(
+        update(User.__table__)
+        .where(User.__table__.c.id == target.user_id)
+        .values(updated_at=datetime.now(timezone.utc))
+    )
+
+
+def register_invalidation_hooks():
+    """Invalidate cached users whenever a User or UserSettings row changes"""
+    from .models import User, UserSettings
+
+    for event_name in ('after_update', 'after_delete'):
+        if not event.contains(User, event_name, _invalidate_user):
+            event.listen(User, event_name, _invalidate_user)
+    for event_name in ('after_insert', 'after_update', 'after_delete'):
+        if not event.contains(UserSettings, event_name, _invalidate_settings_owner):
+            event.listen(UserSettings, event_name, _invalidate_settings_owner)
@@ -0,0 +1,109 @@
+"""
+Streaming chat endpoint for the Skillora AI assistant
+"""
+import json
+
+import requests
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_login import current_user, login_required
+from http_clients import get_session, timeout_for
+from llm_cache import get_cache
+
+from . import config
+from .chat_context import build_chat_context
+from .models import ChatMessage
+
+chat = Blueprint('chat', __name__)
+
+
+def stream_completion(messages):
+    """
+    Request a streamed chat completion from OpenRouter.
+
+    Yields the content tokens as they arrive. Raises requests.RequestException
+    if the request fails.
+    """
+    headers = {
+        "Authorization": f"Bearer {config.OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+    }
+    payload = {
+        "model": config.OPENROUTER_MODEL,
+        "messages": messages,
+        "temperature": config.TEMPERATURE,
+        "max_tokens": config.MAX_TOKENS,
+        "stream": True,
+    }
+    with get_session().post(config.OPENROUTER_URL, headers=headers, json=payload, stream=True,
+                            timeout=timeout_for(config.OPENROUTER_URL)) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            # Skip keep-alive blank lines and SSE comments (": OPENROUTER PROCESSING")
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                continue
+            choices = chunk.get('choices') or [{}]
+            token = (choices[0].get('delta') or {}).get('content')
+            if token:
+                yield token
+
+
+def _sse(data, event=None):
+    """Format one Server-Sent Event"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+@chat.route('/chat/stream', methods=['POST'])
+@login_required
+def stream_chat():
+    """Stream the assistant reply as Server-Sent Events and save it once complete"""
+    data = request.get_json(silent=True) or request.form
+    message = (data.get('message') or '').strip()
+    if not message:
+        return jsonify({'error': 'Message is required'}), 400
+
+    user_id = current_user.id
+    messages, usage = build_chat_context(user_id, message)
+    print(f"[Chat] Prompt tokens: {usage['prompt_tokens']} (saved {usage['tokens_saved']} via summary)")
+    ChatMessage.add_message(user_id, 'user', message)
+
+    cache_params = {'temperature': config.TEMPERATURE, 'max_tokens': config.MAX_TOKENS}
+    # Sampled replies (temperature > 0) are meant to vary; only deterministic ones are reused
+    cache = get_cache() if config.TEMPERATURE == 0 else None
+
+    def generate():
+        reply = cache.get(config.OPENROUTER_MODEL, messages, cache_params) if cache else None
+        if reply:
+            # Same context as an earlier request: replay the stored answer in one event
+            yield _sse({'token': reply})
+        else:
+            parts = []
+            try:
+                for token in stream_completion(messages):
+                    parts.append(token)
+                    yield _sse({'token': token})
+            except requests.RequestException as e:
+                print(f"Error streaming chat completion: {e}")
+                yield _sse({'error': 'The assistant is unavailable right now. Please try again.'}, event='error')
+                return
+            reply = ''.join(parts)
+            if cache:
+                cache.set(config.OPENROUTER_MODEL, messages, reply, cache_params, ttl=config.CHAT_CACHE_TTL)
+
+        if reply:
+            ChatMessage.add_message(user_id, 'assistant', reply)
+        yield _sse({'done': True, 'usage': usage}, event='done')
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        # Disable proxy buffering so each token reaches the browser immediately
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
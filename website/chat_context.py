@@ -0,0 +1,123 @@
+"""
+Token-budgeted chat context with a cached rolling summary per user
+"""
+import re
+
+from . import config, db
+from .models import ChatMessage, ChatSummary
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English text)"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _clip(text, max_chars):
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + '...'
+
+
+def _summary_line(message):
+    speaker = 'User' if message.role == 'user' else 'Assistant'
+    return f"{speaker}: {_clip(message.content, config.CHAT_SUMMARY_LINE_CHARS)}"
+
+
+def _trim_summary(lines, budget):
+    """Keep the newest summary lines that fit in the token budget"""
+    kept, used = [], 0
+    for line in reversed(lines):
+        tokens = estimate_tokens(line) + 1
+        if used + tokens > budget:
+            break
+        kept.append(line)
+        used += tokens
+    return list(reversed(kept))
+
+
+def _truncate(text, max_tokens):
+    """Cut text to at most max_tokens estimated tokens"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    return text[:max(max_tokens * 4 - 3, 0)].rstrip() + '...'
+
+
+def build_chat_context(user_id, new_message, budget=None):
+    """
+    Build the message list for a chat completion within a token budget.
+
+    After the system prompt, the budget is split into a share for the rolling
+    summary, a reserve for the new message and the rest for history. The
+    newest turns are included verbatim, newest to oldest, until the history
+    share is used. Older turns are folded into the summary stored per user.
+    What gets folded depends on the history alone, never on the length of the
+    new message, so a long message can't push turns out of the conversation
+    for good. Each turn is summarized once and only turns newer than the
+    summary are read.
+
+    The new message may use whatever the summary and history leave over (at
+    least its reserve) and is truncated beyond that, so the whole prompt
+    always fits the budget. Raises ValueError if the budget cannot even hold
+    the system prompt.
+
+    Returns (messages, stats). stats holds prompt_tokens, the number of history
+    messages included, tokens_saved (raw tokens replaced by the summary) and
+    whether the new message was truncated.
+    """
+    budget = budget or config.CHAT_CONTEXT_TOKEN_BUDGET
+    available = budget - estimate_tokens(config.SYSTEM_PROMPT)
+    if available <= 0:
+        raise ValueError(f"Chat context budget of {budget} tokens does not fit the system prompt")
+    summary_budget = min(config.CHAT_SUMMARY_TOKEN_BUDGET, available // 4)
+    message_reserve = min(config.CHAT_MESSAGE_TOKEN_BUDGET, available // 4)
+    history_budget = available - summary_budget - message_reserve
+
+    summary = ChatSummary.query.filter_by(user_id=user_id).first()
+    after_id = summary.last_message_id if summary else 0
+
+    # Everything not yet summarized, newest first
+    pending = ChatMessage.query.filter(
+        ChatMessage.user_id == user_id,
+        ChatMessage.id > after_id
+    ).order_by(ChatMessage.id.desc()).all()
+
+    included, used = [], 0
+    for message in pending:
+        tokens = estimate_tokens(message.content)
+        if used + tokens > history_budget:
+            break
+        included.append(message)
+        used += tokens
+    folded = pending[len(included):]
+
+    if folded:
+        if summary is None:
+            summary = ChatSummary(user_id=user_id, summary='', last_message_id=0, summarized_tokens=0)
+            db.session.add(summary)
+        lines = summary.summary.splitlines() if summary.summary else []
+        lines += [_summary_line(message) for message in reversed(folded)]
+        summary.summary = '\n'.join(_trim_summary(lines, config.CHAT_SUMMARY_TOKEN_BUDGET))
+        summary.last_message_id = folded[0].id
+        summary.summarized_tokens += sum(estimate_tokens(message.content) for message in folded)
+        db.session.commit()
+
+    messages = [{"role": "system", "content": config.SYSTEM_PROMPT}]
+    summary_tokens = 0
+    if summary and summary.summary:
+        # The stored summary may be larger than this budget's share; send its newest lines
+        header = "Summary of the earlier conversation:\n"
+        lines = _trim_summary(summary.summary.splitlines(), summary_budget - estimate_tokens(header))
+        if lines:
+            content = header + '\n'.join(lines)
+            summary_tokens = estimate_tokens(content)
+            messages.append({"role": "system", "content": content})
+    messages += [{"role": m.role, "content": m.content} for m in reversed(included)]
+    message = _truncate(new_message, available - summary_tokens - used)
+    messages.append({"role": "user", "content": message})
+
+    stats = {
+        'prompt_tokens': sum(estimate_tokens(m['content']) for m in messages),
+        'history_messages': len(included),
+        'tokens_saved': max((summary.summarized_tokens if summary else 0) - summary_tokens, 0),
+        'message_truncated': message != new_message,
+    }
+    return messages, stats
@@ -0,0 +1,112 @@
+"""
+Custom column types for the Skillora models
+"""
+import json
+
+from sqlalchemy.ext.mutable import Mutable, MutableDict, MutableList
+from sqlalchemy.types import Text, TypeDecorator
+
+
+class JSONText(TypeDecorator):
+    """
+    JSON stored in a TEXT column.
+
+    The value is deserialized once when the row is loaded and kept on the
+    instance, so repeated reads cost nothing. Decoded values (the MutableJSON
+    types the column holds, including JSONStr scalars) are always serialized.
+    Only a plain str that never went through coerce (e.g. a bulk insert) is
+    taken as JSON the caller already serialized and stored unchanged.
+    Rows written by older code may hold a JSON scalar or plain text; those
+    load as the scalar (or the text itself) instead of failing.
+    """
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str) and not isinstance(value, MutableJSON):
+            return value
+        return json.dumps(value)
+
+    def process_result_value(self, value, dialect):
+        if not value:
+            return None
+        try:
+            return _wrap(json.loads(value))
+        except ValueError:
+            return JSONStr(value)  # Legacy plain text, returned as written
+
+
+class MutableJSON(Mutable):
+    """
+    Change tracking for JSONText columns holding either a list or a dict.
+
+    In-place edits (append, item assignment, ...) flag the attribute as
+    changed, so the value is only re-serialized on flush when it was modified.
+    """
+
+    @classmethod
+    def coerce(cls, key, value):
+        if isinstance(value, cls) or value is None:
+            return value
+        if isinstance(value, str):
+            # Accept pre-serialized JSON assigned by older code paths
+            if not value:
+                return None
+            try:
+                value = json.loads(value)
+            except ValueError:
+                raise TypeError(
+                    f"'{key}' expects a list, a dict or a JSON-encoded string, got non-JSON text {value[:50]!r}"
+                ) from None
+            if value is None:
+                return None
+        wrapped = _wrap(value)
+        if wrapped is None:
+            raise TypeError(f"'{key}' expects a list, a dict or a JSON-encoded string, got {type(value).__name__}")
+        return wrapped
+
+
+class JSONList(MutableList, MutableJSON):
+    pass
+
+
+class JSONDict(MutableDict, MutableJSON):
+    pass
+
+
+# JSON scalars are immutable, the subclasses only give them the _parents
+# bookkeeping Mutable expects. Booleans load as JSONInt (bool can't be subclassed).
+class JSONStr(str, MutableJSON):
+    pass
+
+
+class JSONInt(int, MutableJSON):
+    pass
+
+
+class JSONFloat(float, MutableJSON):
+    pass
+
+
+def _wrap(value):
+    """Wrap a decoded JSON value in its mutable-tracking type, or return None if it isn't JSON data"""
+    if isinstance(value, MutableJSON):
+        return value
+    if isinstance(value, list):
+        return JSONList(value)
+    if isinstance(value, dict):
+        return JSONDict(value)
+    if isinstance(value, str):
+        return JSONStr(value)
+    if isinstance(value, (bool, int)):
+        return JSONInt(value)
+    if isinstance(value, float):
+        return JSONFloat(value)
+    return None
+
+
+def mutable_json():
+    """Column type for JSON lists/dicts with in-place mutation tracking"""
+    return MutableJSON.as_mutable(JSONText)
@@ -22,7 +22,7 @@ OPENROUTER_MODEL = os.getenv('OPENROUTER_MODEL', 'google/gemini-2.5-flash-previe
 # OPENROUTER_MODEL = "anthropic/claude-3-sonnet-20240229"    # Claude 3 Sonnet
 
 # API endpoints
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_URL = os.getenv('OPENROUTER_URL', "https://openrouter.ai/api/v1/chat/completions")  # Point at openrouter_stub.py for offline testing
 
 # Model parameters
 TEMPERATURE = 0.7
@@ -30,4 +30,33 @@ MAX_TOKENS = 1000
 
 # Chat settings
 MAX_CHAT_HISTORY = 10  # Number of messages to keep in context window 
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv('CHAT_CONTEXT_TOKEN_BUDGET', 3000))  # Prompt tokens per request, including the summary
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv('CHAT_SUMMARY_TOKEN_BUDGET', 500))  # Tokens reserved for the rolling summary
+CHAT_MESSAGE_TOKEN_BUDGET = int(os.getenv('CHAT_MESSAGE_TOKEN_BUDGET', 500))  # Tokens reserved for the new message; longer messages are truncated when history leaves no room
+CHAT_SUMMARY_LINE_CHARS = 200  # Characters kept per turn when it is folded into the summary
+CHAT_CACHE_TTL = int(os.getenv('CHAT_CACHE_TTL', 24 * 3600))  # Seconds a cached chat reply can be reused; replies are only cached when TEMPERATURE is 0
 SYSTEM_PROMPT = "You are Skillora AI, a learning assistant that helps users with educational questions."
+
+# Database settings
+# Any SQLAlchemy URL works here (e.g. postgresql://...); the SQLite pragmas below
+# are only applied when the URL points at SQLite.
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///database.db')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))  # Seconds to wait for a pooled connection
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # Seconds before a connection is replaced
+
+# SQLite engine profile (WAL lets readers and a writer work concurrently)
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))  # Wait for locks instead of failing
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # Bytes of the file to memory-map
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -64000))  # Negative values are KiB (~64 MB)
+
+# Session user cache
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 300))  # Seconds a cached user is kept; hits are still checked against the user's version columns
+
+# YouTube Data API
+YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
+YOUTUBE_API_URL = os.getenv('YOUTUBE_API_URL', 'https://www.googleapis.com/youtube/v3/videos')  # Override to point at a local stub
+VIDEO_METADATA_TTL = int(os.getenv('VIDEO_METADATA_TTL', 7 * 24 * 3600))  # Seconds before stored metadata is refreshed
@@ -3,8 +3,9 @@ from flask_login import UserMixin
 from sqlalchemy.sql import func
 from datetime import datetime
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float, Table
-from sqlalchemy.orm import relationship
-import json
+from sqlalchemy.orm import relationship, load_only, selectinload, joinedload, validates
+from sqlalchemy import select
+from .column_types import mutable_json
 
 
 class Note(db.Model):
@@ -13,39 +14,43 @@ class Note(db.Model):
     date = db.Column(db.DateTime(timezone=True), default=func.now())
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
 
+    __table_args__ = (
+        db.Index('ix_note_user_id', 'user_id'),
+    )
+
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(150), unique=True)
-    password = db.Column(db.String(150))
+    password = db.deferred(db.Column(db.String(150)), group='credentials')  # Only needed at login
     first_name = db.Column(db.String(150))
     last_name = db.Column(db.String(150))
     
-    # Additional profile fields
-    username = db.Column(db.String(50), unique=True, nullable=True)
-    phone = db.Column(db.String(20), nullable=True)
-    date_of_birth = db.Column(db.Date, nullable=True)
-    bio = db.Column(db.Text, nullable=True)
-    profile_image = db.Column(db.String(255), nullable=True)
-    job_title = db.Column(db.String(100), nullable=True)
-    company = db.Column(db.String(100), nullable=True)
-    location = db.Column(db.String(100), nullable=True)
-    website = db.Column(db.String(255), nullable=True)
-    timezone = db.Column(db.String(50), nullable=True)
+    # Additional profile fields (deferred: loaded together on first access)
+    username = db.deferred(db.Column(db.String(50), unique=True, nullable=True), group='profile')
+    phone = db.deferred(db.Column(db.String(20), nullable=True), group='profile')
+    date_of_birth = db.deferred(db.Column(db.Date, nullable=True), group='profile')
+    bio = db.deferred(db.Column(db.Text, nullable=True), group='profile')
+    profile_image = db.deferred(db.Column(db.String(255), nullable=True), group='profile')
+    job_title = db.deferred(db.Column(db.String(100), nullable=True), group='profile')
+    company = db.deferred(db.Column(db.String(100), nullable=True), group='profile')
+    location = db.deferred(db.Column(db.String(100), nullable=True), group='profile')
+    website = db.deferred(db.Column(db.String(255), nullable=True), group='profile')
+    timezone = db.deferred(db.Column(db.String(50), nullable=True), group='profile')
     
     # Account status and settings
     is_active = db.Column(db.Boolean, default=True)
     is_verified = db.Column(db.Boolean, default=False)
     is_survey_completed = db.Column(db.Boolean, default=False)  # Track if CS interests survey is completed
-    last_login = db.Column(db.DateTime(timezone=True), nullable=True)
-    created_at = db.Column(db.DateTime(timezone=True), default=func.now())
-    updated_at = db.Column(db.DateTime(timezone=True), default=func.now(), onupdate=func.now())
+    last_login = db.deferred(db.Column(db.DateTime(timezone=True), nullable=True), group='activity')
+    created_at = db.deferred(db.Column(db.DateTime(timezone=True), default=func.now()), group='activity')
+    updated_at = db.deferred(db.Column(db.DateTime(timezone=True), default=func.now(), onupdate=func.now()), group='activity')
     
-    # Notification and privacy settings
-    email_notifications = db.Column(db.Boolean, default=True)
-    public_profile = db.Column(db.Boolean, default=True)
-    show_courses = db.Column(db.Boolean, default=True)
-    show_achievements = db.Column(db.Boolean, default=True)
+    # Notification and privacy settings (deferred: loaded together on first access)
+    email_notifications = db.deferred(db.Column(db.Boolean, default=True), group='privacy')
+    public_profile = db.deferred(db.Column(db.Boolean, default=True), group='privacy')
+    show_courses = db.deferred(db.Column(db.Boolean, default=True), group='privacy')
+    show_achievements = db.deferred(db.Column(db.Boolean, default=True), group='privacy')
     
     # Relationships
     notes = db.relationship('Note')
@@ -58,9 +63,54 @@ class User(db.Model, UserMixin):
     cs_interest = db.relationship('CSInterest')
     quiz_attempts = db.relationship('QuizAttempt')
 
+    # Columns needed on almost every authenticated request
+    SESSION_COLUMNS = ('id', 'email', 'first_name', 'last_name', 'is_active', 'is_verified', 'is_survey_completed', 'updated_at')
+    # Re-read on every session cache hit, so changes made by another worker are seen on the next request
+    SESSION_VERSION_COLUMNS = ('updated_at', 'is_active', 'is_verified', 'is_survey_completed')
+
     def __repr__(self):
         return f'User({self.id}, {self.email})'
 
+    @staticmethod
+    def session_user_options():
+        """Loader options for the slim "session user" projection used by load_user"""
+        return (load_only(*(getattr(User, name) for name in User.SESSION_COLUMNS)),)
+
+    @staticmethod
+    def get_dashboard(user_id):
+        """
+        Load a user with every relationship the dashboard and progress pages use.
+
+        Runs a fixed number of queries (one per relationship) regardless of how
+        many courses, modules or progress rows the user has.
+        """
+        return User.query.options(
+            selectinload(User.courses).selectinload(Course.modules),
+            selectinload(User.achievements),
+            selectinload(User.user_progress).joinedload(UserProgress.module),
+            selectinload(User.schedules),
+            selectinload(User.learning_path),
+            selectinload(User.quiz_attempts),
+            selectinload(User.notes),
+        ).filter_by(id=user_id).first()
+
+    @staticmethod
+    def get_progress_summary(user_id):
+        """Return the dashboard counters for a user in a single Core statement"""
+        def count(model, *criteria):
+            return select(func.count()).select_from(model).where(model.user_id == user_id, *criteria).scalar_subquery()
+
+        stmt = select(
+            count(Course).label('courses'),
+            count(UserProgress).label('modules_started'),
+            count(UserProgress, UserProgress.is_completed.is_(True)).label('modules_completed'),
+            count(Achievement).label('achievements'),
+            count(QuizAttempt).label('quiz_attempts'),
+            count(QuizAttempt, QuizAttempt.is_passed.is_(True)).label('quizzes_passed'),
+            count(Schedule, Schedule.start_time >= func.now()).label('upcoming_sessions'),
+        )
+        return db.session.execute(stmt).one()._asdict()
+
 
 # Course and related models
 class Course(db.Model):
@@ -81,6 +131,10 @@ class Course(db.Model):
     modules = db.relationship('Module', backref='course', cascade='all, delete-orphan')
     category = db.relationship('Category', back_populates='courses')  # New relationship
 
+    __table_args__ = (
+        db.Index('ix_course_user_id', 'user_id'),
+    )
+
 
 # Course enrollment relationship
 user_course = db.Table('user_course',
@@ -107,8 +161,9 @@ class Module(db.Model):
     title = db.Column(db.String(100))
     description = db.Column(db.String(1000))
     content_type = db.Column(db.String(50), default="video")  # video, reading, exercise
-    youtube_links = db.Column(db.Text)  # JSON string of YouTube URLs
+    youtube_links = db.Column(mutable_json())  # JSON list of YouTube URLs
     manim_video_path = db.Column(db.String(255))  # Path to the generated Manim video
+    manim_video_url = db.Column(db.String(255))  # Public URL for manim_video_path, resolved when the path is set
     order = db.Column(db.Integer)  # Order of module in course
     estimated_time_minutes = db.Column(db.Integer, default=30)
     date_created = db.Column(db.DateTime(timezone=True), default=func.now())
@@ -117,44 +172,45 @@ class Module(db.Model):
     course_id = db.Column(db.Integer, db.ForeignKey('course.id'))
     quiz = db.relationship('Quiz', backref='module', uselist=False, cascade='all, delete-orphan')
     lessons = db.relationship('Lesson', back_populates='module')
+
+    # Modules are always listed per course in order
+    __table_args__ = (
+        db.Index('ix_module_course_id_order', 'course_id', 'order'),
+    )
     
     def get_youtube_links(self):
         """Return the YouTube links as a list"""
-        if self.youtube_links:
-            return json.loads(self.youtube_links)
-        return []
+        return self.youtube_links or []
         
+    @validates('manim_video_path')
+    def _resolve_manim_video_url(self, key, path):
+        self.manim_video_url = Module.resolve_video_url(path)
+        return path
+
+    @staticmethod
+    def resolve_video_url(path):
+        """Turn a Manim video file path into its public URL under the static folder"""
+        if not path:
+            return None
+        from flask import current_app, has_app_context
+        static_url_path = current_app.static_url_path if has_app_context() else '/static'
+        # Already a URL (resolved earlier, or hosted elsewhere): keep it as is
+        if path.startswith(f"{static_url_path}/") or '://' in path:
+            return path
+        # Windows paths use backslashes, URLs need forward slashes
+        normalized = path.replace('\\', '/')
+        if 'static/' not in normalized:
+            # If we can't determine the relative path, use the full path
+            return path
+        relative_path = normalized.split('static/', 1)[1]
+        return f"{static_url_path}/{relative_path}"
+
     def get_video_url(self):
         """Return the URL to the video (Manim video or first YouTube link)"""
         if self.manim_video_path:
-            try:
-                # Import from manim.py instead of manim_utils
-                from .manim import get_module_video_url
-                return get_module_video_url(self)
-            except ImportError:
-                # Fall back to the old approach if the function is not available
-                try:
-                    # Try to get a relative path from the absolute path
-                    if 'static/' in self.manim_video_path:
-                        relative_path = self.manim_video_path.split('static/')[1]
-                        from flask import url_for
-                        return url_for('static', filename=relative_path)
-                    
-                    # Try with backslashes for Windows paths
-                    if 'static\\' in self.manim_video_path:
-                        # Replace backslashes with forward slashes for URL
-                        relative_path = self.manim_video_path.split('static\\')[1].replace('\\', '/')
-                        from flask import url_for
-                        return url_for('static', filename=relative_path)
-                    
-                    # If we can't determine the relative path, return the full path
-                    return self.manim_video_path
-                except Exception as e:
-                    print(f"Error getting video URL: {e}")
-                    # Fall back to YouTube if there's an error
-                    youtube_links = self.get_youtube_links()
-                    return youtube_links[0] if youtube_links else None
-        
+            # Rows written before manim_video_url existed are resolved on the fly until backfilled
+            return self.manim_video_url or Module.resolve_video_url(self.manim_video_path)
+
         # Fall back to YouTube links if no Manim video
         youtube_links = self.get_youtube_links()
         return youtube_links[0] if youtube_links else None
@@ -165,48 +221,17 @@ class Module(db.Model):
         
     def get_video_metadata(self, api_key=None):
         """Get metadata for the videos to allow for better filtering"""
-        if not self.youtube_links or not api_key:
-            return []
-            
-        video_ids = []
-        for link in self.get_youtube_links():
-            # Extract video ID from YouTube URL
-            if 'youtube.com/watch?v=' in link:
-                video_id = link.split('v=')[1].split('&')[0]
-            elif 'youtu.be/' in link:
-                video_id = link.split('/')[-1]
-            else:
-                continue
-            video_ids.append(video_id)
-            
-        if not video_ids:
-            return []
-            
-        try:
-            # This would use the YouTube Data API to get video details
-            # In a real implementation, you would make an API call like:
-            # https://www.googleapis.com/youtube/v3/videos?id=video_id1,video_id2&part=snippet,contentDetails,statistics&key=YOUR_API_KEY
-            # For now, we'll simulate the response
-            
-            # Sample metadata structure
-            metadata = []
-            for video_id in video_ids:
-                # In a real implementation, this would be fetched from the API
-                metadata.append({
-                    'id': video_id,
-                    'title': 'Video title',
-                    'description': 'Video description',
-                    'duration': 'PT15M',  # ISO 8601 duration format
-                    'viewCount': '10000',
-                    'likeCount': '500',
-                    'dislikeCount': '50',
-                    'tags': ['education', 'tutorial'],
-                    'publishedAt': '2021-01-01T00:00:00Z'
-                })
-            return metadata
-        except Exception as e:
-            print(f"Error fetching video metadata: {e}")
+        if not self.youtube_links:
             return []
+        # Set by youtube.prefetch_video_metadata when a whole course was loaded at once
+        prefetched = getattr(self, '_video_metadata', None)
+        if prefetched is not None:
+            return prefetched
+
+        from .youtube import extract_video_id, fetch_video_metadata
+        video_ids = [extract_video_id(link) for link in self.get_youtube_links()]
+        metadata = fetch_video_metadata(video_ids, api_key)
+        return [metadata[video_id].to_dict() for video_id in video_ids if video_id in metadata]
             
     def filter_videos_by_preference(self, user_preferences, api_key=None):
         """
@@ -221,99 +246,15 @@ class Module(db.Model):
         """
         if not self.youtube_links:
             return []
-            
-        videos = self.get_youtube_links()
-        metadata = self.get_video_metadata(api_key)
-        
-        # Match videos with their metadata
-        video_data = []
-        for i, video in enumerate(videos):
-            video_info = {
-                'url': video,
-                'score': 0  # Initial score
-            }
-            
-            # Add metadata if available
-            if i < len(metadata):
-                video_info['metadata'] = metadata[i]
-                
-                # Calculate duration in minutes if metadata exists
-                if 'duration' in metadata[i]:
-                    duration_str = metadata[i]['duration']
-                    # Parse ISO 8601 duration (simplified)
-                    minutes = 0
-                    if 'M' in duration_str:
-                        m_pos = duration_str.find('M')
-                        t_pos = duration_str.find('T')
-                        if t_pos != -1 and t_pos < m_pos:
-                            minutes_str = duration_str[t_pos+1:m_pos]
-                            try:
-                                minutes = int(minutes_str)
-                            except ValueError:
-                                pass
-                    video_info['duration_minutes'] = minutes
-                    
-                    # Score based on preferred duration
-                    if 'preferred_duration' in user_preferences:
-                        preferred_minutes = user_preferences['preferred_duration']
-                        # Higher score for videos closer to preferred duration
-                        duration_diff = abs(minutes - preferred_minutes)
-                        if duration_diff <= 5:
-                            video_info['score'] += 3  # Very close to preferred time
-                        elif duration_diff <= 10:
-                            video_info['score'] += 2  # Reasonably close
-                        elif duration_diff <= 15:
-                            video_info['score'] += 1  # Still acceptable
-                        
-                # Score based on engagement metrics
-                if 'viewCount' in metadata[i] and 'likeCount' in metadata[i]:
-                    try:
-                        views = int(metadata[i]['viewCount'])
-                        likes = int(metadata[i]['likeCount'])
-                        
-                        # Engagement ratio (likes/views)
-                        if views > 0:
-                            engagement = likes / views
-                            if engagement > 0.1:  # More than 10% engagement
-                                video_info['score'] += 3
-                            elif engagement > 0.05:  # More than 5% engagement
-                                video_info['score'] += 2
-                            elif engagement > 0.01:  # More than 1% engagement
-                                video_info['score'] += 1
-                    except (ValueError, ZeroDivisionError):
-                        pass
-                
-                # Score based on learning style
-                if 'learning_style' in user_preferences and 'tags' in metadata[i]:
-                    style = user_preferences['learning_style']
-                    tags = metadata[i]['tags']
-                    
-                    style_keywords = {
-                        'visual': ['visual', 'demonstration', 'animation', 'diagram'],
-                        'auditory': ['lecture', 'discussion', 'explanation', 'talk'],
-                        'hands-on': ['practical', 'tutorial', 'hands-on', 'exercise', 'project']
-                    }
-                    
-                    # Check if video tags match the learning style
-                    if style in style_keywords:
-                        matching_tags = set(tags).intersection(style_keywords[style])
-                        video_info['score'] += len(matching_tags)  # Score based on number of matching tags
-                        
-                    # Extra points if title or description contains style keywords
-                    title_desc = metadata[i]['title'] + ' ' + metadata[i]['description']
-                    title_desc = title_desc.lower()
-                    
-                    for keyword in style_keywords.get(style, []):
-                        if keyword.lower() in title_desc:
-                            video_info['score'] += 1
-                            
-            video_data.append(video_info)
-        
-        # Sort videos by score (highest first)
-        sorted_videos = sorted(video_data, key=lambda x: x.get('score', 0), reverse=True)
-        
-        # Return the sorted list of video URLs
-        return [video['url'] for video in sorted_videos]
+
+        # Use ranking.rank_course_videos to rank a whole course in one pass
+        from .ranking import rank_videos
+        return rank_videos(
+            [self],
+            user_preferences.get('preferred_duration'),
+            user_preferences.get('learning_style'),
+            api_key
+        )[0]
 
 
 # Updated Lesson model
@@ -333,6 +274,10 @@ class Lesson(db.Model):
     module = db.relationship('Module', back_populates='lessons')
     resources = db.relationship('Resource', back_populates='lesson')
 
+    __table_args__ = (
+        db.Index('ix_lesson_module_id_order', 'module_id', 'order'),
+    )
+
 
 # New LearningPath model
 class LearningPath(db.Model):
@@ -341,15 +286,17 @@ class LearningPath(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     career_path = db.Column(db.String(100))  # e.g., "Software Engineer", "Data Scientist"
-    focus_areas = db.Column(db.String(500))  # JSON string of focus areas
+    focus_areas = db.Column(mutable_json())  # JSON list of focus areas
     date_created = db.Column(db.DateTime(timezone=True), default=func.now())
     date_updated = db.Column(db.DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        db.Index('ix_learning_path_user_id', 'user_id'),
+    )
+
     def get_focus_areas(self):
         """Return the focus areas as a list"""
-        if self.focus_areas:
-            return json.loads(self.focus_areas)
-        return []
+        return self.focus_areas or []
 
 
 # Learning path and course relationship
@@ -376,6 +323,10 @@ class UserProgress(db.Model):
     user = db.relationship('User', back_populates='user_progress')
     module = db.relationship('Module', backref='progress', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_user_progress_user_id_module_id', 'user_id', 'module_id'),
+    )
+
 
 # New Schedule model
 class Schedule(db.Model):
@@ -398,6 +349,10 @@ class Schedule(db.Model):
     course = db.relationship('Course')
     lesson = db.relationship('Lesson')
 
+    __table_args__ = (
+        db.Index('ix_schedule_user_id_start_time', 'user_id', 'start_time'),
+    )
+
 
 # New Resource model
 class Resource(db.Model):
@@ -433,6 +388,10 @@ class Achievement(db.Model):
     user = db.relationship('User', back_populates='achievements')
     course = db.relationship('Course')
 
+    __table_args__ = (
+        db.Index('ix_achievement_user_id', 'user_id'),
+    )
+
 
 class PasswordReset(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -470,6 +429,11 @@ class ChatMessage(db.Model):
     
     # Define relationship with User
     user = db.relationship('User', backref=db.backref('chat_messages', lazy=True))
+
+    # Serves get_chat_history (filter by user, newest first) without a sort step
+    __table_args__ = (
+        db.Index('ix_chat_messages_user_id_created_at', 'user_id', 'created_at'),
+    )
     
     def __repr__(self):
         return f'<ChatMessage {self.id}: {self.role}>'
@@ -493,9 +457,25 @@ class ChatMessage(db.Model):
     def clear_chat_history(user_id):
         """Clear all chat messages for a user"""
         ChatMessage.query.filter_by(user_id=user_id).delete()
+        ChatSummary.query.filter_by(user_id=user_id).delete()
         db.session.commit()
 
 
+# Rolling summary of the chat turns that no longer fit in the context budget
+class ChatSummary(db.Model):
+    __tablename__ = 'chat_summaries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, unique=True)
+    summary = db.Column(db.Text, nullable=False, default='')
+    last_message_id = db.Column(db.Integer, nullable=False, default=0)  # Newest ChatMessage folded into the summary
+    summarized_tokens = db.Column(db.Integer, nullable=False, default=0)  # Estimated tokens of the raw turns it replaces
+    updated_at = db.Column(db.DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f'<ChatSummary user={self.user_id} upto={self.last_message_id}>'
+
+
 # Add this model at the end of the file
 class CSInterestSurvey(db.Model):
     __tablename__ = 'cs_interest_survey'
@@ -562,7 +542,7 @@ class QuizQuestion(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     question_text = db.Column(db.String(500))
     question_type = db.Column(db.String(20))  # multiple_choice, fill_in_blank, short_answer
-    options = db.Column(db.Text)  # JSON string of options for multiple choice
+    options = db.Column(mutable_json())  # JSON list of options for multiple choice
     correct_answer = db.Column(db.String(500))
     order = db.Column(db.Integer)
     points = db.Column(db.Integer, default=1)
@@ -572,16 +552,14 @@ class QuizQuestion(db.Model):
     
     def get_options(self):
         """Return options as a list for multiple choice questions"""
-        if self.options:
-            return json.loads(self.options)
-        return []
+        return self.options or []
 
 
 # User Quiz Attempt model
 class QuizAttempt(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     score = db.Column(db.Integer)  # Score as a percentage
-    answers = db.Column(db.Text)  # JSON string of user's answers
+    answers = db.Column(mutable_json())  # JSON of user's answers
     is_passed = db.Column(db.Boolean, default=False)
     date_attempted = db.Column(db.DateTime(timezone=True), default=func.now())
     
@@ -589,6 +567,10 @@ class QuizAttempt(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'))
 
+    __table_args__ = (
+        db.Index('ix_quiz_attempt_user_id_quiz_id', 'user_id', 'quiz_id'),
+    )
+
 
 class UserSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -601,3 +583,52 @@ class UserSettings(db.Model):
     
     # Relationships
     user = db.relationship('User', backref='settings')
+
+    __table_args__ = (
+        db.Index('ix_user_settings_user_id', 'user_id'),
+    )
+
+
+# Cached YouTube Data API metadata, keyed by video ID
+class VideoMetadata(db.Model):
+    __tablename__ = 'video_metadata'
+
+    video_id = db.Column(db.String(20), primary_key=True)
+    title = db.Column(db.String(200))
+    description = db.Column(db.Text)
+    duration = db.Column(db.String(30))  # ISO 8601 duration format, e.g. PT15M
+    view_count = db.Column(db.Integer, default=0)
+    like_count = db.Column(db.Integer, default=0)
+    tags = db.Column(mutable_json())  # JSON list of tags
+    published_at = db.Column(db.String(30))
+    fetched_at = db.Column(db.DateTime(timezone=True))  # When the API was last asked, drives the TTL refresh
+
+    @staticmethod
+    def values_from_api(item, fetched_at):
+        """Return the column values we keep from a YouTube Data API video resource"""
+        snippet = item.get('snippet', {})
+        statistics = item.get('statistics', {})
+        return {
+            'video_id': item['id'],
+            'title': snippet.get('title', '')[:200],
+            'description': snippet.get('description', ''),
+            'duration': item.get('contentDetails', {}).get('duration'),
+            'view_count': int(statistics.get('viewCount', 0)),
+            'like_count': int(statistics.get('likeCount', 0)),
+            'tags': snippet.get('tags', []),
+            'published_at': snippet.get('publishedAt'),
+            'fetched_at': fetched_at,
+        }
+
+    def to_dict(self):
+        """Return the metadata in the YouTube API field naming used by the filters"""
+        return {
+            'id': self.video_id,
+            'title': self.title or '',
+            'description': self.description or '',
+            'duration': self.duration or '',
+            'viewCount': str(self.view_count or 0),
+            'likeCount': str(self.like_count or 0),
+            'tags': list(self.tags or []),
+            'publishedAt': self.published_at,
+        }
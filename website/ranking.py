@@ -0,0 +1,203 @@
+"""
+Batch ranking of module videos against a user's learning preferences
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+from sqlalchemy import func
+
+from . import config, db
+from .youtube import extract_video_id, prefetch_video_metadata
+
+STYLE_KEYWORDS = {
+    'visual': ['visual', 'demonstration', 'animation', 'diagram'],
+    'auditory': ['lecture', 'discussion', 'explanation', 'talk'],
+    'hands-on': ['practical', 'tutorial', 'hands-on', 'exercise', 'project'],
+}
+STYLES = list(STYLE_KEYWORDS)
+
+# Survey / CSInterest learning styles that map onto a keyword set
+STYLE_ALIASES = {'kinesthetic': 'hands-on'}
+
+_DURATION_RE = re.compile(r'^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+
+@lru_cache(maxsize=4096)
+def parse_duration_minutes(duration):
+    """Parse an ISO 8601 duration such as PT1H5M30S into whole minutes"""
+    match = _DURATION_RE.match(duration or '')
+    if not match:
+        return 0
+    days, hours, minutes, seconds = (int(part or 0) for part in match.groups())
+    return days * 1440 + hours * 60 + minutes + seconds // 60
+
+
+def _style_matches(metadata):
+    """Per-style match counts: matching tags plus style keywords found in title/description"""
+    tags = {tag.lower() for tag in metadata.get('tags', [])}
+    text = f"{metadata.get('title', '')} {metadata.get('description', '')}".lower()
+    return [
+        len(tags.intersection(keywords)) + sum(keyword in text for keyword in keywords)
+        for keywords in STYLE_KEYWORDS.values()
+    ]
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def rank_videos(modules, preferred_duration=None, learning_style=None, api_key=None):
+    """
+    Rank the YouTube videos of several modules in one pass.
+
+    Metadata for all modules is fetched together, feature arrays (duration,
+    engagement, style matches) are built once, and every candidate video is
+    scored with vectorized NumPy operations.
+
+    Returns a list with, for each module, its video URLs sorted by score.
+    """
+    prefetch_video_metadata(modules, api_key)
+
+    urls, owners, durations, views, likes, styles, has_metadata = [], [], [], [], [], [], []
+    for index, module in enumerate(modules):
+        metadata_by_id = {m['id']: m for m in module.get_video_metadata(api_key)}
+        for url in module.get_youtube_links():
+            metadata = metadata_by_id.get(extract_video_id(url))
+            urls.append(url)
+            owners.append(index)
+            has_metadata.append(metadata is not None)
+            metadata = metadata or {}
+            durations.append(parse_duration_minutes(metadata.get('duration')))
+            views.append(_to_int(metadata.get('viewCount')))
+            likes.append(_to_int(metadata.get('likeCount')))
+            styles.append(_style_matches(metadata) if metadata else [0] * len(STYLES))
+
+    if not urls:
+        return [[] for _ in modules]
+
+    owners = np.array(owners)
+    has_metadata = np.array(has_metadata)
+    scores = np.zeros(len(urls), dtype=np.int64)
+
+    # Score based on preferred duration: closer is better
+    if preferred_duration is not None:
+        duration_diff = np.abs(np.array(durations) - preferred_duration)
+        scores += np.select([duration_diff <= 5, duration_diff <= 10, duration_diff <= 15], [3, 2, 1], 0)
+
+    # Score based on engagement (likes / views)
+    views = np.array(views, dtype=np.float64)
+    likes = np.array(likes, dtype=np.float64)
+    engagement = np.divide(likes, views, out=np.zeros_like(likes), where=views > 0)
+    scores += np.select([engagement > 0.1, engagement > 0.05, engagement > 0.01], [3, 2, 1], 0)
+
+    # Score based on learning style
+    style = STYLE_ALIASES.get(learning_style, learning_style)
+    if style in STYLE_KEYWORDS:
+        scores += np.array(styles)[:, STYLES.index(style)]
+
+    scores = np.where(has_metadata, scores, 0)
+
+    # Highest score first, keeping the original link order for ties
+    order = np.lexsort((-scores, owners))
+    ranked = [[] for _ in modules]
+    for i in order:
+        ranked[owners[i]].append(urls[i])
+    return ranked
+
+
+class RankingCache:
+    """
+    LRU cache of ranked course videos, keyed by user, course content, settings
+    and metadata version. Entries expire after `ttl` seconds (VIDEO_METADATA_TTL
+    by default), the age at which the metadata they were ranked on is refreshed.
+    """
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = config.VIDEO_METADATA_TTL if ttl is None else ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+ranking_cache = RankingCache()
+
+
+def user_preferences(user):
+    """Return (preferred_duration, learning_style) from UserSettings and the CS interest survey"""
+    settings = user.settings[0] if user.settings else None
+    preferred_duration = settings.preferred_video_duration if settings else None
+    survey = user.cs_survey
+    learning_style = survey.preferred_learning_style.lower() if survey and survey.preferred_learning_style else None
+    return preferred_duration, learning_style
+
+
+def metadata_version(video_ids):
+    """Return (row count, latest fetched_at) of the stored metadata for the given videos"""
+    from .models import VideoMetadata
+
+    video_ids = list(dict.fromkeys(v for v in video_ids if v))
+    if not video_ids:
+        return 0, None
+    with db.session.no_autoflush:
+        return tuple(db.session.query(
+            func.count(VideoMetadata.video_id), func.max(VideoMetadata.fetched_at),
+        ).filter(VideoMetadata.video_id.in_(video_ids)).one())
+
+
+def rank_course_videos(user, modules, api_key=None):
+    """
+    Rank every module's videos for a user, cached per user, settings and metadata version.
+
+    The settings version is the (duration, learning style) pair, so changing
+    either preference produces a fresh ranking. Editing a module's links does
+    too, because the links are part of the key. The metadata version (how many
+    of the videos have stored metadata and when the newest was fetched) and
+    whether an API key is available are part of the key as well, so a ranking
+    made before metadata was fetched or refreshed is not served afterwards.
+    """
+    preferred_duration, learning_style = user_preferences(user)
+    links = tuple((module.id, tuple(module.get_youtube_links())) for module in modules)
+    video_ids = [extract_video_id(link) for _, module_links in links for link in module_links]
+
+    def cache_key():
+        return (
+            user.id,
+            preferred_duration,
+            learning_style,
+            links,
+            metadata_version(video_ids),
+            bool(api_key or config.YOUTUBE_API_KEY),
+        )
+
+    ranked = ranking_cache.get(cache_key())
+    if ranked is None:
+        ranked = rank_videos(modules, preferred_duration, learning_style, api_key)
+        # Ranking may have fetched metadata; store under the version it was ranked on
+        ranking_cache.set(cache_key(), ranked)
+    return {module.id: urls for module, urls in zip(modules, ranked)}
@@ -0,0 +1,164 @@
+"""
+YouTube Data API access with a persistent, batched metadata cache
+"""
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from sqlalchemy import insert
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from http_clients import get_session, timeout_for
+
+from . import config, db
+
+# The videos endpoint accepts at most 50 IDs per request
+BATCH_SIZE = 50
+
+def extract_video_id(link):
+    """Return the video ID of a YouTube watch or youtu.be URL, or None"""
+    if not link:
+        return None
+    parsed = urlparse(link.strip())
+    host = (parsed.hostname or '').lower()
+    if host.endswith('youtu.be'):
+        video_id = parsed.path.lstrip('/').split('/')[0]
+    elif host.endswith('youtube.com'):
+        if parsed.path == '/watch':
+            video_id = parse_qs(parsed.query).get('v', [None])[0]
+        elif parsed.path.startswith(('/embed/', '/shorts/', '/v/')):
+            video_id = parsed.path.split('/')[2]
+        else:
+            video_id = None
+    else:
+        video_id = None
+    return video_id or None
+
+
+def _is_fresh(row, now):
+    fetched_at = row.fetched_at
+    if fetched_at is None:
+        return False
+    if fetched_at.tzinfo is None:
+        fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+    return now - fetched_at < timedelta(seconds=config.VIDEO_METADATA_TTL)
+
+
+def _request_batch(video_ids, api_key):
+    """Fetch one batch (at most BATCH_SIZE IDs) from the YouTube Data API"""
+    response = get_session().get(
+        config.YOUTUBE_API_URL,
+        params={
+            'id': ','.join(video_ids),
+            'part': 'snippet,contentDetails,statistics',
+            'key': api_key,
+            'maxResults': BATCH_SIZE,
+        },
+        timeout=timeout_for(config.YOUTUBE_API_URL),
+    )
+    response.raise_for_status()
+    return response.json().get('items', [])
+
+
+def _upsert_statement(table, rows):
+    """INSERT ... ON CONFLICT (video_id) DO UPDATE for the current dialect, or None if unsupported"""
+    dialect = db.engine.dialect.name
+    columns = [c.name for c in table.columns if c.name != 'video_id']
+    if dialect in ('sqlite', 'postgresql'):
+        stmt = (sqlite if dialect == 'sqlite' else postgresql).insert(table).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=['video_id'], set_={name: stmt.excluded[name] for name in columns}
+        )
+    if dialect in ('mysql', 'mariadb'):
+        stmt = mysql.insert(table).values(rows)
+        return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in columns})
+    return None
+
+
+def _store_metadata(rows):
+    """
+    Upsert fetched rows in a transaction of their own.
+
+    The caller's db.session is never flushed, committed or rolled back, and
+    concurrent requests storing the same video both succeed.
+    """
+    from .models import VideoMetadata
+
+    table = VideoMetadata.__table__
+    stmt = _upsert_statement(table, rows)
+    with db.engine.begin() as connection:
+        if stmt is not None:
+            connection.execute(stmt)
+            return
+        # Generic fallback: update what exists, insert the rest
+        existing = set(connection.scalars(
+            table.select().with_only_columns(table.c.video_id).where(table.c.video_id.in_([r['video_id'] for r in rows]))
+        ))
+        for row in rows:
+            if row['video_id'] in existing:
+                connection.execute(table.update().where(table.c.video_id == row['video_id']).values(row))
+            else:
+                connection.execute(insert(table).values(row))
+
+
+def fetch_video_metadata(video_ids, api_key=None):
+    """
+    Return a dict of video ID -> VideoMetadata for the given IDs.
+
+    Stored rows younger than VIDEO_METADATA_TTL are used as-is. Missing or
+    stale IDs are requested from the API in batches of 50 and upserted in a
+    separate transaction, so the caller's session is left untouched. The API
+    key defaults to config.YOUTUBE_API_KEY. Without a key (or if the API
+    fails) whatever is stored is returned.
+    """
+    from .models import VideoMetadata
+
+    if api_key is None:
+        api_key = config.YOUTUBE_API_KEY
+    video_ids = list(dict.fromkeys(v for v in video_ids if v))
+    if not video_ids:
+        return {}
+
+    with db.session.no_autoflush:  # Don't flush the caller's pending changes just to read metadata
+        stored = {
+            row.video_id: row
+            for row in VideoMetadata.query.filter(VideoMetadata.video_id.in_(video_ids)).all()
+        }
+    now = datetime.now(timezone.utc)
+    to_fetch = [v for v in video_ids if v not in stored or not _is_fresh(stored[v], now)]
+
+    if to_fetch and api_key:
+        try:
+            for start in range(0, len(to_fetch), BATCH_SIZE):
+                rows = [
+                    VideoMetadata.values_from_api(item, now)
+                    for item in _request_batch(to_fetch[start:start + BATCH_SIZE], api_key)
+                ]
+                if not rows:
+                    continue
+                _store_metadata(rows)
+                # Fresh transient rows; the caller's persistent (stale) ones are not modified
+                stored.update((row['video_id'], VideoMetadata(**row)) for row in rows)
+        except (requests.RequestException, ValueError, KeyError, SQLAlchemyError) as e:
+            print(f"Error fetching video metadata: {e}")
+
+    return {v: stored[v] for v in video_ids if v in stored}
+
+
+def prefetch_video_metadata(modules, api_key=None):
+    """
+    Load metadata for every video of several modules at once.
+
+    Collects the video IDs across all modules so a course page costs a single
+    API request, then hands each module its share for get_video_metadata.
+    """
+    links_by_module = {module: module.get_youtube_links() for module in modules}
+    all_ids = [extract_video_id(link) for links in links_by_module.values() for link in links]
+    metadata = fetch_video_metadata(all_ids, api_key)
+    for module, links in links_by_module.items():
+        module._video_metadata = [
+            metadata[video_id].to_dict()
+            for video_id in map(extract_video_id, links)
+            if video_id in metadata
+        ]
+    return metadata
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Local YouTube Data API stub for testing and benchmarking video metadata offline.
+
+Serves /youtube/v3/videos and answers every requested ID with a canned video
+resource (snippet, contentDetails, statistics). Requests are counted so a test
+can check how many upstream calls a page cost.
+
+Usage:
+    python youtube_stub.py --port 8002 --delay 0.2
+    YOUTUBE_API_KEY=stub YOUTUBE_API_URL=http://127.0.0.1:8002/youtube/v3/videos python main.py
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+VIDEOS_PATH = '/youtube/v3/videos'
+
+
+def video_resource(video_id):
+    return {
+        'id': video_id,
+        'snippet': {
+            'title': f'Stub video {video_id}',
+            'description': 'A step by step tutorial with examples.',
+            'tags': ['tutorial', 'stub'],
+            'publishedAt': '2024-01-01T00:00:00Z',
+        },
+        'contentDetails': {'duration': 'PT12M30S'},
+        'statistics': {'viewCount': '1000', 'likeCount': '50'},
+    }
+
+
+class YouTubeStubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    requests_served = 0
+    ids_requested = []
+    lock = threading.Lock()
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path.rstrip('/') != VIDEOS_PATH:
+            self.send_error(404)
+            return
+        query = parse_qs(url.query)
+        if not query.get('key'):
+            self.send_error(403, 'API key missing')
+            return
+        ids = [v for v in query.get('id', [''])[0].split(',') if v]
+        with self.lock:
+            type(self).requests_served += 1
+            self.ids_requested.append(ids)
+        time.sleep(self.delay)
+
+        body = json.dumps({'items': [video_resource(v) for v in ids[:50]]}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub(port=0):
+    """Start the stub on a background thread; returns (server, videos URL)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), YouTubeStubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}{VIDEOS_PATH}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local YouTube Data API stub")
+    parser.add_argument('--port', type=int, default=8002)
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds before each response")
+    args = parser.parse_args()
+
+    YouTubeStubHandler.delay = args.delay
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), YouTubeStubHandler)
+    print(f"YouTube stub listening on http://127.0.0.1:{args.port}{VIDEOS_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStub stopped.")
+
+
+if __name__ == '__main__':
+    main()